@@ -0,0 +1,297 @@
+"""Audio helpers for splitting long text, assembling PCM audio and encoding it."""
+
+import asyncio
+import os
+import re
+import shutil
+import struct
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Iterable, Optional
+
+
+DEFAULT_CHUNK_CHARS = 1500
+
+# Gemini TTS returns mono 16-bit PCM: audio/L16;codec=pcm;rate=24000
+PCM_SAMPLE_RATE = 24000
+PCM_CHANNELS = 1
+PCM_SAMPLE_WIDTH = 2
+WAV_HEADER_SIZE = 44
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|\n\s*\n")
+
+
+def split_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> list[str]:
+    """Split text into chunks of whole sentences, each at most ``max_chars`` long.
+
+    Sentences longer than ``max_chars`` are split at the last whitespace
+    before the limit, or hard-split if they contain none.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+    chunks: list[str] = []
+    current = ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            head, sentence = sentence[:cut].strip(), sentence[cut:].strip()
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(head)
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+_SPEAKER_LINE = re.compile(r"^\s*([^:\n]{1,40}?)\s*:\s*(.*)$")
+
+
+def parse_script(
+    script: str, speakers: Optional[Iterable[str]] = None
+) -> list[tuple[str, str]]:
+    """Parse a dialogue script of ``Speaker: text`` lines into (speaker, text) pairs.
+
+    Untagged lines, and lines tagged with a name not in ``speakers``, continue
+    the previous speaker's line. Blank lines are ignored.
+    """
+    known = set(speakers) if speakers is not None else None
+    lines: list[tuple[str, str]] = []
+    for raw in script.splitlines():
+        if not raw.strip():
+            continue
+        match = _SPEAKER_LINE.match(raw)
+        if (
+            match
+            and match.group(2).strip()
+            and (known is None or match.group(1) in known)
+        ):
+            lines.append((match.group(1), match.group(2).strip()))
+        elif lines:
+            speaker, text = lines[-1]
+            lines[-1] = (speaker, f"{text} {raw.strip()}")
+        else:
+            raise ValueError(
+                f"Script must start with a 'Speaker: text' line for a known speaker: "
+                f"{raw.strip()!r}"
+            )
+    return lines
+
+
+@dataclass(frozen=True)
+class Segment:
+    """A piece of text synthesized in a single TTS request.
+
+    Spoken by ``voice``, or by several speakers with Gemini's multi-speaker
+    config when ``speakers`` maps each speaker in the text to a voice.
+    """
+
+    text: str
+    voice: Optional[str] = None
+    speakers: tuple[tuple[str, str], ...] = ()
+
+
+def dialogue_segments(
+    lines: list[tuple[str, str]],
+    speakers: dict[str, str],
+    multi_speaker: bool,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+) -> list[Segment]:
+    """Plan the TTS requests for a dialogue.
+
+    With ``multi_speaker`` consecutive lines are packed into segments of at
+    most ``max_chars``, each voiced with the multi-speaker config. Otherwise
+    each speaker's turn is synthesized separately in its own voice.
+    """
+    if multi_speaker:
+        voices = tuple(sorted((s, str(speakers[s])) for s in {s for s, _ in lines}))
+        segments, current = [], []
+        for speaker, text in lines:
+            for part in split_text(text, max_chars):
+                line = f"{speaker}: {part}"
+                if current and len("\n".join(current)) + 1 + len(line) > max_chars:
+                    segments.append(Segment("\n".join(current), speakers=voices))
+                    current = []
+                current.append(line)
+        if current:
+            segments.append(Segment("\n".join(current), speakers=voices))
+        return segments
+
+    # Merge consecutive lines by the same speaker into one turn
+    turns: list[tuple[str, str]] = []
+    for speaker, text in lines:
+        if turns and turns[-1][0] == speaker:
+            turns[-1] = (speaker, f"{turns[-1][1]} {text}")
+        else:
+            turns.append((speaker, text))
+    return [
+        Segment(chunk, voice=str(speakers[speaker]))
+        for speaker, text in turns
+        for chunk in split_text(text, max_chars)
+    ]
+
+
+@dataclass(frozen=True)
+class PcmFormat:
+    """Layout of raw PCM audio."""
+
+    sample_rate: int = PCM_SAMPLE_RATE
+    channels: int = PCM_CHANNELS
+    sample_width: int = PCM_SAMPLE_WIDTH
+
+
+_L_PCM = re.compile(r"^audio/L(\d+)$", re.IGNORECASE)
+
+
+def parse_pcm_mime_type(mime_type: Optional[str]) -> PcmFormat:
+    """Parse e.g. ``audio/L16;codec=pcm;rate=24000`` into a PcmFormat.
+
+    Missing parts fall back to Gemini's defaults (24 kHz, mono, 16-bit).
+    """
+    if not mime_type:
+        return PcmFormat()
+    media_type, *params = [p.strip() for p in mime_type.split(";")]
+    values = {}
+    for param in params:
+        name, _, value = param.partition("=")
+        values[name.strip().lower()] = value.strip()
+
+    match = _L_PCM.match(media_type)
+    sample_width = int(match.group(1)) // 8 if match else PCM_SAMPLE_WIDTH
+    try:
+        return PcmFormat(
+            sample_rate=int(values.get("rate", PCM_SAMPLE_RATE)),
+            channels=int(values.get("channels", PCM_CHANNELS)),
+            sample_width=sample_width,
+        )
+    except ValueError:
+        raise ValueError(f"Unsupported audio mime type: {mime_type}")
+
+
+def wav_header(data_size: int, pcm_format: Optional[PcmFormat] = None) -> bytes:
+    """Return the 44-byte RIFF/WAVE header for ``data_size`` bytes of PCM."""
+    pcm_format = pcm_format or PcmFormat()
+    channels = pcm_format.channels
+    sample_rate = pcm_format.sample_rate
+    sample_width = pcm_format.sample_width
+    block_align = channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,  # fmt chunk size
+        1,  # PCM
+        channels,
+        sample_rate,
+        sample_rate * block_align,
+        block_align,
+        sample_width * 8,
+        b"data",
+        data_size,
+    )
+
+
+class AudioFormat(StrEnum):
+    """Output formats for generated speech."""
+
+    WAV = "wav"
+    FLAC = "flac"
+    OGG = "ogg"  # Opus in an Ogg container
+    MP3 = "mp3"
+
+
+# ffmpeg codec, container and default bitrate for each compressed format
+_FFMPEG_CODECS = {
+    AudioFormat.FLAC: ("flac", "flac", None),
+    AudioFormat.OGG: ("libopus", "ogg", "32k"),
+    AudioFormat.MP3: ("libmp3lame", "mp3", "64k"),
+}
+
+_PCM_SAMPLE_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+
+def get_audio_format(fmt: Optional[AudioFormat] = None) -> AudioFormat:
+    """Resolve the requested output format, defaulting to GEMINI_AUDIO_FORMAT."""
+    if fmt:
+        return AudioFormat(fmt)
+    return AudioFormat(os.environ.get("GEMINI_AUDIO_FORMAT", AudioFormat.WAV))
+
+
+def find_encoder() -> Optional[str]:
+    """Return the path of the ffmpeg binary (GEMINI_FFMPEG or ffmpeg on PATH)."""
+    return shutil.which(os.environ.get("GEMINI_FFMPEG", "ffmpeg"))
+
+
+def check_encoder(fmt: AudioFormat) -> Optional[str]:
+    """Return the encoder for a format, or raise ValueError if none is installed."""
+    if fmt == AudioFormat.WAV:
+        return None
+    encoder = find_encoder()
+    if not encoder:
+        raise ValueError(
+            f"Audio format '{fmt}' requires ffmpeg, which was not found. "
+            "Install ffmpeg, set GEMINI_FFMPEG, or use output_format 'wav'."
+        )
+    return encoder
+
+
+def _ffmpeg_args(encoder: str, fmt: AudioFormat, inputs: list[str]) -> list[str]:
+    codec, container, bitrate = _FFMPEG_CODECS[fmt]
+    args = [encoder, "-hide_banner", "-loglevel", "error", "-y", *inputs]
+    args += ["-vn", "-c:a", codec]
+    bitrate = os.environ.get("GEMINI_AUDIO_BITRATE") or bitrate
+    if bitrate and fmt != AudioFormat.FLAC:
+        args += ["-b:a", bitrate]
+    return args + ["-f", container]
+
+
+async def _run_encoder(args: list[str], stdin: Optional[bytes] = None) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await process.communicate(stdin)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = stderr.decode(errors="replace").strip()
+        raise ValueError(f"Audio encoding failed: {message or process.returncode}")
+    return stdout
+
+
+async def encode_pcm(pcm: bytes, pcm_format: PcmFormat, fmt: AudioFormat) -> bytes:
+    """Encode raw PCM into a compressed format with ffmpeg."""
+    encoder = check_encoder(fmt)
+    sample_format = _PCM_SAMPLE_FORMATS.get(pcm_format.sample_width)
+    if not sample_format:
+        raise ValueError(f"Unsupported PCM sample width: {pcm_format.sample_width}")
+    inputs = [
+        "-f", sample_format,
+        "-ar", str(pcm_format.sample_rate),
+        "-ac", str(pcm_format.channels),
+        "-i", "pipe:0",
+    ]  # fmt: skip
+    return await _run_encoder(_ffmpeg_args(encoder, fmt, inputs) + ["pipe:1"], pcm)
+
+
+async def transcode_file(src_path: str, dest_path: str, fmt: AudioFormat) -> None:
+    """Encode an audio file (e.g. a long-form WAV) into a compressed format."""
+    encoder = check_encoder(fmt)
+    await _run_encoder(_ffmpeg_args(encoder, fmt, ["-i", src_path]) + [dest_path])
@@ -0,0 +1,201 @@
+"""Gemini Batch API jobs: request sources, local job manifests and results."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from enum import StrEnum
+from typing import Optional
+
+from .lazy import lazy_import
+from .paths import get_download_path
+from .storage import get_writer
+
+
+genai = lazy_import("google.genai")
+types = lazy_import("google.genai.types")
+
+# Inline batch requests are limited to 20 MB, larger jobs are uploaded as JSONL
+DEFAULT_INLINE_BYTES = 10 * 1024 * 1024
+
+# types.JobState values, which compare equal to their names
+DONE_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+SUCCEEDED_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+}
+
+# (contents, config) of one generate_content request
+Request = tuple[str, "types.GenerateContentConfig"]
+# The response to one request, or why it failed
+Result = tuple[Optional["types.GenerateContentResponse"], Optional[str]]
+
+
+class BatchKind(StrEnum):
+    """What a batch job generates."""
+
+    IMAGE = "image"
+    SPEECH = "speech"
+
+
+@dataclass
+class BatchManifest:
+    """A submitted batch job, kept locally to map its results back to prompts."""
+
+    name: str
+    kind: BatchKind
+    model: str
+    prompts: list[str]
+    params: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    results: Optional[list[dict]] = None  # set once the results are saved
+    key_id: Optional[str] = None  # fingerprint of the API key that submitted it
+
+
+def manifest_path(name: str) -> str:
+    """Path of a job's manifest, e.g. batches/batches_123.json for batches/123."""
+    file_name = name.replace("/", "_") + ".json"
+    return os.path.join(get_download_path("batches", create=False), file_name)
+
+
+async def save_manifest(manifest: BatchManifest) -> None:
+    path = manifest_path(manifest.name)
+    writer = get_writer()
+    writer.write_json(path, asdict(manifest))
+    await writer.wait_for(path)
+
+
+def _read_json(path: str) -> dict:
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+async def load_manifest(name: str) -> BatchManifest:
+    """Load a job's manifest, raising ValueError if it wasn't submitted from here."""
+    try:
+        data = await asyncio.to_thread(_read_json, manifest_path(name))
+    except FileNotFoundError:
+        raise ValueError(f"Unknown batch job: {name}")
+    data["kind"] = BatchKind(data["kind"])
+    return BatchManifest(**data)
+
+
+def request_line(key: str, contents: str, config: types.GenerateContentConfig) -> dict:
+    """A JSONL batch input line for a request, in the REST format."""
+    return {
+        "key": key,
+        "request": {
+            "contents": [{"role": "user", "parts": [{"text": contents}]}],
+            "generationConfig": config.model_dump(
+                mode="json", by_alias=True, exclude_none=True
+            ),
+        },
+    }
+
+
+def to_jsonl(requests: list[Request]) -> bytes:
+    lines = [
+        json.dumps(request_line(str(idx), contents, config))
+        for idx, (contents, config) in enumerate(requests)
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def create_source(
+    client: genai.Client, model: str, requests: list[Request], display_name: str
+) -> list[types.InlinedRequest] | str:
+    """Return the requests inline, or the name of an uploaded JSONL file if too large.
+
+    The limit is GEMINI_BATCH_INLINE_BYTES (default 10 MB).
+    """
+    jsonl = to_jsonl(requests)
+    max_inline = int(os.environ.get("GEMINI_BATCH_INLINE_BYTES", DEFAULT_INLINE_BYTES))
+    if len(jsonl) <= max_inline:
+        return [
+            types.InlinedRequest(
+                model=model, contents=contents, config=config, metadata={"key": str(i)}
+            )
+            for i, (contents, config) in enumerate(requests)
+        ]
+    file = await client.aio.files.upload(
+        file=io.BytesIO(jsonl),
+        config=types.UploadFileConfig(mime_type="jsonl", display_name=display_name),
+    )
+    return file.name
+
+
+def _error_message(error) -> str:
+    if isinstance(error, dict):
+        return str(error.get("message") or error)
+    return str(getattr(error, "message", None) or error)
+
+
+def parse_jsonl(data: bytes, count: int) -> list[Result]:
+    """Parse a JSONL results file, ordered by each line's request key."""
+    results: list[Result] = [(None, "No response")] * count
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        idx = int(entry.get("key", -1))
+        if not 0 <= idx < count:
+            continue
+        if entry.get("error") or "response" not in entry:
+            results[idx] = (None, _error_message(entry.get("error", "No response")))
+            continue
+        # Validated from JSON so that inline data is base64-decoded
+        candidates = [
+            types.Candidate(
+                content=types.Content.model_validate_json(json.dumps(c["content"]))
+            )
+            for c in entry["response"].get("candidates", [])
+            if c.get("content")
+        ]
+        results[idx] = (types.GenerateContentResponse(candidates=candidates), None)
+    return results
+
+
+async def load_results(
+    client: genai.Client, job: types.BatchJob, count: int
+) -> list[Result]:
+    """Return the response or error for each request of a finished job, in order."""
+    dest = job.dest
+    if dest and dest.inlined_responses is not None:
+        results: list[Result] = [
+            (r.response, _error_message(r.error) if r.error else None)
+            for r in dest.inlined_responses
+        ]
+        results += [(None, "No response")] * (count - len(results))
+        return results[:count]
+    if dest and dest.file_name:
+        data = await client.aio.files.download(file=dest.file_name)
+        return parse_jsonl(data, count)
+    raise ValueError(f"Batch job {job.name} has no results")
+
+
+def job_summary(job: types.BatchJob) -> dict:
+    """JSON-friendly status of a batch job."""
+    state = job.state.value if job.state else "JOB_STATE_UNSPECIFIED"
+    summary = {
+        "name": job.name,
+        "display_name": job.display_name,
+        "state": state.removeprefix("JOB_STATE_").lower(),
+        "done": state in DONE_STATES,
+        "create_time": job.create_time.isoformat() if job.create_time else None,
+        "end_time": job.end_time.isoformat() if job.end_time else None,
+    }
+    if job.completion_stats:
+        summary["completion_stats"] = job.completion_stats.model_dump(exclude_none=True)
+    if job.error:
+        summary["error"] = _error_message(job.error)
+    return summary
@@ -0,0 +1,253 @@
+"""Opt-in content-addressed cache for generated images and audio."""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .paths import get_download_root
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60  # 7 days (in seconds)
+
+
+def cache_key(tool: str, **params) -> str:
+    """Return a stable hash of a tool name and its normalized generation parameters.
+
+    Enum values are reduced to their string values and surrounding whitespace
+    is stripped from strings.
+    """
+    normalized = {
+        k: str(v).strip() if isinstance(v, str) else v for k, v in params.items()
+    }
+    payload = json.dumps(
+        {"tool": tool, **normalized},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    path: str
+    size: int
+    used: float
+
+
+class ResultCache:
+    """On-disk LRU cache of generated files bounded by total size and age.
+
+    Entries are stored as ``<root>/<key[:2]>/<key>.<format>``. A file's
+    mtime records when it was last used, so the index can be rebuilt from
+    disk and least recently used entries are evicted first. Worker processes
+    sharing the directory each keep their own index, so a miss checks the
+    disk for an entry stored by another process, and storing an entry
+    re-measures the whole directory before evicting.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        self._scan()
+        self._evict()
+
+    def _scan(self) -> None:
+        """Rebuild the index from disk, including entries stored by other workers."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, name.split(".", 1)[0], path, st.st_size))
+        self._entries.clear()
+        self._total_bytes = 0
+        for used, key, path, size in sorted(found):
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key).size
+            self._entries[key] = _Entry(path=path, size=size, used=used)
+            self._total_bytes += size
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+        self.evictions += 1
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.max_age
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if self._total_bytes <= self.max_bytes and entry.used >= cutoff:
+                break
+            self._remove(key)
+
+    def _find(self, key: str) -> Optional[_Entry]:
+        """Index an entry stored on disk by another process."""
+        dir_path = os.path.join(self.root, key[:2])
+        try:
+            names = os.listdir(dir_path)
+        except OSError:
+            return None
+        for name in names:
+            if name.startswith(f"{key}.") and not name.endswith(".tmp"):
+                path = os.path.join(dir_path, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entry = _Entry(path=path, size=st.st_size, used=st.st_mtime)
+                self._entries[key] = entry
+                self._total_bytes += entry.size
+                return entry
+        return None
+
+    def get(self, key: str) -> Optional[tuple[bytes, str, str]]:
+        """Return ``(data, format, path)`` for a cached result, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key) or self._find(key)
+            if entry is not None and entry.used < time.time() - self.max_age:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._entries.pop(key)
+                self._total_bytes -= entry.size
+                self.misses += 1
+                return None
+            entry.used = time.time()
+            try:
+                os.utime(entry.path, (entry.used, entry.used))
+            except OSError:
+                pass
+            self._entries.move_to_end(key)
+            self.hits += 1
+            fmt = os.path.splitext(entry.path)[1].lstrip(".")
+            return data, fmt, entry.path
+
+    def put(self, key: str, data: bytes, fmt: str) -> None:
+        """Store a result, evicting least recently used entries if over budget."""
+        if len(data) > self.max_bytes:
+            return
+        dir_path = os.path.join(self.root, key[:2])
+        os.makedirs(dir_path, exist_ok=True)
+        path = os.path.join(dir_path, f"{key}.{fmt}")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None and old.path != path:
+                try:
+                    os.remove(old.path)
+                except OSError:
+                    pass
+            # Workers share the directory, so the limit applies to all of it
+            self._scan()
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_config: Optional[tuple] = None
+_cache_lock = threading.Lock()
+
+
+def _is_enabled() -> bool:
+    return os.environ.get("GEMINI_CACHE", "").lower() in ("1", "true", "yes", "on")
+
+
+def get_cache() -> Optional[ResultCache]:
+    """Return the shared result cache, or None when GEMINI_CACHE is not enabled."""
+    global _cache, _cache_config
+    if not _is_enabled():
+        return None
+    root = os.path.join(get_download_root(), "cache")
+    config = (
+        root,
+        int(os.environ.get("GEMINI_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        float(os.environ.get("GEMINI_CACHE_MAX_AGE", DEFAULT_MAX_AGE)),
+    )
+    with _cache_lock:
+        if _cache is None or _cache_config != config:
+            _cache = ResultCache(*config)
+            _cache_config = config
+        return _cache
+
+
+async def lookup(key: str) -> tuple[Optional[ResultCache], Optional[tuple[bytes, str, str]]]:
+    """Return the shared cache and its result for ``key``, or None for either.
+
+    Opening the cache walks its directory and a hit reads the file, so both
+    happen off the event loop.
+    """
+    if not _is_enabled():
+        return None, None
+
+    def find() -> tuple[Optional[ResultCache], Optional[tuple[bytes, str, str]]]:
+        cache = get_cache()
+        return cache, cache.get(key) if cache else None
+
+    return await asyncio.to_thread(find)
+
+
+def get_cache_stats() -> dict:
+    """Return hit/miss counters for the result cache."""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+def reset_cache() -> None:
+    """Drop the shared cache instance (used by tests)."""
+    global _cache, _cache_config
+    with _cache_lock:
+        _cache = None
+        _cache_config = None
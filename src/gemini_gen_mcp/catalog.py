@@ -0,0 +1,215 @@
+"""SQLite catalog of generated files."""
+
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from .paths import get_download_root
+
+
+# e.g. 1737000000000-9f2c4e1a or 1737000000000-9f2c4e1a_2
+GENERATION_ID = re.compile(r"^\d{13}-[0-9a-f]{8}(_\d+)?$")
+
+
+def new_generation_id() -> str:
+    """Return a unique, time-sortable ID for a generation."""
+    return f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+
+
+@dataclass
+class GenerationRecord:
+    """Catalog entry for one generated file."""
+
+    id: str
+    tool: str
+    kind: str  # "image" or "audio"
+    model: str
+    prompt: str
+    path: Optional[str]
+    format: str
+    size: int
+    latency_ms: float
+    params: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    tool TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    params TEXT NOT NULL,
+    path TEXT,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    latency_ms REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_created_at ON generations (created_at);
+CREATE INDEX IF NOT EXISTS generations_kind_model ON generations (kind, model, created_at);
+"""
+
+_COLUMNS = [
+    "id",
+    "created_at",
+    "tool",
+    "kind",
+    "model",
+    "prompt",
+    "params",
+    "path",
+    "format",
+    "size",
+    "latency_ms",
+]
+
+
+class Catalog:
+    """Indexed record of every generation, stored in ``catalog.db``.
+
+    Records are inserted as files are saved and only removed along with
+    their files, so concurrent writers (threads or processes sharing the
+    download directory) never conflict.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, record: GenerationRecord) -> None:
+        row = asdict(record)
+        row["model"] = str(record.model)
+        row["params"] = json.dumps(record.params, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO generations ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                [row[c] for c in _COLUMNS],
+            )
+
+    def remove_paths(self, paths: list[str]) -> int:
+        """Remove the records of deleted files, returning how many were removed."""
+        removed = 0
+        with self._lock, self._conn:
+            for path in paths:
+                cursor = self._conn.execute(
+                    "DELETE FROM generations WHERE path = ?", (path,)
+                )
+                removed += cursor.rowcount
+        return removed
+
+    def move_path(self, old: str, new: str, format: str, size: int) -> int:
+        """Point the records of a re-encoded file at its new path."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE generations SET path = ?, format = ?, size = ? WHERE path = ?",
+                (new, format, size, old),
+            )
+            return cursor.rowcount
+
+    def get(self, id: str) -> Optional[dict]:
+        """Return the record with the given ID, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM generations WHERE id = ?", (id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(_COLUMNS, row))
+        record["params"] = json.loads(record["params"])
+        return record
+
+    def query(
+        self,
+        text: Optional[str] = None,
+        kind: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict]:
+        """Return matching records, newest first."""
+        where, args = [], []
+        if text:
+            where.append("prompt LIKE ? ESCAPE '\\'")
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            args.append(f"%{escaped}%")
+        if kind:
+            where.append("kind = ?")
+            args.append(kind)
+        if model:
+            where.append("model = ?")
+            args.append(str(model))
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM generations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+        args += [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        results = []
+        for row in rows:
+            record = dict(zip(_COLUMNS, row))
+            record["params"] = json.loads(record["params"])
+            results.append(record)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(root: Optional[str] = None) -> Catalog:
+    """Return the catalog for the given (or current) download directory."""
+    global _catalog
+    path = os.path.join(root or get_download_root(), "catalog.db")
+    with _catalog_lock:
+        if _catalog is None or _catalog.path != path:
+            if _catalog is not None:
+                _catalog.close()
+            _catalog = Catalog(path)
+        return _catalog
+
+
+def record_generation(record: GenerationRecord, root: Optional[str] = None) -> None:
+    """Add a record to the catalog (blocking, run it on the background writer)."""
+    get_catalog(root).add(record)
+
+
+def forget_paths(paths: list[str], root: Optional[str] = None) -> None:
+    """Remove the records of deleted files (blocking, run it on the background writer)."""
+    if paths:
+        get_catalog(root).remove_paths(paths)
+
+
+def reset_catalog() -> None:
+    """Close the shared catalog (used by tests)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            _catalog.close()
+        _catalog = None
@@ -0,0 +1,165 @@
+"""Process-wide pool of Gemini API clients with keep-alive connection reuse."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from .lazy import lazy_import
+
+
+genai = lazy_import("google.genai")
+
+DEFAULT_TIMEOUT_MS = 120000  # 120 seconds (in milliseconds)
+
+
+@dataclass
+class ClientStats:
+    """Counters for client construction and HTTP connection reuse."""
+
+    clients_created: int = 0
+    clients_reused: int = 0
+    requests: int = 0
+    new_connections: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "clients_created": self.clients_created,
+            "clients_reused": self.clients_reused,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+        }
+
+
+@dataclass
+class _PooledClient:
+    client: genai.Client
+    http_client: httpx.AsyncClient
+    loop: Optional[asyncio.AbstractEventLoop]
+
+
+_stats = ClientStats()
+_pool: dict[tuple, _PooledClient] = {}
+_lock = threading.Lock()
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    # httpcore only emits connect_tcp when it opens a new connection,
+    # requests served from a kept-alive connection skip it.
+    if event_name == "connection.connect_tcp.started":
+        _stats.new_connections += 1
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats.requests += 1
+    request.extensions["trace"] = _trace
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=int(os.environ.get("GEMINI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(
+            os.environ.get("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20")
+        ),
+        keepalive_expiry=float(os.environ.get("GEMINI_KEEPALIVE_EXPIRY", "60")),
+    )
+    return httpx.AsyncClient(limits=limits, event_hooks={"request": [_on_request]})
+
+
+def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _close_later(entry: _PooledClient) -> None:
+    """Close a client's connections on the event loop they were opened on.
+
+    Connections can only be closed by their own loop, so this is scheduled
+    on it without waiting. If that loop has stopped, they went with it.
+    """
+    loop = entry.loop
+    if loop is not None and loop.is_running() and loop is not _current_loop():
+        asyncio.run_coroutine_threadsafe(entry.http_client.aclose(), loop)
+
+
+def get_client(api_key: str, timeout_ms: int = DEFAULT_TIMEOUT_MS) -> genai.Client:
+    """Return a shared client for the given config, creating it on first use.
+
+    Clients are keyed by API key, timeout and base URL and reuse one
+    keep-alive HTTP connection pool. A client is rebuilt when it was created
+    on a different event loop, as pooled connections are bound to their loop.
+    """
+    base_url = os.environ.get("GEMINI_BASE_URL") or None
+    key = (api_key, timeout_ms, base_url)
+    loop = _current_loop()
+
+    with _lock:
+        entry = _pool.get(key)
+        if entry is not None and entry.loop is loop:
+            _stats.clients_reused += 1
+            return entry.client
+        if entry is not None:
+            _close_later(entry)
+
+        http_client = _create_http_client()
+        http_options = {"timeout": timeout_ms, "httpx_async_client": http_client}
+        if base_url:
+            http_options["base_url"] = base_url
+        client = genai.Client(api_key=api_key, http_options=http_options)
+        _pool[key] = _PooledClient(client=client, http_client=http_client, loop=loop)
+        _stats.clients_created += 1
+        return client
+
+
+def get_timeout(model: str, timeout: Optional[float] = None) -> float:
+    """Return the seconds a request to ``model`` may take before it's aborted.
+
+    An explicit ``timeout`` wins over the model's entry in GEMINI_TIMEOUTS
+    (JSON, e.g. ``{"gemini-3-pro-image-preview": 300}``) and GEMINI_TIMEOUT.
+    """
+    if timeout is None:
+        timeout = float(os.environ.get("GEMINI_TIMEOUT", DEFAULT_TIMEOUT_MS / 1000))
+        overrides = os.environ.get("GEMINI_TIMEOUTS")
+        if overrides:
+            timeout = float(json.loads(overrides).get(str(model), timeout))
+    if timeout <= 0:
+        raise ValueError(f"Timeout must be positive, got {timeout}")
+    return timeout
+
+
+def get_client_stats() -> dict:
+    """Return client and connection reuse counters."""
+    return _stats.to_dict()
+
+
+async def close_clients() -> None:
+    """Close all pooled clients and their HTTP connections."""
+    with _lock:
+        entries = list(_pool.values())
+        _pool.clear()
+    for entry in entries:
+        if entry.loop is _current_loop():
+            await entry.http_client.aclose()
+        else:
+            _close_later(entry)
+
+
+def reset_clients() -> None:
+    """Drop all pooled clients and reset counters (used by tests)."""
+    global _stats
+    with _lock:
+        _pool.clear()
+        _stats = ClientStats()
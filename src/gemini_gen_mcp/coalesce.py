@@ -0,0 +1,90 @@
+"""Single-flight coalescing of concurrent identical generation requests."""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, sharing its result with duplicates.
+
+    The call runs in its own task, so it isn't cancelled while any caller
+    is still waiting for it. It's only cancelled once every caller has
+    given up.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            self.calls += 1
+
+            def done(_):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+            flight.task.add_done_callback(done)
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Forget it now, or a new caller could join it while it's cancelled
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
+
+
+_single_flight = SingleFlight()
+
+
+async def coalesce(key: str, fn: Callable[[], Awaitable[T]]) -> T:
+    """Run ``fn``, or join an identical call already in flight.
+
+    Set GEMINI_COALESCE=0 to disable.
+    """
+    if os.environ.get("GEMINI_COALESCE", "1").lower() in ("0", "false", "no", "off"):
+        return await fn()
+    return await _single_flight.do(key, fn)
+
+
+def get_coalescing_stats() -> dict:
+    """Return how many calls ran and how many joined an in-flight call."""
+    return _single_flight.stats()
+
+
+def reset_coalescing() -> None:
+    """Reset coalescing state (used by tests)."""
+    global _single_flight
+    _single_flight = SingleFlight()
@@ -0,0 +1,156 @@
+"""Model fallback chains and hedged requests, to cut the latency tail."""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .lazy import lazy_import
+from .metrics import get_metrics
+from .ratelimit import RETRYABLE_CODES
+
+
+errors = lazy_import("google.genai.errors")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+# Metrics phase timing a single HTTP request, without queueing or retries
+REQUEST_PHASE = "request"
+
+_OFF = ("", "0", "false", "no", "off")
+_ON = ("1", "true", "yes", "on")
+
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _count(model: str, counter: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(
+            str(model), {"fallbacks": 0, "hedged": 0, "hedge_wins": 0}
+        )
+        counters[counter] += 1
+
+
+def get_fallbacks(model: str, defaults: dict[str, list[str]]) -> list[str]:
+    """Models to try, in order, when a request to ``model`` fails.
+
+    GEMINI_FALLBACKS is ``0`` (the default) for none, ``1`` for the built-in
+    ``defaults``, or JSON mapping models to their fallbacks, e.g.
+    ``{"gemini-3-pro-image-preview": ["gemini-2.5-flash-image"]}``.
+    """
+    value = os.environ.get("GEMINI_FALLBACKS", "0").strip()
+    if value.lower() in _OFF:
+        return []
+    chains = defaults if value.lower() in _ON else json.loads(value)
+    return [str(m) for m in chains.get(str(model), []) if str(m) != str(model)]
+
+
+def should_fall_back(error: Exception) -> bool:
+    """Whether another model might succeed: timeouts, throttling and 5xx errors."""
+    if isinstance(error, TimeoutError):
+        return True
+    return isinstance(error, errors.APIError) and error.code in RETRYABLE_CODES
+
+
+async def with_fallback(
+    models: list[str], fn: Callable[[str], Awaitable[T]]
+) -> tuple[T, str]:
+    """Call ``fn`` with each model in turn until one succeeds.
+
+    Returns the result and the model that produced it. Errors other than
+    timeouts, throttling and 5xx (e.g. an invalid request) aren't retried on
+    the next model.
+    """
+    for idx, model in enumerate(models):
+        try:
+            return await fn(model), model
+        except Exception as e:
+            if idx == len(models) - 1 or not should_fall_back(e):
+                raise
+            _count(models[0], "fallbacks")
+            logger.warning(
+                "%s failed, falling back to %s: %s", model, models[idx + 1], e
+            )
+    raise ValueError("No models to try")
+
+
+def hedge_delay(model: str) -> Optional[float]:
+    """Seconds to wait before hedging a request to ``model``, or None to not hedge.
+
+    Hedging is enabled with GEMINI_HEDGE=1. The delay is GEMINI_HEDGE_DELAY
+    if set, otherwise the GEMINI_HEDGE_PERCENTILE (default p95) of the
+    model's request latency once GEMINI_HEDGE_MIN_SAMPLES requests have
+    been measured.
+    """
+    if os.environ.get("GEMINI_HEDGE", "0").strip().lower() in _OFF:
+        return None
+    fixed = os.environ.get("GEMINI_HEDGE_DELAY")
+    if fixed:
+        return float(fixed)
+    q = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE))
+    min_samples = int(
+        os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", DEFAULT_HEDGE_MIN_SAMPLES)
+    )
+    count, value_ms = get_metrics().percentile(REQUEST_PHASE, q, model)
+    if count < max(min_samples, 1):
+        return None
+    return value_ms / 1000
+
+
+async def hedged(
+    model: str,
+    fn: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    admit: Optional[Callable[[], bool]] = None,
+) -> T:
+    """Await ``fn()``, starting a duplicate if it's still running after ``delay``.
+
+    The duplicate is only started if ``admit()`` (e.g. the rate limiter
+    having a free slot) allows it. The first call to succeed wins and the
+    other is cancelled. The call only fails if both do.
+    """
+    if delay is None:
+        return await fn()
+
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and (admit is None or admit()):
+            _count(model, "hedged")
+            tasks.append(asyncio.ensure_future(fn()))
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        _count(model, "hedge_wins")
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_hedging_stats() -> dict[str, dict[str, int]]:
+    """Return fallback and hedging counters per (requested) model."""
+    with _stats_lock:
+        return {model: dict(counters) for model, counters in _stats.items()}
+
+
+def reset_hedging() -> None:
+    """Clear the counters (used by tests)."""
+    with _stats_lock:
+        _stats.clear()
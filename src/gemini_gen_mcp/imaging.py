@@ -0,0 +1,128 @@
+"""Image post-processing (resizing, re-encoding, thumbnails) off the event loop."""
+
+import asyncio
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Optional
+
+
+DEFAULT_QUALITY = 80
+
+
+class ImageFormat(StrEnum):
+    """Output formats for post-processed images."""
+
+    PNG = "png"
+    JPEG = "jpeg"
+    WEBP = "webp"
+    AVIF = "avif"
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A downscaled and/or re-encoded rendition of an image."""
+
+    max_dim: Optional[int]
+    format: ImageFormat
+    quality: int = DEFAULT_QUALITY
+
+
+def render_variants(data: bytes, variants: list[Variant]) -> list[bytes]:
+    """Decode an image once and encode each variant (runs in a worker process)."""
+    from PIL import Image as PILImage
+
+    results = []
+    with PILImage.open(io.BytesIO(data)) as original:
+        original.load()
+        for variant in variants:
+            img = original
+            if variant.max_dim and max(img.size) > variant.max_dim:
+                img = img.copy()
+                img.thumbnail(
+                    (variant.max_dim, variant.max_dim), PILImage.Resampling.LANCZOS
+                )
+            if variant.format == ImageFormat.JPEG and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            options = {}
+            if variant.format == ImageFormat.PNG:
+                options["optimize"] = True
+            else:
+                options["quality"] = variant.quality
+
+            out = io.BytesIO()
+            img.save(out, format=variant.format.upper(), **options)
+            results.append(out.getvalue())
+    return results
+
+
+def check_pillow(formats: tuple[ImageFormat, ...] = ()) -> None:
+    """Raise ValueError if Pillow isn't installed or can't encode one of ``formats``."""
+    try:
+        from PIL import features
+    except ImportError:
+        raise ValueError(
+            "Image post-processing requires Pillow: pip install 'gemini-gen-mcp[images]'"
+        )
+    # AVIF support was added in Pillow 11.2, and needs a build with libavif
+    if ImageFormat.AVIF in formats and not features.check("avif"):
+        raise ValueError(
+            "AVIF output requires Pillow 11.2 or later built with libavif: "
+            "pip install -U 'gemini-gen-mcp[images]'"
+        )
+
+
+def get_quality(quality: Optional[int] = None) -> int:
+    """Resolve the requested quality (1-100), defaulting to GEMINI_IMAGE_QUALITY."""
+    quality = quality or int(os.environ.get("GEMINI_IMAGE_QUALITY", DEFAULT_QUALITY))
+    if not 1 <= quality <= 100:
+        raise ValueError(f"Image quality must be between 1 and 100, got {quality}")
+    return quality
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Optional[Executor]:
+    """Return the shared worker process pool, or None when GEMINI_IMAGE_WORKERS=0.
+
+    Workers are spawned rather than forked, as forking a process that's
+    running threads and an event loop isn't safe.
+    """
+    global _pool
+    workers = int(os.environ.get("GEMINI_IMAGE_WORKERS", min(os.cpu_count() or 1, 4)))
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+async def process_image(data: bytes, variants: list[Variant]) -> list[bytes]:
+    """Render image variants in the process pool (or a thread if it's disabled)."""
+    check_pillow(tuple(variant.format for variant in variants))
+    pool = get_pool()
+    if pool is None:
+        return await asyncio.to_thread(render_variants, data, variants)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, render_variants, data, variants)
+
+
+@atexit.register
+def shutdown_pool() -> None:
+    """Stop the worker processes."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
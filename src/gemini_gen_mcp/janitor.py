@@ -0,0 +1,337 @@
+"""Background cleanup of the download directory: retention, size caps and compaction."""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from .audio import AudioFormat, find_encoder, transcode_file
+from .catalog import forget_paths, get_catalog
+from .paths import get_download_root
+from .storage import get_writer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INTERVAL = 3600  # seconds between sweeps
+# Generations younger than this are never touched, they may still be in use
+MIN_AGE = 300
+GENERATED_DIRS = ("images", "audios")
+
+# Files of a generation start with its ID, e.g. 1737000000000-9f2c4e1a_2.png,
+# 1737000000000-9f2c4e1a.info.json or 1737000000000-9f2c4e1a.thumb.jpeg.
+# Files saved by earlier versions are named by the timestamp alone, e.g.
+# 1737000000000.wav and 1737000000000.info.json.
+_GENERATION_FILE = re.compile(r"^(\d{13})(?:-[0-9a-f]{8})?(?=[._])")
+
+
+@dataclass
+class Generation:
+    """The files of one generation: artifacts, renditions and .info.json sidecar."""
+
+    id: str
+    created_at: float
+    dir: str
+    files: dict[str, int] = field(default_factory=dict)  # path -> size
+
+    @property
+    def size(self) -> int:
+        return sum(self.files.values())
+
+
+@dataclass
+class JanitorStats:
+    runs: int = 0
+    skipped: int = 0  # another process was already sweeping
+    removed: int = 0  # generations
+    removed_files: int = 0
+    freed_bytes: int = 0
+    compressed: int = 0
+    compressed_saved_bytes: int = 0
+    errors: int = 0
+    total_bytes: int = 0  # size of all generations after the last sweep
+    last_run: Optional[float] = None
+    last_duration_ms: float = 0.0
+
+
+def scan(root: str) -> list[Generation]:
+    """Find every generation under images/ and audios/, oldest first."""
+    generations: dict[tuple[str, str], Generation] = {}
+    for sub_dir in GENERATED_DIRS:
+        try:
+            day_dirs = sorted(os.scandir(os.path.join(root, sub_dir)), key=lambda e: e.name)
+        except FileNotFoundError:
+            continue
+        for day_dir in day_dirs:
+            if not day_dir.is_dir():
+                continue
+            for entry in os.scandir(day_dir.path):
+                match = _GENERATION_FILE.match(entry.name)
+                if not match or entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue  # removed meanwhile
+                gen_id = entry.name[: match.end()]
+                key = (day_dir.path, gen_id)
+                if key not in generations:
+                    generations[key] = Generation(
+                        id=gen_id,
+                        created_at=int(match.group(1)) / 1000,
+                        dir=day_dir.path,
+                    )
+                generations[key].files[entry.path] = size
+    return sorted(generations.values(), key=lambda g: (g.created_at, g.id))
+
+
+def _remove(generation: Generation) -> list[str]:
+    removed = []
+    for path in generation.files:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _remove_empty_dirs(root: str) -> None:
+    for sub_dir in GENERATED_DIRS:
+        try:
+            entries = list(os.scandir(os.path.join(root, sub_dir)))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                os.rmdir(entry.path)  # only succeeds if it's empty
+            except OSError:
+                pass
+
+
+def _update_sidecar(generation: Generation, fmt: AudioFormat) -> None:
+    path = os.path.join(generation.dir, f"{generation.id}.info.json")
+    try:
+        with open(path, "rb") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return
+    info["format"] = fmt
+    # Written like every other sidecar, and before the sweep moves on
+    get_writer().write_json(path, info).result()
+
+
+def compress_audio(generation: Generation, fmt: AudioFormat, root: str) -> int:
+    """Re-encode a generation's WAV files as ``fmt``, returning the bytes saved."""
+    saved = 0
+    for path, size in list(generation.files.items()):
+        if not path.endswith(".wav"):
+            continue
+        dest = f"{path[: -len('.wav')]}.{fmt}"
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            asyncio.run(transcode_file(path, tmp_path, fmt))
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        new_size = os.path.getsize(dest)
+        get_catalog(root).move_path(path, dest, str(fmt), new_size)
+        os.remove(path)
+        del generation.files[path]
+        generation.files[dest] = new_size
+        _update_sidecar(generation, fmt)
+        saved += size - new_size
+    return saved
+
+
+def _get_config() -> tuple[float, int, float, AudioFormat]:
+    max_age = float(os.environ.get("GEMINI_DOWNLOAD_MAX_AGE", 0))
+    max_bytes = int(os.environ.get("GEMINI_DOWNLOAD_MAX_BYTES", 0))
+    compress_after = float(os.environ.get("GEMINI_COMPRESS_AUDIO_AFTER", 0))
+    fmt = AudioFormat(os.environ.get("GEMINI_COMPRESS_AUDIO_FORMAT", AudioFormat.FLAC))
+    if fmt == AudioFormat.WAV:
+        raise ValueError("GEMINI_COMPRESS_AUDIO_FORMAT must be a compressed format")
+    return max_age, max_bytes, compress_after, fmt
+
+
+def is_enabled() -> bool:
+    """Whether any retention, size cap or compaction is configured."""
+    return any(_get_config()[:3])
+
+
+_stats = JanitorStats()
+_stats_lock = threading.Lock()
+
+
+class _SweepLock:
+    """Non-blocking lock on the download directory, shared by worker processes."""
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, ".janitor.lock")
+        self._file = None
+
+    def __enter__(self) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __exit__(self, *exc) -> None:
+        if self._file is not None:
+            self._file.close()  # releases the lock
+
+
+def sweep(root: Optional[str] = None, now: Optional[float] = None) -> JanitorStats:
+    """Remove the oldest generations past GEMINI_DOWNLOAD_MAX_AGE or beyond
+    GEMINI_DOWNLOAD_MAX_BYTES, then compress the remaining old WAVs (blocking,
+    run it off the event loop).
+
+    Returns the stats of this sweep. All files of a generation are removed
+    together, along with their catalog records.
+    """
+    root = root or get_download_root()
+    max_age, max_bytes, compress_after, fmt = _get_config()
+    started = time.perf_counter()
+    now = now or time.time()
+    result = JanitorStats(runs=1, last_run=now)
+
+    with _SweepLock(root) as locked:
+        if not locked:
+            result.runs, result.skipped = 0, 1
+            return _record(result)
+
+        generations = scan(root)
+        total = sum(g.size for g in generations)
+        removed_paths: list[str] = []
+        for generation in generations:
+            age = now - generation.created_at
+            expired = max_age and age > max_age
+            over_cap = max_bytes and total > max_bytes
+            if age < MIN_AGE or not (expired or over_cap):
+                break  # oldest first, so nothing later qualifies either
+            paths = _remove(generation)
+            removed_paths += paths
+            total -= generation.size
+            result.removed += 1
+            result.removed_files += len(paths)
+            result.freed_bytes += generation.size
+        if removed_paths:
+            forget_paths(removed_paths, root)
+            _remove_empty_dirs(root)
+
+        # Only what's left is compressed, there's no point encoding files just removed
+        if compress_after and find_encoder():
+            cutoff = now - max(compress_after, MIN_AGE)
+            for generation in generations[result.removed :]:
+                if generation.created_at > cutoff:
+                    break
+                if not any(path.endswith(".wav") for path in generation.files):
+                    continue
+                try:
+                    saved = compress_audio(generation, fmt, root)
+                    result.compressed_saved_bytes += saved
+                    result.compressed += 1
+                    total -= saved
+                except Exception as e:
+                    result.errors += 1
+                    logger.warning("Failed to compress %s: %s", generation.id, e)
+        elif compress_after:
+            _warn_no_encoder()
+
+        result.total_bytes = total
+
+    result.last_duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    return _record(result)
+
+
+_warned_no_encoder = False
+
+
+def _warn_no_encoder() -> None:
+    """Warn once, rather than on every sweep, that WAVs can't be compressed."""
+    global _warned_no_encoder
+    if not _warned_no_encoder:
+        _warned_no_encoder = True
+        logger.warning(
+            "GEMINI_COMPRESS_AUDIO_AFTER requires ffmpeg, which was not found"
+        )
+
+
+def _record(result: JanitorStats) -> JanitorStats:
+    with _stats_lock:
+        for name in ("runs", "skipped", "removed", "removed_files", "freed_bytes"):
+            setattr(_stats, name, getattr(_stats, name) + getattr(result, name))
+        for name in ("compressed", "compressed_saved_bytes", "errors"):
+            setattr(_stats, name, getattr(_stats, name) + getattr(result, name))
+        if result.runs:
+            _stats.total_bytes = result.total_bytes
+            _stats.last_run = result.last_run
+            _stats.last_duration_ms = result.last_duration_ms
+    return result
+
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            if is_enabled():
+                sweep()
+        except Exception as e:
+            with _stats_lock:
+                _stats.errors += 1
+            logger.error("Download directory cleanup failed: %s", e)
+        _stop.wait(float(os.environ.get("GEMINI_JANITOR_INTERVAL", DEFAULT_INTERVAL)))
+
+
+def start_janitor() -> None:
+    """Start sweeping the download directory in a background thread.
+
+    The thread sweeps straight away and then every GEMINI_JANITOR_INTERVAL
+    seconds, doing nothing unless a retention, size cap or compaction
+    setting is configured.
+    """
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="gemini-janitor", daemon=True)
+        _thread.start()
+
+
+def stop_janitor() -> None:
+    """Stop the background thread (it finishes the sweep it's running)."""
+    _stop.set()
+
+
+def get_janitor_stats() -> dict:
+    """Return totals of removed and compressed generations."""
+    with _stats_lock:
+        return {"enabled": is_enabled(), **asdict(_stats)}
+
+
+def reset_janitor() -> None:
+    """Clear the stats (used by tests)."""
+    global _stats, _warned_no_encoder
+    with _stats_lock:
+        _stats = JanitorStats()
+    _warned_no_encoder = False
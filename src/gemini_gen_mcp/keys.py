@@ -0,0 +1,233 @@
+"""Pool of Gemini API keys with load balancing and failover."""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .lazy import lazy_import
+from .ratelimit import THROTTLE_CODES, retry_after
+
+
+errors = lazy_import("google.genai.errors")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_QUARANTINE = 60  # seconds a throttled key is skipped, without a retry hint
+DEFAULT_FORBIDDEN_QUARANTINE = 900  # seconds a rejected (revoked?) key is skipped
+FORBIDDEN_CODES = {401, 403}
+
+
+class KeyStrategy(StrEnum):
+    """How the next API key is picked from the pool."""
+
+    LEAST_LOADED = "least_loaded"
+    ROUND_ROBIN = "round_robin"
+
+
+def key_id(api_key: str) -> str:
+    """A short fingerprint identifying a key in stats and batch manifests."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+@dataclass
+class KeyState:
+    """Usage and health of one API key."""
+
+    key: str
+    id: str
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    throttled: int = 0
+    forbidden: int = 0
+    quarantined_until: float = 0.0
+
+    def stats(self, now: float) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "forbidden": self.forbidden,
+            "quarantined_for": round(max(self.quarantined_until - now, 0.0), 1),
+        }
+
+
+class KeyPool:
+    """API keys shared by all requests, spreading load and skipping failing keys.
+
+    Each request is sent with the least loaded key (fewest requests in
+    flight) or the next key in turn. A key that's throttled (429) is
+    quarantined for the server's retry hint or GEMINI_KEY_QUARANTINE seconds,
+    and one that's rejected (401/403) for GEMINI_KEY_FORBIDDEN_QUARANTINE
+    seconds. The request then fails over to another key. When every key is
+    quarantined, the one released soonest is used.
+    """
+
+    def __init__(
+        self, keys: list[str], strategy: KeyStrategy = KeyStrategy.LEAST_LOADED
+    ):
+        self.strategy = KeyStrategy(strategy)
+        self.keys = [KeyState(key=k, id=key_id(k)) for k in dict.fromkeys(keys)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def choose(self, exclude: set[str] = frozenset()) -> Optional[KeyState]:
+        """Pick the key for the next request, or None if all are excluded."""
+        now = time.time()
+        with self._lock:
+            candidates = [k for k in self.keys if k.id not in exclude]
+            healthy = [k for k in candidates if k.quarantined_until <= now]
+            if not healthy:
+                return min(candidates, key=lambda k: k.quarantined_until, default=None)
+            if self.strategy == KeyStrategy.ROUND_ROBIN:
+                for _ in range(len(self.keys)):
+                    state = self.keys[self._next % len(self.keys)]
+                    self._next += 1
+                    if state in healthy:
+                        return state
+            return min(healthy, key=lambda k: (k.in_flight, k.requests))
+
+    def get(self, id: Optional[str]) -> KeyState:
+        """Return the key with the given fingerprint, or the next key if it's gone."""
+        for state in self.keys:
+            if state.id == id:
+                return state
+        return self.choose()
+
+    def _quarantine(self, state: KeyState, error: Exception) -> None:
+        if error.code in THROTTLE_CODES:
+            state.throttled += 1
+            seconds = retry_after(error) or float(
+                os.environ.get("GEMINI_KEY_QUARANTINE", DEFAULT_QUARANTINE)
+            )
+        else:
+            state.forbidden += 1
+            seconds = float(
+                os.environ.get(
+                    "GEMINI_KEY_FORBIDDEN_QUARANTINE", DEFAULT_FORBIDDEN_QUARANTINE
+                )
+            )
+        state.quarantined_until = max(state.quarantined_until, time.time() + seconds)
+        logger.warning(
+            "API key %s quarantined for %gs: %s", state.id, seconds, error.code
+        )
+
+    async def run(self, fn: Callable[[str], Awaitable[T]]) -> T:
+        """Call ``fn`` with a key, failing over to other keys on 429/401/403.
+
+        The last error is raised once every key has been tried.
+        """
+        tried: set[str] = set()
+        while True:
+            state = self.choose(exclude=tried)
+            with self._lock:
+                state.in_flight += 1
+                state.requests += 1
+            try:
+                return await fn(state.key)
+            except Exception as e:
+                state.failures += 1
+                failover = isinstance(e, errors.APIError) and (
+                    e.code in THROTTLE_CODES or e.code in FORBIDDEN_CODES
+                )
+                if not failover:
+                    raise
+                self._quarantine(state, e)
+                tried.add(state.id)
+                if len(tried) >= len(self.keys):
+                    raise
+            finally:
+                with self._lock:
+                    state.in_flight -= 1
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "strategy": self.strategy,
+            "keys": {state.id: state.stats(now) for state in self.keys},
+        }
+
+
+def _split(value: str) -> list[str]:
+    return [k for k in value.replace(",", " ").split() if k]
+
+
+_file_keys: dict[tuple[str, float], list[str]] = {}
+
+
+def _read_key_file(path: str) -> list[str]:
+    """Keys in a file, one per line (# starts a comment), re-read when it changes."""
+    path = os.path.expanduser(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        raise ValueError(f"GEMINI_API_KEY_FILE not found: {path}")
+    if (path, mtime) not in _file_keys:
+        with open(path, encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0] for line in f]
+        _file_keys.clear()
+        _file_keys[(path, mtime)] = [k for line in lines for k in _split(line)]
+    return _file_keys[(path, mtime)]
+
+
+def load_keys() -> list[str]:
+    """Keys from GEMINI_API_KEY, GEMINI_API_KEYS and GEMINI_API_KEY_FILE."""
+    keys = _split(os.environ.get("GEMINI_API_KEY", ""))
+    keys += _split(os.environ.get("GEMINI_API_KEYS", ""))
+    path = os.environ.get("GEMINI_API_KEY_FILE")
+    if path:
+        keys += _read_key_file(path)
+    return list(dict.fromkeys(keys))
+
+
+_pool: Optional[KeyPool] = None
+_pool_config: Optional[tuple] = None
+_pool_lock = threading.Lock()
+
+
+def get_key_pool() -> KeyPool:
+    """Return the shared key pool, rebuilt (keeping key stats) when the keys change."""
+    global _pool, _pool_config
+    keys = load_keys()
+    if not keys:
+        raise ValueError(
+            "GEMINI_API_KEY environment variable is required "
+            "(or GEMINI_API_KEYS / GEMINI_API_KEY_FILE for several keys). "
+            "Get your API key from https://aistudio.google.com/apikey"
+        )
+    config = (
+        tuple(keys),
+        KeyStrategy(os.environ.get("GEMINI_KEY_STRATEGY", KeyStrategy.LEAST_LOADED)),
+    )
+    with _pool_lock:
+        if _pool is None or _pool_config != config:
+            old = {state.key: state for state in _pool.keys} if _pool else {}
+            _pool = KeyPool(*config)
+            _pool.keys = [old.get(state.key, state) for state in _pool.keys]
+            _pool_config = config
+        return _pool
+
+
+def get_key_stats() -> dict:
+    """Return per-key usage, or an empty dict when no keys are configured."""
+    try:
+        return get_key_pool().stats()
+    except ValueError:
+        return {}
+
+
+def reset_keys() -> None:
+    """Drop the shared key pool (used by tests)."""
+    global _pool, _pool_config
+    with _pool_lock:
+        _pool = None
+        _pool_config = None
+    _file_keys.clear()
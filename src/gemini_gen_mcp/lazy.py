@@ -0,0 +1,58 @@
+"""Modules imported on first use, to keep server startup fast."""
+
+import importlib
+import sys
+import threading
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """Stands in for a module until one of its attributes is used.
+
+    ``google.genai`` takes over a second to import and isn't needed to
+    answer the MCP handshake or list tools, only to generate. Setting or
+    deleting attributes (e.g. ``unittest.mock.patch``) applies to the real
+    module.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_module", None)
+
+    def _load(self) -> ModuleType:
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            with object.__getattribute__(self, "_lock"):
+                module = object.__getattribute__(self, "_module")
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self._load(), attr)
+
+    def __dir__(self) -> list[str]:
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return a module, or a stand-in that imports it on first use if not yet imported."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def preload(*modules: ModuleType) -> None:
+    """Import lazy modules in a background thread, ahead of their first use."""
+    lazy = [m for m in modules if isinstance(m, LazyModule)]
+    if lazy:
+        threading.Thread(
+            target=lambda: [m._load() for m in lazy], name="preload", daemon=True
+        ).start()
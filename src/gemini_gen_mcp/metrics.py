@@ -0,0 +1,173 @@
+"""Per-phase latency histograms and byte counters for generation calls."""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Histogram bucket upper bounds in milliseconds (Prometheus style, cumulative)
+BUCKETS_MS = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+    1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000,
+)  # fmt: skip
+
+# Label used for phases that aren't tied to a model, e.g. background writes
+ALL_MODELS = "all"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with interpolated percentiles."""
+
+    def __init__(self, buckets: tuple = BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th percentile (0-100) by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[idx - 1] if idx > 0 else 0.0
+                upper = self.buckets[idx] if idx < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * max(rank - seen, 0) / n
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Metrics:
+    """Latency histograms keyed by (model, phase) and byte counters by model.
+
+    Phases recorded by the server are ``client`` (client lookup), ``api``
+    (Gemini round-trip including rate limiting and retries), ``request``
+    (a single HTTP request to Gemini), ``decode``
+    (extracting/base64-decoding response data), ``encode`` (WAV encoding),
+    ``write`` (background disk writes), ``result`` (building the tool
+    result) and ``total`` (the whole tool call).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.bytes: dict[tuple[str, str], int] = {}
+
+    def observe(self, phase: str, value_ms: float, model: Optional[str] = None) -> None:
+        key = (str(model or ALL_MODELS), phase)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(value_ms)
+
+    def percentile(
+        self, phase: str, q: float, model: Optional[str] = None
+    ) -> tuple[int, float]:
+        """Return the number of samples of a phase and its q-th percentile in ms."""
+        key = (str(model or ALL_MODELS), phase)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                return 0, 0.0
+            return histogram.count, histogram.percentile(q)
+
+    def add_bytes(self, direction: str, count: int, model: Optional[str] = None) -> None:
+        """Count request or response bytes (``direction`` is "request" or "response")."""
+        key = (str(model or ALL_MODELS), direction)
+        with self._lock:
+            self.bytes[key] = self.bytes.get(key, 0) + count
+
+    @contextmanager
+    def span(self, phase: str, model: Optional[str] = None) -> Iterator[None]:
+        """Time the enclosed block as ``phase``, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, (time.perf_counter() - started) * 1000, model)
+
+    def stats(self) -> dict:
+        """Return latency summaries and byte totals grouped by model."""
+        result: dict[str, dict] = {}
+        with self._lock:
+            for (model, phase), histogram in sorted(self.latency.items()):
+                entry = result.setdefault(model, {"latency": {}, "bytes": {}})
+                entry["latency"][phase] = histogram.summary()
+            for (model, direction), count in sorted(self.bytes.items()):
+                entry = result.setdefault(model, {"latency": {}, "bytes": {}})
+                entry["bytes"][direction] = count
+        return result
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP gemini_gen_phase_seconds Latency of each generation phase.",
+            "# TYPE gemini_gen_phase_seconds histogram",
+        ]
+        with self._lock:
+            for (model, phase), h in sorted(self.latency.items()):
+                labels = f'model="{_escape(model)}",phase="{_escape(phase)}"'
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(
+                        f'gemini_gen_phase_seconds_bucket{{{labels},le="{bound / 1000:g}"}} '
+                        f"{cumulative}"
+                    )
+                lines.append(
+                    f'gemini_gen_phase_seconds_bucket{{{labels},le="+Inf"}} {h.count}'
+                )
+                lines.append(f"gemini_gen_phase_seconds_sum{{{labels}}} {h.sum / 1000:g}")
+                lines.append(f"gemini_gen_phase_seconds_count{{{labels}}} {h.count}")
+
+            lines += [
+                "# HELP gemini_gen_bytes_total Bytes sent to and received from Gemini.",
+                "# TYPE gemini_gen_bytes_total counter",
+            ]
+            for (model, direction), count in sorted(self.bytes.items()):
+                lines.append(
+                    f'gemini_gen_bytes_total{{model="{_escape(model)}",'
+                    f'direction="{_escape(direction)}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+def reset_metrics() -> None:
+    """Clear all recorded metrics (used by tests)."""
+    global _metrics
+    _metrics = Metrics()
@@ -0,0 +1,19 @@
+"""Locations of generated files."""
+
+import os
+
+
+DEFAULT_DOWNLOAD_PATH = "/tmp/gemini_gen_mcp"
+
+
+def get_download_root() -> str:
+    """Get the root directory for generated files."""
+    return os.environ.get("GEMINI_DOWNLOAD_PATH", DEFAULT_DOWNLOAD_PATH)
+
+
+def get_download_path(sub_dir: str, create: bool = True) -> str:
+    """Get the download path for generated files, creating it unless create=False."""
+    download_path = os.path.join(get_download_root(), sub_dir)
+    if create:
+        os.makedirs(download_path, exist_ok=True)
+    return download_path
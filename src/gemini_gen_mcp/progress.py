@@ -0,0 +1,64 @@
+"""MCP progress notifications for the phases of a generation."""
+
+import logging
+from enum import StrEnum
+from typing import Optional
+
+from fastmcp import Context
+
+
+logger = logging.getLogger(__name__)
+
+
+class Phase(StrEnum):
+    """Phases of a generation, in the order they happen."""
+
+    QUEUED = "queued"  # waiting for the model's rate limiter
+    SENT = "sent"  # request sent to Gemini
+    RECEIVING = "receiving"  # response arriving
+    ENCODING = "encoding"  # converting the generated media
+    SAVING = "saving"  # writing files to disk
+
+
+PHASES = list(Phase)
+
+_MESSAGES = {
+    Phase.QUEUED: "Queued for {model}",
+    Phase.SENT: "Sent request to {model}",
+    Phase.RECEIVING: "Receiving response from {model}",
+    Phase.ENCODING: "Encoding",
+    Phase.SAVING: "Saving files",
+}
+
+
+class Progress:
+    """Reports a tool call's phases to the MCP client as progress notifications.
+
+    Progress only moves forward: a phase at or before the last one reported
+    (e.g. SENT again when a request is retried) is skipped. Nothing is sent
+    without a context, or if the client didn't ask for progress.
+    """
+
+    def __init__(self, ctx: Optional[Context] = None, model: str = "Gemini"):
+        self.ctx = ctx
+        self.model = model
+        self.phase: Optional[Phase] = None
+
+    async def report(self, phase: Phase, message: Optional[str] = None) -> None:
+        step = PHASES.index(phase) + 1
+        if self.ctx is None or (self.phase and PHASES.index(self.phase) + 1 >= step):
+            return
+        self.phase = phase
+        await self._send(step, len(PHASES), message or _MESSAGES[phase].format(model=self.model))
+
+    async def count(self, done: int, total: int, message: str) -> None:
+        """Report ``done`` of ``total`` items, e.g. the images of a batch."""
+        if self.ctx is not None:
+            await self._send(done, total, message)
+
+    async def _send(self, progress: int, total: int, message: str) -> None:
+        try:
+            await self.ctx.report_progress(progress=progress, total=total, message=message)
+        except Exception as e:
+            # Progress is best effort, it mustn't fail the generation
+            logger.warning("Failed to report progress: %s", e)
@@ -0,0 +1,278 @@
+"""Client-side rate limiting, request scheduling and retries for Gemini calls."""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from .lazy import lazy_import
+
+
+errors = lazy_import("google.genai.errors")
+
+T = TypeVar("T")
+
+# Priorities for the scheduler queue, lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+THROTTLE_CODES = {429}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute / 60`` tokens per second.
+
+    A limit of 0 means unlimited.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute / 60)
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        # Requests bigger than the bucket wait for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.per_minute
+
+    def consume(self, amount: float) -> None:
+        if self.per_minute:
+            self.tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: float = field(compare=False)
+    event: asyncio.Event = field(compare=False, default_factory=asyncio.Event)
+
+
+class ModelScheduler:
+    """Admits requests for one model in priority order within its RPM/TPM limits."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.throttled = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _delay(self, tokens: float) -> float:
+        now = time.monotonic()
+        return max(
+            self.paused_until - now,
+            self.requests.delay(1, now),
+            self.tokens.delay(tokens, now),
+        )
+
+    def _wake_head(self) -> None:
+        if self._waiters:
+            self._waiters[0].event.set()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for this model, e.g. after a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1, priority: int = 0) -> float:
+        """Wait for a slot and return the seconds spent waiting."""
+        started = time.monotonic()
+        waiter = _Waiter(priority, next(self._seq), tokens)
+        heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                if self._waiters[0] is waiter:
+                    delay = self._delay(tokens)
+                    if delay <= 0:
+                        break
+                    # Sleep until tokens refill, or until a higher priority
+                    # request arrives and takes over the head of the queue.
+                    waiter.event.clear()
+                    try:
+                        await asyncio.wait_for(waiter.event.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    waiter.event.clear()
+                    await waiter.event.wait()
+        except BaseException:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._wake_head()
+            raise
+
+        heapq.heappop(self._waiters)
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        self._wake_head()
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take a slot only if one is free right now and nothing is queued."""
+        if self._waiters or self._delay(tokens) > 0:
+            return False
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        self.admitted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "avg_wait_ms": round(1000 * self.total_wait / self.admitted, 3)
+            if self.admitted
+            else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 3),
+            "rpm": self.requests.per_minute,
+            "tpm": self.tokens.per_minute,
+        }
+
+
+def _model_limits(model: str) -> tuple[float, float]:
+    """Return (rpm, tpm) for a model from GEMINI_RATE_LIMITS, GEMINI_RPM and GEMINI_TPM."""
+    rpm = float(os.environ.get("GEMINI_RPM", "0"))
+    tpm = float(os.environ.get("GEMINI_TPM", "0"))
+    overrides = os.environ.get("GEMINI_RATE_LIMITS")
+    if overrides:
+        limits = json.loads(overrides).get(str(model), {})
+        rpm = float(limits.get("rpm", rpm))
+        tpm = float(limits.get("tpm", tpm))
+    return rpm, tpm
+
+
+_schedulers: dict[tuple, ModelScheduler] = {}
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    """Return the scheduler for a model, rebuilt if its limits change."""
+    limits = _model_limits(model)
+    key = (str(model), *limits)
+    scheduler = _schedulers.get(key)
+    if scheduler is None:
+        scheduler = _schedulers[key] = ModelScheduler(*limits)
+    return scheduler
+
+
+# Input tokens Gemini counts for an image (per 768x768 tile)
+IMAGE_TOKENS = 258
+
+
+def estimate_tokens(text: str, images: int = 0) -> int:
+    """Rough token estimate (~4 characters per token) for TPM accounting."""
+    return max(len(text) // 4, 1) + images * IMAGE_TOKENS
+
+
+_DURATION = re.compile(r"^\s*([\d.]+)s\s*$")
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Return the server's suggested retry delay in seconds, if any.
+
+    Checks the HTTP Retry-After header and google.rpc.RetryInfo error details.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if not isinstance(detail, dict):
+                continue
+            match = _DURATION.match(str(detail.get("retryDelay", "")))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, errors.APIError) and error.code in RETRYABLE_CODES
+
+
+async def call_with_retry(
+    model: str,
+    fn: Callable[[], Awaitable[T]],
+    tokens: float = 1,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> T:
+    """Run ``fn`` once admitted by the model's scheduler, retrying throttled calls.
+
+    Retryable errors (429 and 5xx) are retried up to GEMINI_MAX_RETRIES times
+    with exponential backoff and jitter, waiting at least as long as the
+    server's retry-after hint. A 429 also pauses the model's whole queue.
+    """
+    scheduler = get_scheduler(model)
+    max_retries = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+    base = float(os.environ.get("GEMINI_BACKOFF_BASE", "1.0"))
+    cap = float(os.environ.get("GEMINI_BACKOFF_MAX", "60"))
+
+    attempt = 0
+    while True:
+        await scheduler.acquire(tokens, priority)
+        try:
+            return await fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, base, cap)
+            hint = retry_after(e)
+            if hint is not None:
+                delay = max(delay, hint)
+            if e.code in THROTTLE_CODES:
+                scheduler.throttled += 1
+                scheduler.pause(delay)
+            scheduler.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def get_scheduler_stats() -> dict[str, Any]:
+    """Return queue wait and throttle metrics per model."""
+    return {key[0]: scheduler.stats() for key, scheduler in _schedulers.items()}
+
+
+def reset_schedulers() -> None:
+    """Drop all schedulers (used by tests)."""
+    _schedulers.clear()
@@ -0,0 +1,177 @@
+"""Conversion of generated files into MCP tool results."""
+
+import asyncio
+import io
+import os
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import Literal, Optional, Sequence, Union
+
+from fastmcp.utilities.types import Audio, Image
+from mcp.types import ContentBlock, ResourceLink
+
+from .paths import get_download_root
+
+
+RESOURCE_URI_PREFIX = "gemini-gen://files/"
+DEFAULT_INLINE_MAX_BYTES = 1024 * 1024  # 1 MB
+DEFAULT_PREVIEW_MAX_DIM = 256
+
+Kind = Literal["image", "audio"]
+
+# File formats whose MIME subtype differs from the format name
+_MIME_SUBTYPES = {"mp3": "mpeg", "jpg": "jpeg"}
+ContentItem = Union[Image, Audio, ContentBlock, str]
+
+
+class ReturnMode(StrEnum):
+    """How generated files are returned to the MCP client."""
+
+    INLINE = "inline"  # base64 image/audio content
+    PATH = "path"  # text with the saved file path
+    RESOURCE_LINK = "resource_link"  # link to a gemini-gen://files/ resource
+    PREVIEW = "preview"  # downscaled inline image preview plus a resource link
+    AUTO = "auto"  # inline up to GEMINI_INLINE_MAX_BYTES, otherwise preview
+
+
+@dataclass
+class Artifact:
+    """A generated file, held in memory, saved on disk, or both.
+
+    ``parts`` holds the contents as separate buffers (e.g. a WAV header and
+    its PCM), which are only joined into ``data`` if the contents are read.
+    ``model`` is the model that generated it, if known.
+    """
+
+    format: str
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    parts: Sequence[bytes] = ()
+    model: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        if self.parts:
+            return sum(len(part) for part in self.parts)
+        return os.path.getsize(self.path)
+
+    def read(self) -> bytes:
+        """Return the file contents, loading them from disk if needed."""
+        if self.data is None:
+            if self.parts:
+                self.data = b"".join(self.parts)
+            else:
+                with open(self.path, "rb") as f:
+                    self.data = f.read()
+        return self.data
+
+
+def get_return_mode(mode: Optional[ReturnMode] = None) -> ReturnMode:
+    """Resolve the requested return mode, defaulting to GEMINI_RETURN_MODE."""
+    if mode:
+        return ReturnMode(mode)
+    return ReturnMode(os.environ.get("GEMINI_RETURN_MODE", ReturnMode.INLINE))
+
+
+def resource_link(path: str, mime_type: str) -> ResourceLink:
+    """Link to a saved file, served by the gemini-gen://files/ resource template."""
+    root = os.path.realpath(get_download_root())
+    real_path = os.path.realpath(path)
+    if os.path.commonpath([root, real_path]) == root:
+        rel_path = os.path.relpath(real_path, root).replace(os.sep, "/")
+        uri = f"{RESOURCE_URI_PREFIX}{rel_path}"
+    else:
+        uri = Path(real_path).as_uri()
+    return ResourceLink(
+        type="resource_link",
+        uri=uri,
+        name=os.path.basename(path),
+        mimeType=mime_type,
+        size=os.path.getsize(path),
+    )
+
+
+def make_preview(data: bytes, max_dim: int) -> Optional[bytes]:
+    """Return a downscaled JPEG of an image, or None if Pillow isn't installed."""
+    try:
+        from PIL import Image as PILImage
+    except ImportError:
+        return None
+
+    with PILImage.open(io.BytesIO(data)) as img:
+        img.thumbnail((max_dim, max_dim))
+        out = io.BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=70)
+        return out.getvalue()
+
+
+def mime_type(kind: Kind, fmt: str) -> str:
+    """Return the MIME type of a generated file, e.g. audio/mpeg for mp3."""
+    return f"{kind}/{_MIME_SUBTYPES.get(fmt, fmt)}"
+
+
+def _inline(kind: Kind, artifact: Artifact) -> ContentItem:
+    subtype = mime_type(kind, artifact.format).split("/", 1)[1]
+    if kind == "image":
+        return Image(data=artifact.read(), format=subtype)
+    return Audio(data=artifact.read(), format=subtype)
+
+
+async def to_content(
+    kind: Kind, artifact: Artifact, mode: Optional[ReturnMode] = None
+) -> list[ContentItem]:
+    """Convert an artifact into tool result content for the given return mode.
+
+    Falls back to inline content when the artifact was not saved to disk.
+    Reading the file and rendering a preview happen off the event loop.
+    """
+    return await asyncio.to_thread(_to_content, kind, artifact, mode)
+
+
+def _to_content(
+    kind: Kind, artifact: Artifact, mode: Optional[ReturnMode] = None
+) -> list[ContentItem]:
+    mode = get_return_mode(mode)
+    if mode == ReturnMode.INLINE or not artifact.path:
+        return [_inline(kind, artifact)]
+
+    if mode == ReturnMode.AUTO:
+        max_bytes = int(
+            os.environ.get("GEMINI_INLINE_MAX_BYTES", DEFAULT_INLINE_MAX_BYTES)
+        )
+        if artifact.size <= max_bytes:
+            return [_inline(kind, artifact)]
+        mode = ReturnMode.PREVIEW
+
+    file_mime_type = mime_type(kind, artifact.format)
+    if mode == ReturnMode.PATH:
+        return [f"Saved {file_mime_type} ({artifact.size} bytes) to {artifact.path}"]
+
+    link = resource_link(artifact.path, file_mime_type)
+    if mode == ReturnMode.PREVIEW and kind == "image":
+        max_dim = int(
+            os.environ.get("GEMINI_PREVIEW_MAX_DIM", DEFAULT_PREVIEW_MAX_DIM)
+        )
+        preview = make_preview(artifact.read(), max_dim)
+        if preview:
+            return [Image(data=preview, format="jpeg"), link]
+    return [link]
+
+
+async def to_result(
+    kind: Kind,
+    artifacts: Union[Artifact, list[Artifact]],
+    mode: Optional[ReturnMode] = None,
+) -> Union[ContentItem, list[ContentItem]]:
+    """Like to_content for one or more artifacts, but returns single items unwrapped."""
+    if isinstance(artifacts, Artifact):
+        artifacts = [artifacts]
+
+    def convert() -> list[ContentItem]:
+        return [item for a in artifacts for item in _to_content(kind, a, mode)]
+
+    content = await asyncio.to_thread(convert)
+    return content[0] if len(content) == 1 else content
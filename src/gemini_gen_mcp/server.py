@@ -1,51 +1,115 @@
 """MCP Server for Gemini Image and Audio generation using fastmcp."""
 
+import argparse
+import asyncio
 import os
 import base64
-import io
-import json
 import socket
 import time
-import wave
 
 from enum import StrEnum
 from datetime import datetime
-from typing import Annotated, Optional
-from google import genai
-from google.genai import types
-from fastmcp import FastMCP
+from pathlib import Path
+from typing import Annotated, Literal, Optional
+from fastmcp import Context, FastMCP
 from fastmcp.utilities.types import Image, Audio
+from mcp.types import ContentBlock
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
+from .audio import (
+    DEFAULT_CHUNK_CHARS,
+    AudioFormat,
+    PcmFormat,
+    Segment,
+    check_encoder,
+    dialogue_segments,
+    encode_pcm,
+    get_audio_format,
+    parse_pcm_mime_type,
+    parse_script,
+    split_text,
+    transcode_file,
+    wav_header,
+)
+from .batch import (
+    SUCCEEDED_STATES,
+    BatchKind,
+    BatchManifest,
+    create_source,
+    job_summary,
+    load_manifest,
+    load_results,
+    save_manifest,
+)
+from .cache import ResultCache, cache_key, get_cache_stats, lookup
+from .catalog import (
+    GENERATION_ID,
+    GenerationRecord,
+    get_catalog,
+    new_generation_id,
+    record_generation,
+)
+from .clients import get_client, get_client_stats, get_timeout
+from .hedging import (
+    REQUEST_PHASE,
+    get_fallbacks,
+    get_hedging_stats,
+    hedge_delay,
+    hedged,
+    with_fallback,
+)
+from .imaging import ImageFormat, Variant, get_quality, process_image
+from .janitor import get_janitor_stats, start_janitor, stop_janitor
+from .keys import get_key_pool, get_key_stats
+from .lazy import lazy_import, preload
+from .metrics import get_metrics
+from .progress import Phase, Progress
+from .coalesce import coalesce, get_coalescing_stats
+from .paths import get_download_path, get_download_root
+from .ratelimit import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    call_with_retry,
+    estimate_tokens,
+    get_scheduler,
+    get_scheduler_stats,
+)
+from .results import (
+    RESOURCE_URI_PREFIX,
+    Artifact,
+    ReturnMode,
+    get_return_mode,
+    to_content,
+    to_result,
+)
+from .storage import (
+    WavSpool,
+    discard_on_cancel,
+    get_writer,
+    get_writer_stats,
+    shutdown_writer,
+    write_all,
+)
+from .uploads import InputImage, get_upload_cache, get_upload_stats, load_input_image
 
-# Initialize FastMCP server
-mcp = FastMCP("gemini-gen-mcp")
 
+# The SDK is only imported once a tool calls Gemini
+genai = lazy_import("google.genai")
+types = lazy_import("google.genai.types")
 
-def get_download_path(sub_dir: str) -> str:
-    """Get the download path for generated files."""
-    download_path = os.path.join(
-        os.environ.get("GEMINI_DOWNLOAD_PATH", "/tmp/gemini_gen_mcp"), sub_dir
-    )
-    os.makedirs(download_path, exist_ok=True)
-    return download_path
+# Initialize FastMCP server
+mcp = FastMCP("gemini-gen-mcp")
 
 
 def get_api_key() -> str:
-    """Get Gemini API key from environment."""
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "GEMINI_API_KEY environment variable is required. "
-            "Get your API key from https://aistudio.google.com/apikey"
-        )
-    return api_key
+    """Get a Gemini API key from the key pool (see get_key_pool)."""
+    return get_key_pool().choose().key
 
 
-def create_client() -> genai.Client:
-    """Create and return a Gemini API client."""
-    return genai.Client(api_key=get_api_key(), http_options={
-            'timeout': 120000  # 120 seconds timeout (in milliseconds)
-        })
+def create_client() -> "genai.Client":
+    """Return the shared Gemini API client for the next API key in the pool."""
+    return get_client(get_api_key())
 
 
 class ImageModels(StrEnum):
@@ -77,6 +141,13 @@ class AudioModels(StrEnum):
     GEMINI_2_5_PRO_PREVIEW_TTS = "gemini-2.5-pro-preview-tts"
 
 
+# Models tried when a request fails, with GEMINI_FALLBACKS=1
+DEFAULT_FALLBACKS = {
+    ImageModels.NANO_BANANA_PRO: [ImageModels.NANO_BANANA],
+    AudioModels.GEMINI_2_5_PRO_PREVIEW_TTS: [AudioModels.GEMINI_2_5_FLASH_PREVIEW_TTS],
+}
+
+
 # | Column 1               | Column 2                     | Column 3                   |
 # | ---------------------- | ---------------------------- | -------------------------- |
 # | Zephyr – *Bright*      | Puck – *Upbeat*              | Charon – *Informative*     |
@@ -126,6 +197,406 @@ class VoiceName(StrEnum):
     SULAFAT = "Sulafat"
 
 
+async def generate_content(
+    model: str,
+    contents: str,
+    config: "types.GenerateContentConfig",
+    priority: int = PRIORITY_INTERACTIVE,
+    images: Optional[list[InputImage]] = None,
+    timeout: Optional[float] = None,
+    progress: Optional[Progress] = None,
+    sink: Optional[WavSpool] = None,
+) -> "types.GenerateContentResponse":
+    """Call Gemini's generate_content through the per-model rate limiter.
+
+    Input ``images`` are sent before the text, large ones by reference to a
+    Files API upload. Each attempt uses a key from the key pool and fails
+    over to another key if it's throttled or rejected. Throttled (429) and
+    transient 5xx errors are retried with backoff. The call, including
+    waiting for the rate limiter and retries, is aborted after ``timeout``
+    seconds (see ``get_timeout``). With GEMINI_HEDGE enabled, an admitted
+    interactive request that is slow to answer is duplicated if the rate
+    limiter has a free slot (see ``hedge_delay``).
+    Models selected by GEMINI_STREAM are called with generate_content_stream,
+    with the inline data going to ``sink`` as it arrives if one is given.
+    """
+    timeout = get_timeout(model, timeout)
+    metrics = get_metrics()
+    keys = get_key_pool()
+    # Each HTTP request gets the timeout too, so the SDK aborts it itself
+    config = config.model_copy(
+        update={"http_options": types.HttpOptions(timeout=int(timeout * 1000))}
+    )
+    stream = use_streaming(model)
+    if sink is not None:
+        await sink.reset()  # drop what a failed call to another model streamed
+        sink = sink if stream else None
+    counted = False
+
+    async def send(api_key: str) -> types.GenerateContentResponse:
+        nonlocal counted
+        if sink is not None:
+            await sink.reset()  # drop what a failed attempt streamed
+        with metrics.span("client", model):
+            client = get_client(api_key)
+        request: str | list = contents
+        request_bytes = len(contents.encode("utf-8"))
+        if images:
+            # Uploaded files belong to the key's project, so upload per key
+            with metrics.span("upload", model):
+                uploads = get_upload_cache()
+                parts = await asyncio.gather(
+                    *(uploads.to_part(client, api_key, image) for image in images)
+                )
+            request = [*parts, contents]
+            request_bytes += sum(
+                len(p.inline_data.data) for p in parts if p.inline_data
+            )
+        if not counted:
+            metrics.add_bytes("request", request_bytes, model)
+            counted = True
+        if progress:
+            await progress.report(Phase.SENT)
+        with metrics.span(REQUEST_PHASE, model):
+            if stream:
+                return await stream_content(
+                    client, model, request, config, progress, sink
+                )
+            response = await client.aio.models.generate_content(
+                model=model, contents=request, config=config
+            )
+        if progress:
+            await progress.report(Phase.RECEIVING)
+        return response
+
+    if progress:
+        await progress.report(Phase.QUEUED)
+    tokens = estimate_tokens(contents, images=len(images or []))
+    # Bulk work isn't worth paying twice for, and a sink can't take two streams
+    hedge = priority == PRIORITY_INTERACTIVE and sink is None
+    delay = hedge_delay(model) if hedge else None
+    scheduler = get_scheduler(model)
+    with metrics.span("api", model):
+        try:
+            response = await asyncio.wait_for(
+                call_with_retry(
+                    model,
+                    # Only the admitted request is timed and hedged, not the
+                    # time spent queueing or backing off
+                    lambda: hedged(
+                        model,
+                        lambda: keys.run(send),
+                        delay,
+                        lambda: scheduler.try_acquire(tokens),
+                    ),
+                    tokens=tokens,
+                    priority=priority,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"{model} did not respond within {timeout:g} seconds"
+            ) from None
+    streamed = sink.size if sink is not None else 0
+    metrics.add_bytes("response", response_size(response) + streamed, model)
+    return response
+
+
+def use_streaming(model: str) -> bool:
+    """Whether GEMINI_STREAM (1, 0 or a comma-separated list of models) selects the model."""
+    value = os.environ.get("GEMINI_STREAM", "0").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return False
+    if value in ("1", "true", "yes", "on", "all"):
+        return True
+    return str(model).lower() in {m.strip() for m in value.split(",")}
+
+
+async def stream_content(
+    client: "genai.Client",
+    model: str,
+    contents: str | list,
+    config: "types.GenerateContentConfig",
+    progress: Optional[Progress] = None,
+    sink: Optional[WavSpool] = None,
+) -> "types.GenerateContentResponse":
+    """Consume a streamed response as it arrives, as one response of all its parts.
+
+    With a ``sink``, each chunk's inline data (e.g. PCM audio) is written to
+    it as it arrives and left out of the response. Otherwise the chunks'
+    inline data is kept as separate parts rather than joined.
+    """
+    parts: list[types.Part] = []
+    chunks = 0
+    async for chunk in await client.aio.models.generate_content_stream(
+        model=model, contents=contents, config=config
+    ):
+        if chunks == 0 and progress:
+            await progress.report(Phase.RECEIVING)
+        chunks += 1
+        for candidate in (chunk.candidates or [])[:1]:
+            for part in (candidate.content and candidate.content.parts) or []:
+                if sink is not None and part.inline_data and part.inline_data.data:
+                    await sink.write(part.inline_data.data, part.inline_data.mime_type)
+                else:
+                    parts.append(part)
+    if not parts:
+        return types.GenerateContentResponse(candidates=[])
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+    )
+
+
+def response_size(response: "types.GenerateContentResponse") -> int:
+    """Return the size of the inline data in a response."""
+    size = 0
+    for candidate in response.candidates or []:
+        for part in getattr(candidate.content, "parts", None) or []:
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data and inline_data.data:
+                size += len(inline_data.data)
+    return size
+
+
+def cache_artifact(
+    cache: ResultCache, key: str, artifact: Artifact, model: str
+) -> None:
+    """Queue storing a generated file in the result cache.
+
+    Files generated by a fallback model aren't cached, or they'd be served
+    for later requests to the model that failed.
+    """
+    if artifact.model == model:
+        get_writer().run(_put, cache, key, artifact)
+
+
+def _put(cache: ResultCache, key: str, artifact: Artifact) -> None:
+    cache.put(key, artifact.read(), artifact.format)
+
+
+async def wait_until_saved(
+    artifacts: list[Artifact], return_mode: Optional[ReturnMode]
+) -> None:
+    """Wait for background writes of files the tool result will refer to."""
+    if get_return_mode(return_mode) != ReturnMode.INLINE:
+        await get_writer().wait_for(*[a.path for a in artifacts if a.path])
+
+
+def image_request(
+    prompt: str,
+    aspect_ratio: Optional[AspectRatio],
+    temperature: float,
+    top_p: Optional[float],
+    edit: bool = False,
+) -> "tuple[str, types.GenerateContentConfig]":
+    """Build the contents and config of an image generation request.
+
+    Edits keep the input images' aspect ratio unless one is given.
+    """
+    if edit:
+        # https://ai.google.dev/gemini-api/docs/image-generation#image_editing
+        contents = prompt
+        image_config = (
+            types.ImageConfig(aspect_ratio=str(aspect_ratio)) if aspect_ratio else None
+        )
+    else:
+        # Generate image with the prompt
+        # https://ai.google.dev/gemini-api/docs/image-generation
+        contents = f"Generate an image: {prompt}"
+        image_config = types.ImageConfig(
+            aspect_ratio=str(aspect_ratio) if aspect_ratio else "1:1",
+        )
+    config = types.GenerateContentConfig(
+        response_modalities=["image"],
+        temperature=temperature,
+        top_p=top_p,
+        image_config=image_config,
+    )
+    return contents, config
+
+
+def save_images(
+    response: "types.GenerateContentResponse",
+    prompt: str,
+    model: str,
+    info: dict,
+    tool: str,
+    started: float,
+) -> list[Artifact]:
+    """Save every image in a response with an .info.json sidecar and catalog records."""
+    if not response.candidates:
+        raise ValueError("No images were generated")
+
+    writer = get_writer()
+    download_path = get_download_path(
+        os.path.join("images", datetime.now().strftime("%Y-%m-%d")), create=False
+    )
+    name = new_generation_id()
+    writer.write_json(os.path.join(download_path, f"{name}.info.json"), info)
+
+    # Extract images from response
+    images: list[Artifact] = []
+    for part in response.candidates[0].content.parts or []:
+        if hasattr(part, "inline_data") and part.inline_data:
+            image_data = part.inline_data.data
+            mime_type = part.inline_data.mime_type
+
+            with get_metrics().span("decode", model):
+                # Ensure we have bytes
+                if isinstance(image_data, bytes):
+                    data = image_data
+                else:
+                    # If it's base64 string, decode it
+                    data = base64.b64decode(image_data)
+
+            # Extract format from mime_type (e.g., "image/png" -> "png")
+            fmt = mime_type.split("/")[1] if "/" in mime_type else "png"
+
+            idx = len(images)
+            suffix = f"_{idx + 1}" if idx > 0 else ""
+            file_path = os.path.join(download_path, f"{name}{suffix}.{fmt}")
+            writer.write_bytes(file_path, data)
+            writer.run(
+                record_generation,
+                GenerationRecord(
+                    id=f"{name}{suffix}",
+                    tool=tool,
+                    kind="image",
+                    model=model,
+                    prompt=prompt,
+                    path=file_path,
+                    format=fmt,
+                    size=len(data),
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    params=info,
+                ),
+                get_download_root(),
+            )
+
+            images.append(Artifact(format=fmt, path=file_path, data=data, model=model))
+
+    if not images:
+        raise ValueError("No images were generated")
+
+    return images
+
+
+@discard_on_cancel
+async def generate_images(
+    prompt: str,
+    model: ImageModels,
+    aspect_ratio: AspectRatio,
+    temperature: float,
+    top_p: Optional[float],
+    tool: str = "text_to_image",
+    priority: int = PRIORITY_INTERACTIVE,
+    inputs: Optional[list[InputImage]] = None,
+    timeout: Optional[float] = None,
+    progress: Optional[Progress] = None,
+) -> list[Artifact]:
+    """Generate images for a prompt, save them and return every image part.
+
+    With ``inputs`` the prompt is an instruction for editing or combining
+    the input images, whose aspect ratio is kept unless one is given. If the
+    model fails, its GEMINI_FALLBACKS are tried and the model that generated
+    the images is recorded in the .info.json sidecar.
+    """
+
+    started = time.perf_counter()
+    contents, config = image_request(
+        prompt, aspect_ratio, temperature, top_p, edit=bool(inputs)
+    )
+    response, used_model = await with_fallback(
+        [model, *get_fallbacks(model, DEFAULT_FALLBACKS)],
+        lambda m: generate_content(
+            model=m,
+            contents=contents,
+            config=config,
+            priority=priority,
+            images=inputs,
+            timeout=timeout,
+            progress=progress,
+        ),
+    )
+
+    info = {
+        "model": used_model,
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio,
+        "temperature": temperature,
+        "top_p": top_p,
+    }
+    if used_model != model:
+        info["requested_model"] = model
+    if inputs:
+        info["inputs"] = [image.source for image in inputs]
+    return save_images(response, prompt, used_model, info, tool, started)
+
+
+@discard_on_cancel
+async def postprocess_image(
+    image: Artifact,
+    max_dim: Optional[int] = None,
+    output_format: Optional[ImageFormat] = None,
+    quality: Optional[int] = None,
+    thumbnail: Optional[int] = None,
+    model: Optional[str] = None,
+    progress: Optional[Progress] = None,
+    prompt: Optional[str] = None,
+) -> list[Artifact]:
+    """Return the images to send back: a downscaled/re-encoded copy and a thumbnail.
+
+    Renditions are encoded in worker processes and saved next to the
+    original, which is kept at full resolution. Renditions of an image that
+    isn't a saved generation (e.g. a cached result) get their own generation
+    ID and .info.json sidecar. Returns the original unchanged when no
+    post-processing was requested.
+    """
+    resize = bool(max_dim) or bool(output_format and output_format != image.format)
+    if not resize and not thumbnail:
+        return [image]
+
+    quality = get_quality(quality)
+    labels, variants = [], []
+    if resize:
+        labels.append(str(max_dim or "full"))
+        fmt = ImageFormat(output_format or image.format)
+        variants.append(Variant(max_dim, fmt, quality))
+    if thumbnail:
+        labels.append("thumb")
+        thumb_format = ImageFormat(output_format) if output_format else ImageFormat.JPEG
+        variants.append(Variant(thumbnail, thumb_format, quality))
+
+    if progress:
+        await progress.report(Phase.ENCODING)
+    with get_metrics().span("postprocess", model):
+        rendered = await process_image(image.read(), variants)
+
+    writer = get_writer()
+    download_path = get_download_path(
+        os.path.join("images", datetime.now().strftime("%Y-%m-%d")), create=False
+    )
+    stem = os.path.splitext(os.path.basename(image.path or ""))[0]
+    if not GENERATION_ID.match(stem):
+        stem = new_generation_id()
+        info = {
+            "model": image.model or model,
+            "prompt": prompt,
+            "source": image.path,
+            "max_dim": max_dim,
+            "format": output_format,
+            "thumbnail": thumbnail,
+        }
+        writer.write_json(os.path.join(download_path, f"{stem}.info.json"), info)
+    results = [] if resize else [image]
+    for label, variant, data in zip(labels, variants, rendered):
+        path = os.path.join(download_path, f"{stem}.{label}.{variant.format}")
+        writer.write_bytes(path, data)
+        results.append(Artifact(format=str(variant.format), path=path, data=data))
+    return results
+
+
 @mcp.tool()
 async def text_to_image(
     prompt: Annotated[str, "Text description of the image to generate"],
@@ -137,80 +608,644 @@ async def text_to_image(
     top_p: Annotated[
         Optional[float], "Nucleus sampling parameter for image generation (optional)"
     ] = None,
-) -> Image:
+    max_dim: Annotated[
+        Optional[int],
+        "Downscale the returned image so its longest side is at most this many pixels",
+    ] = None,
+    output_format: Annotated[
+        Optional[ImageFormat],
+        "Re-encode the returned image as png, jpeg, webp or avif",
+    ] = None,
+    quality: Annotated[
+        Optional[int],
+        "Quality (1-100) for jpeg, webp and avif (default: GEMINI_IMAGE_QUALITY or 80)",
+    ] = None,
+    thumbnail: Annotated[
+        Optional[int], "Also return a thumbnail with this maximum width/height"
+    ] = None,
+    return_mode: Annotated[
+        Optional[ReturnMode],
+        "How to return the image: inline, path, resource_link, preview or auto "
+        "(default: GEMINI_RETURN_MODE or inline)",
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        "Seconds a call to the model may take, including rate limiting and "
+        "retries, before it's aborted. Each fallback model gets its own timeout "
+        "(default: GEMINI_TIMEOUTS for the model, GEMINI_TIMEOUT or 120)",
+    ] = None,
+    ctx: Optional[Context] = None,
+) -> Image | list[ContentBlock]:
     """Generate images from text using Gemini's Flash (Nano Banana) Image models."""
 
-    # Configure Gemini API
-    # https://ai.google.dev/gemini-api/docs/image-generation
-    client = create_client()
+    metrics = get_metrics()
+    progress = Progress(ctx, model)
+    with metrics.span("total", model):
+        key = cache_key(
+            "text_to_image",
+            model=model,
+            prompt=prompt,
+            aspect_ratio=aspect_ratio,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        image = None
+        cache, cached = await lookup(key)
+        if cached:
+            data, fmt, path = cached
+            image = Artifact(fmt, path, data)
+
+        async def generate() -> Artifact:
+            images = await generate_images(
+                prompt,
+                model,
+                aspect_ratio,
+                temperature,
+                top_p,
+                timeout=timeout,
+                progress=progress,
+            )
+            if cache:
+                cache_artifact(cache, key, images[0], model)
+            return images[0]
+
+        if image is None:
+            # Concurrent identical requests share a single generation
+            image = await coalesce(key, generate)
 
-    # Generate image with the prompt
-    response = client.models.generate_content(
-        model=model,
-        contents=f"Generate an image: {prompt}",
-        config=types.GenerateContentConfig(
-            response_modalities=["image"],
+        images = await postprocess_image(
+            image, max_dim, output_format, quality, thumbnail, model, progress, prompt
+        )
+        await progress.report(Phase.SAVING)
+        await wait_until_saved(images, return_mode)
+        with metrics.span("result", model):
+            return await to_result("image", images, return_mode)
+
+
+@mcp.tool()
+async def text_to_images(
+    prompts: Annotated[
+        Optional[list[str]], "Text descriptions of the images to generate"
+    ] = None,
+    prompt: Annotated[
+        Optional[str], "Single text description to generate `count` variants of"
+    ] = None,
+    count: Annotated[int, "Number of variants to generate for `prompt`"] = 1,
+    model: ImageModels = ImageModels.NANO_BANANA,
+    aspect_ratio: AspectRatio = AspectRatio.SQUARE,
+    temperature: Annotated[
+        float, "Sampling temperature for image generation (default: 1.0)"
+    ] = 1.0,
+    top_p: Annotated[
+        Optional[float], "Nucleus sampling parameter for image generation (optional)"
+    ] = None,
+    max_concurrency: Annotated[
+        Optional[int],
+        "Maximum generations in flight at once (default: GEMINI_MAX_CONCURRENCY or 4)",
+    ] = None,
+    max_dim: Annotated[
+        Optional[int],
+        "Downscale the returned image so its longest side is at most this many pixels",
+    ] = None,
+    output_format: Annotated[
+        Optional[ImageFormat],
+        "Re-encode the returned image as png, jpeg, webp or avif",
+    ] = None,
+    quality: Annotated[
+        Optional[int],
+        "Quality (1-100) for jpeg, webp and avif (default: GEMINI_IMAGE_QUALITY or 80)",
+    ] = None,
+    thumbnail: Annotated[
+        Optional[int], "Also return a thumbnail with this maximum width/height"
+    ] = None,
+    return_mode: Annotated[
+        Optional[ReturnMode],
+        "How to return each image: inline, path, resource_link, preview or auto "
+        "(default: GEMINI_RETURN_MODE or inline)",
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        "Seconds a call to the model may take, including rate limiting and "
+        "retries, before it's aborted. Each fallback model gets its own timeout "
+        "(default: GEMINI_TIMEOUTS for the model, GEMINI_TIMEOUT or 120)",
+    ] = None,
+    ctx: Optional[Context] = None,
+) -> list[Image | ContentBlock | str]:
+    """Generate multiple images concurrently from a list of prompts or prompt variants.
+
+    Returns every generated image. If some generations fail, the successful
+    images are returned followed by a text summary of the failures.
+    """
+
+    all_prompts = list(prompts or [])
+    if prompt:
+        all_prompts.extend([prompt] * max(count, 1))
+    if not all_prompts:
+        raise ValueError("Either `prompts` or `prompt` is required")
+
+    limit = max_concurrency or int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+    semaphore = asyncio.Semaphore(max(limit, 1))
+    progress = Progress(ctx, model)
+    finished = 0
+
+    async def generate(text: str) -> list[Artifact]:
+        async with semaphore:
+            images = await generate_images(
+                text,
+                model,
+                aspect_ratio,
+                temperature,
+                top_p,
+                tool="text_to_images",
+                priority=PRIORITY_BATCH,
+                timeout=timeout,
+            )
+        results = []
+        for image in images:
+            results += await postprocess_image(
+                image, max_dim, output_format, quality, thumbnail, model, prompt=text
+            )
+        nonlocal finished
+        finished += 1
+        await progress.count(
+            finished, len(all_prompts), f"Generated image {finished} of {len(all_prompts)}"
+        )
+        return results
+
+    metrics = get_metrics()
+    with metrics.span("total", model):
+        results = await asyncio.gather(
+            *(generate(text) for text in all_prompts),
+            return_exceptions=True,
+        )
+
+        images: list[Image | ContentBlock | str] = []
+        errors: list[str] = []
+        for idx, result in enumerate(results):
+            if isinstance(result, BaseException):
+                errors.append(f"#{idx + 1} '{all_prompts[idx]}': {result}")
+            else:
+                await wait_until_saved(result, return_mode)
+                with metrics.span("result", model):
+                    for artifact in result:
+                        images.extend(await to_content("image", artifact, return_mode))
+
+    if not images:
+        raise ValueError(f"No images were generated: {'; '.join(errors)}")
+    if errors:
+        images.append(
+            f"{len(errors)} of {len(all_prompts)} generations failed:\n"
+            + "\n".join(errors)
+        )
+
+    return images
+
+
+@mcp.tool()
+async def edit_image(
+    prompt: Annotated[str, "How to edit or combine the input images"],
+    images: Annotated[
+        list[str],
+        "Input images, each a file path (in the download directory or "
+        "GEMINI_INPUT_DIRS), gemini-gen://files/ URI, generation ID "
+        "from list_generations, data: URL or base64-encoded image",
+    ],
+    model: ImageModels = ImageModels.NANO_BANANA,
+    aspect_ratio: Annotated[
+        Optional[AspectRatio],
+        "Aspect ratio of the result (default: same as the input)",
+    ] = None,
+    temperature: Annotated[
+        float, "Sampling temperature for image generation (default: 1.0)"
+    ] = 1.0,
+    top_p: Annotated[
+        Optional[float], "Nucleus sampling parameter for image generation (optional)"
+    ] = None,
+    max_dim: Annotated[
+        Optional[int],
+        "Downscale the returned image so its longest side is at most this many pixels",
+    ] = None,
+    output_format: Annotated[
+        Optional[ImageFormat],
+        "Re-encode the returned image as png, jpeg, webp or avif",
+    ] = None,
+    quality: Annotated[
+        Optional[int],
+        "Quality (1-100) for jpeg, webp and avif (default: GEMINI_IMAGE_QUALITY or 80)",
+    ] = None,
+    thumbnail: Annotated[
+        Optional[int], "Also return a thumbnail with this maximum width/height"
+    ] = None,
+    return_mode: Annotated[
+        Optional[ReturnMode],
+        "How to return the image: inline, path, resource_link, preview or auto "
+        "(default: GEMINI_RETURN_MODE or inline)",
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        "Seconds a call to the model may take, including rate limiting and "
+        "retries, before it's aborted. Each fallback model gets its own timeout "
+        "(default: GEMINI_TIMEOUTS for the model, GEMINI_TIMEOUT or 120)",
+    ] = None,
+    ctx: Optional[Context] = None,
+) -> Image | list[ContentBlock]:
+    """Edit images, or combine several into a new one, following a text prompt.
+
+    Large input images are uploaded once through the Files API and reused
+    by reference in later edits.
+    """
+    if not images:
+        raise ValueError("At least one input image is required")
+
+    metrics = get_metrics()
+    progress = Progress(ctx, model)
+    with metrics.span("total", model):
+        inputs = await asyncio.gather(*(load_input_image(i) for i in images))
+        key = cache_key(
+            "edit_image",
+            model=model,
+            prompt=prompt,
+            images=[image.sha256 for image in inputs],
+            aspect_ratio=aspect_ratio,
             temperature=temperature,
             top_p=top_p,
-            image_config=types.ImageConfig(
-                aspect_ratio=str(aspect_ratio) if aspect_ratio else "1:1",
-            ),
+        )
+
+        image = None
+        cache, cached = await lookup(key)
+        if cached:
+            data, fmt, path = cached
+            image = Artifact(fmt, path, data)
+
+        async def generate() -> Artifact:
+            results = await generate_images(
+                prompt,
+                model,
+                aspect_ratio,
+                temperature,
+                top_p,
+                tool="edit_image",
+                inputs=inputs,
+                timeout=timeout,
+                progress=progress,
+            )
+            if cache:
+                cache_artifact(cache, key, results[0], model)
+            return results[0]
+
+        if image is None:
+            # Concurrent identical requests share a single generation
+            image = await coalesce(key, generate)
+
+        results = await postprocess_image(
+            image, max_dim, output_format, quality, thumbnail, model, progress, prompt
+        )
+        await progress.report(Phase.SAVING)
+        await wait_until_saved(results, return_mode)
+        with metrics.span("result", model):
+            return await to_result("image", results, return_mode)
+
+
+def voice_config(voice: VoiceName) -> "types.VoiceConfig":
+    return types.VoiceConfig(
+        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=str(voice))
+    )
+
+
+def speech_request(
+    text: str,
+    voice: Optional[VoiceName],
+    speakers: Optional[dict[str, VoiceName]] = None,
+) -> "tuple[str, types.GenerateContentConfig]":
+    """Build the contents and config of a TTS request.
+
+    With ``speakers``, ``text`` is a conversation of ``Speaker: text`` lines
+    voiced with Gemini's multi-speaker config.
+    """
+
+    # https://ai.google.dev/gemini-api/docs/speech-generation
+    speech_config = None
+    contents = f"Read this text: {text}"
+    if speakers:
+        speech_config = types.SpeechConfig(
+            multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                speaker_voice_configs=[
+                    types.SpeakerVoiceConfig(
+                        speaker=speaker, voice_config=voice_config(speaker_voice)
+                    )
+                    for speaker, speaker_voice in speakers.items()
+                ]
+            )
+        )
+        names = " and ".join(speakers)
+        contents = f"TTS the following conversation between {names}:\n{text}"
+    elif voice:
+        speech_config = types.SpeechConfig(voice_config=voice_config(voice))
+
+    config = types.GenerateContentConfig(
+        response_modalities=["audio"], speech_config=speech_config
+    )
+    return contents, config
+
+
+def extract_audio(
+    response: "types.GenerateContentResponse", model: str
+) -> tuple[list[bytes], PcmFormat]:
+    """Return the raw PCM audio in a TTS response, one chunk per part, and its format.
+
+    A streamed response has several audio parts, which are kept separate
+    rather than joined.
+    """
+    chunks: list[bytes] = []
+    mime_type = None
+
+    if response.candidates:
+        for part in response.candidates[0].content.parts or []:
+            if hasattr(part, "inline_data") and part.inline_data:
+                audio_data = part.inline_data.data
+                if not audio_data:
+                    continue
+                if mime_type is None:
+                    mime_type = part.inline_data.mime_type
+                # Ensure we have bytes, if it's base64 string, decode it
+                if not isinstance(audio_data, bytes):
+                    with get_metrics().span("decode", model):
+                        audio_data = base64.b64decode(audio_data)
+                chunks.append(audio_data)
+
+    if not chunks:
+        raise ValueError("No audio was generated")
+
+    # e.g. audio/L16;codec=pcm;rate=24000
+    return chunks, parse_pcm_mime_type(mime_type)
+
+
+async def synthesize_speech(
+    text: str,
+    model: AudioModels,
+    voice: Optional[VoiceName],
+    priority: int = PRIORITY_INTERACTIVE,
+    speakers: Optional[dict[str, VoiceName]] = None,
+    timeout: Optional[float] = None,
+    progress: Optional[Progress] = None,
+    sink: Optional[WavSpool] = None,
+) -> tuple[list[bytes], PcmFormat, str]:
+    """Synthesize text with a single TTS request.
+
+    Returns the raw PCM audio, its format and the model that generated it,
+    which is one of the model's GEMINI_FALLBACKS if the model failed. A
+    streamed response is written to ``sink`` instead, and no PCM is returned.
+    """
+    contents, config = speech_request(text, voice, speakers)
+    response, used_model = await with_fallback(
+        [model, *get_fallbacks(model, DEFAULT_FALLBACKS)],
+        lambda m: generate_content(
+            model=m,
+            contents=contents,
+            config=config,
+            priority=priority,
+            timeout=timeout,
+            progress=progress,
+            sink=sink,
         ),
     )
+    if sink is not None and sink.size:
+        return [], sink.pcm_format, used_model
+    return (*extract_audio(response, used_model), used_model)
 
-    if not response.candidates:
-        raise ValueError("No images were generated")
 
-    download_path = get_download_path(
-        os.path.join("images", datetime.now().strftime("%Y-%m-%d"))
+def get_chunk_chars() -> int:
+    return int(os.environ.get("GEMINI_TTS_CHUNK_CHARS", DEFAULT_CHUNK_CHARS))
+
+
+async def synthesize_segments(
+    segments: list[Segment],
+    model: AudioModels,
+    wav_path: str,
+    progress: Optional[Progress] = None,
+    timeout: Optional[float] = None,
+) -> tuple[int, PcmFormat, list[str]]:
+    """Synthesize segments concurrently, appending their PCM to a WAV file in order.
+
+    Each segment is written to ``wav_path`` as soon as every earlier segment
+    has been written. Returns the number of segments, the audio's PCM format
+    and the models that generated them.
+    """
+    if not segments:
+        raise ValueError("No text to convert to speech")
+
+    semaphore = asyncio.Semaphore(
+        max(int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4")), 1)
     )
-    timestamp = int(time.time() * 1000)
+
+    async def synthesize(segment: Segment) -> tuple[list[bytes], PcmFormat, str]:
+        async with semaphore:
+            return await synthesize_speech(
+                segment.text,
+                model,
+                segment.voice,
+                PRIORITY_BATCH,
+                speakers=dict(segment.speakers) or None,
+                timeout=timeout,
+            )
+
+    tasks = [asyncio.create_task(synthesize(segment)) for segment in segments]
+    try:
+        with open(wav_path, "wb", buffering=0) as f:
+            # Placeholder header, rewritten with the final size at the end
+            write_all(f.fileno(), [wav_header(0)])
+            data_size = 0
+            pcm_format = None
+            models: list[str] = []
+            for idx, task in enumerate(tasks):
+                pcm_chunks, segment_format, segment_model = await task
+                if segment_model not in models:
+                    models.append(segment_model)
+                if pcm_format is None:
+                    pcm_format = segment_format
+                elif segment_format != pcm_format:
+                    raise ValueError(
+                        f"Segment {idx + 1} has a different audio format: {segment_format}"
+                    )
+                await asyncio.to_thread(write_all, f.fileno(), pcm_chunks)
+                data_size += sum(len(chunk) for chunk in pcm_chunks)
+                if progress is not None:
+                    await progress.count(
+                        idx + 1,
+                        len(segments),
+                        f"Synthesized segment {idx + 1} of {len(segments)}",
+                    )
+            f.seek(0)
+            write_all(f.fileno(), [wav_header(data_size, pcm_format)])
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+        raise
+
+    return len(segments), pcm_format, models
+
+
+@discard_on_cancel
+async def generate_speech(
+    text: str,
+    model: AudioModels,
+    voice: Optional[VoiceName],
+    long_form: bool = False,
+    ctx: Optional[Context] = None,
+    output_format: Optional[AudioFormat] = None,
+    segments: Optional[list[Segment]] = None,
+    tool: str = "text_to_speech",
+    params: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> Artifact:
+    """Generate speech for text, save it as an audio file and record it in the catalog.
+
+    Long-form text is split at sentence boundaries into segments, which are
+    synthesized concurrently and written in order. Callers can also pass
+    their own ``segments``, e.g. the turns of a dialogue.
+    """
+
+    fmt = get_audio_format(output_format)
+    check_encoder(fmt)  # fail before calling the API if it can't be encoded
+
+    started = time.perf_counter()
+    sub_dir = os.path.join("audios", datetime.now().strftime("%Y-%m-%d"))
+    download_path = get_download_path(sub_dir, create=False)
+    name = new_generation_id()
     info = {
+        "text": text,
         "model": model,
-        "prompt": prompt,
-        "aspect_ratio": aspect_ratio,
-        "temperature": temperature,
-        "top_p": top_p,
+        "voice": voice,
+        **(params or {}),
+        "format": fmt,
     }
-    info_path = os.path.join(download_path, f"{timestamp}.info.json")
-    with open(info_path, "w") as f:
-        json.dump(info, f, indent=4)
 
-    # Extract images from response
-    images: list[Image] = []
-    if response.candidates:
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, "inline_data") and part.inline_data:
-                image_data = part.inline_data.data
-                mime_type = part.inline_data.mime_type
+    wav_path = os.path.join(download_path, f"{name}.wav")
+    file_path = os.path.join(download_path, f"{name}.{fmt}")
+    if long_form and segments is None:
+        chunks = split_text(text, get_chunk_chars())
+        segments = [Segment(chunk, voice=voice) for chunk in chunks]
+    if segments is not None:
+        await asyncio.to_thread(get_download_path, sub_dir)
+        info["chunks"], pcm_format, models = await synthesize_segments(
+            segments, model, wav_path, Progress(ctx, model), timeout
+        )
+        if fmt != AudioFormat.WAV:
+            try:
+                with get_metrics().span("encode", model):
+                    await transcode_file(wav_path, file_path, fmt)
+            finally:
+                await asyncio.to_thread(os.remove, wav_path)
+        # The file is already on disk, it's only read back if needed
+        artifact = Artifact(format=fmt, path=file_path)
+    else:
+        progress = Progress(ctx, model)
+        # A streamed response is written to disk as it arrives
+        spool = WavSpool(wav_path)
+        try:
+            pcm_chunks, pcm_format, used_model = await synthesize_speech(
+                text, model, voice, timeout=timeout, progress=progress, sink=spool
+            )
+            models = [used_model]
+            await progress.report(Phase.ENCODING)
+            if spool.size:
+                artifact = await finish_spool(spool, fmt, file_path, model)
+            else:
+                artifact = await write_speech(
+                    pcm_chunks, pcm_format, fmt, file_path, model
+                )
+        except BaseException:
+            await spool.discard()
+            raise
+        await progress.report(Phase.SAVING)
 
-                # Ensure we have bytes
-                if isinstance(image_data, bytes):
-                    data = image_data
-                else:
-                    # If it's base64 string, decode it
-                    data = base64.b64decode(image_data)
+    if models != [model]:
+        # Segments may have fallen back to different models
+        info["model"] = models[0] if len(models) == 1 else models
+        info["requested_model"] = model
+    artifact.model = models[0] if len(models) == 1 else None
+    record_speech(artifact, name, info, pcm_format, text, models[0], tool, started)
+    return artifact
 
-                # Extract format from mime_type (e.g., "image/png" -> "png")
-                fmt = mime_type.split("/")[1] if "/" in mime_type else "png"
 
-                try:
-                    idx = len(images)
-                    suffix = f"_{idx + 1}" if len(images) > 1 else ""
-                    file_path = os.path.join(
-                        download_path, f"{timestamp}{suffix}.{fmt}"
-                    )
-                    with open(file_path, "wb") as f:
-                        f.write(data)
-                except Exception as e:
-                    print(f"Failed to save image: {e}")
+async def write_speech(
+    pcm_chunks: list[bytes],
+    pcm_format: PcmFormat,
+    fmt: AudioFormat,
+    file_path: str,
+    model: str,
+) -> Artifact:
+    """Encode PCM audio as ``fmt`` and write it to ``file_path`` in the background."""
+    writer = get_writer()
+    if fmt == AudioFormat.WAV:
+        # A WAV file is a 44-byte header followed by the PCM. The header and
+        # each PCM chunk are written to disk as is, and only joined in memory
+        # if returned inline.
+        with get_metrics().span("encode", model):
+            data_size = sum(len(chunk) for chunk in pcm_chunks)
+            parts = [wav_header(data_size, pcm_format), *pcm_chunks]
+        writer.write_buffers(file_path, parts)
+        return Artifact(format=fmt, path=file_path, parts=parts)
 
-                images.append(Image(data=data, format=fmt))
+    with get_metrics().span("encode", model):
+        pcm = pcm_chunks[0] if len(pcm_chunks) == 1 else b"".join(pcm_chunks)
+        data = await encode_pcm(pcm, pcm_format, fmt)
+    writer.write_bytes(file_path, data)
+    return Artifact(format=fmt, path=file_path, data=data)
 
-    if not images:
-        raise ValueError("No images were generated")
 
-    return images[0]
+async def finish_spool(
+    spool: WavSpool, fmt: AudioFormat, file_path: str, model: str
+) -> Artifact:
+    """Complete a streamed WAV file, encoding it as ``fmt`` if that's not WAV."""
+    await spool.finish()
+    if fmt != AudioFormat.WAV:
+        try:
+            with get_metrics().span("encode", model):
+                await transcode_file(spool.path, file_path, fmt)
+        finally:
+            await asyncio.to_thread(os.remove, spool.path)
+    # The file is already on disk, it's only read back if needed
+    return Artifact(format=fmt, path=file_path)
+
+
+def record_speech(
+    artifact: Artifact,
+    name: str,
+    info: dict,
+    pcm_format: PcmFormat,
+    text: str,
+    model: str,
+    tool: str,
+    started: float,
+) -> None:
+    """Write a saved audio file's .info.json sidecar and record it in the catalog."""
+    writer = get_writer()
+    info["sample_rate"] = pcm_format.sample_rate
+    writer.write_json(
+        os.path.join(os.path.dirname(artifact.path), f"{name}.info.json"), info
+    )
+    writer.run(
+        record_generation,
+        GenerationRecord(
+            id=name,
+            tool=tool,
+            kind="audio",
+            model=model,
+            prompt=text,
+            path=artifact.path,
+            format=artifact.format,
+            size=artifact.size,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            params=info,
+        ),
+        get_download_root(),
+    )
 
 
 @mcp.tool()
@@ -218,92 +1253,561 @@ async def text_to_speech(
     text: Annotated[str, "Text to convert to speech"],
     model: AudioModels = AudioModels.GEMINI_2_5_FLASH_PREVIEW_TTS,
     voice: VoiceName = VoiceName.KORE,
-) -> Audio:
+    long_form: Annotated[
+        bool,
+        "Split long text at sentence boundaries and synthesize chunks concurrently",
+    ] = False,
+    return_mode: Annotated[
+        Optional[ReturnMode],
+        "How to return the audio: inline, path, resource_link, preview or auto "
+        "(default: GEMINI_RETURN_MODE or inline)",
+    ] = None,
+    output_format: Annotated[
+        Optional[AudioFormat],
+        "Audio format: wav, flac, ogg (Opus) or mp3. Compressed formats require "
+        "ffmpeg (default: GEMINI_AUDIO_FORMAT or wav)",
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        "Seconds each request (or long-form segment) may take, including rate "
+        "limiting and retries, before it's aborted. Each fallback model gets its "
+        "own timeout (default: GEMINI_TIMEOUTS for the model, GEMINI_TIMEOUT or 120)",
+    ] = None,
+    ctx: Optional[Context] = None,
+) -> Audio | list[ContentBlock]:
     """Generate speech audio from text using Gemini Flash TTS model."""
 
-    # Configure Gemini API
-    # https://ai.google.dev/gemini-api/docs/speech-generation
-    client = create_client()
+    metrics = get_metrics()
+    with metrics.span("total", model):
+        fmt = get_audio_format(output_format)
+        key = cache_key(
+            "text_to_speech",
+            model=model,
+            text=text,
+            voice=voice,
+            long_form=long_form,
+            output_format=fmt,
+        )
+        cache, cached = await lookup(key)
+        if cached:
+            data, fmt, path = cached
+            return await to_result("audio", Artifact(fmt, path, data), return_mode)
 
-    speech_config = None
-    if voice:
-        speech_config = types.SpeechConfig(
-            voice_config=types.VoiceConfig(
-                prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                    voice_name=str(voice),
-                )
+        async def generate() -> Artifact:
+            artifact = await generate_speech(
+                text, model, voice, long_form, ctx, fmt, timeout=timeout
             )
+            if cache:
+                cache_artifact(cache, key, artifact, model)
+            return artifact
+
+        # Concurrent identical requests share a single generation
+        artifact = await coalesce(key, generate)
+
+        await wait_until_saved([artifact], return_mode)
+        with metrics.span("result", model):
+            return await to_result("audio", artifact, return_mode)
+
+
+class DialogueMode(StrEnum):
+    """How multi-speaker dialogue is synthesized."""
+
+    AUTO = "auto"  # multi_speaker for two speakers, otherwise segments
+    MULTI_SPEAKER = "multi_speaker"  # Gemini's multi-speaker config (two speakers)
+    SEGMENTS = "segments"  # each speaker's turn separately, in its own voice
+
+
+@mcp.tool()
+async def text_to_dialogue(
+    script: Annotated[
+        str,
+        "Dialogue script with one 'Speaker: text' line per turn, e.g. "
+        "'Joe: How are you?\\nJane: Great, thanks!'",
+    ],
+    speakers: Annotated[
+        dict[str, VoiceName],
+        "Voice for each speaker in the script, e.g. {'Joe': 'Kore', 'Jane': 'Puck'}",
+    ],
+    model: AudioModels = AudioModels.GEMINI_2_5_FLASH_PREVIEW_TTS,
+    mode: Annotated[
+        DialogueMode,
+        "multi_speaker voices two speakers together with Gemini's multi-speaker "
+        "config, segments synthesizes each turn separately and concurrently, "
+        "auto picks multi_speaker for two speakers (default: auto)",
+    ] = DialogueMode.AUTO,
+    return_mode: Annotated[
+        Optional[ReturnMode],
+        "How to return the audio: inline, path, resource_link, preview or auto "
+        "(default: GEMINI_RETURN_MODE or inline)",
+    ] = None,
+    output_format: Annotated[
+        Optional[AudioFormat],
+        "Audio format: wav, flac, ogg (Opus) or mp3. Compressed formats require "
+        "ffmpeg (default: GEMINI_AUDIO_FORMAT or wav)",
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        "Seconds each request (or dialogue segment) may take, including rate "
+        "limiting and retries, before it's aborted. Each fallback model gets its "
+        "own timeout (default: GEMINI_TIMEOUTS for the model, GEMINI_TIMEOUT or 120)",
+    ] = None,
+    ctx: Optional[Context] = None,
+) -> Audio | list[ContentBlock]:
+    """Generate podcast-style dialogue audio with a different voice per speaker.
+
+    Long scripts are split into segments that are synthesized concurrently
+    and joined in order into a single audio file.
+    """
+    if not speakers:
+        raise ValueError("At least one speaker voice is required")
+    lines = parse_script(script, speakers)
+    if not lines:
+        raise ValueError("No dialogue to convert to speech")
+
+    used = sorted({speaker for speaker, _ in lines})
+    mode = DialogueMode(mode)
+    if mode == DialogueMode.AUTO:
+        mode = DialogueMode.MULTI_SPEAKER if len(used) == 2 else DialogueMode.SEGMENTS
+    if mode == DialogueMode.MULTI_SPEAKER and len(used) != 2:
+        raise ValueError(
+            f"multi_speaker mode supports exactly 2 speakers, the script has {len(used)}"
         )
 
-    # Generate audio with the text
-    response = client.models.generate_content(
-        model=model,
-        contents=f"Read this text: {text}",
-        config=types.GenerateContentConfig(
-            response_modalities=["audio"], speech_config=speech_config
+    metrics = get_metrics()
+    with metrics.span("total", model):
+        fmt = get_audio_format(output_format)
+        voices = {speaker: VoiceName(speakers[speaker]) for speaker in used}
+        key = cache_key(
+            "text_to_dialogue",
+            model=model,
+            lines=lines,
+            speakers=voices,
+            mode=mode,
+            output_format=fmt,
+        )
+        artifact = None
+        cache, cached = await lookup(key)
+        if cached:
+            data, cached_fmt, path = cached
+            artifact = Artifact(cached_fmt, path, data)
+
+        async def generate() -> Artifact:
+            segments = dialogue_segments(
+                lines, voices, mode == DialogueMode.MULTI_SPEAKER, get_chunk_chars()
+            )
+            result = await generate_speech(
+                "\n".join(f"{speaker}: {text}" for speaker, text in lines),
+                model,
+                None,
+                ctx=ctx,
+                output_format=fmt,
+                segments=segments,
+                tool="text_to_dialogue",
+                params={"speakers": voices, "mode": mode},
+                timeout=timeout,
+            )
+            if cache:
+                cache_artifact(cache, key, result, model)
+            return result
+
+        if artifact is None:
+            # Concurrent identical requests share a single generation
+            artifact = await coalesce(key, generate)
+
+        await wait_until_saved([artifact], return_mode)
+        with metrics.span("result", model):
+            return await to_result("audio", artifact, return_mode)
+
+
+@mcp.tool()
+async def submit_batch(
+    kind: Annotated[BatchKind, "image to generate images, speech to generate audio"],
+    prompts: Annotated[
+        list[str], "Image prompts or texts to speak, one request (and file) each"
+    ],
+    model: Annotated[
+        Optional[str],
+        "Model to use (default: gemini-2.5-flash-image for images, "
+        "gemini-2.5-flash-preview-tts for speech)",
+    ] = None,
+    aspect_ratio: Annotated[
+        Optional[AspectRatio], "Aspect ratio of the images (default: 1:1)"
+    ] = None,
+    temperature: Annotated[float, "Image sampling temperature"] = 1.0,
+    top_p: Annotated[Optional[float], "Image nucleus sampling top_p"] = None,
+    voice: Annotated[VoiceName, "Voice to use for speech"] = VoiceName.KORE,
+    output_format: Annotated[
+        Optional[AudioFormat],
+        "Audio format: wav, flac, ogg (Opus) or mp3 (default: GEMINI_AUDIO_FORMAT or wav)",
+    ] = None,
+    display_name: Annotated[Optional[str], "Name shown for the job"] = None,
+) -> dict:
+    """Submit an offline Gemini Batch API job generating many images or audio clips.
+
+    Batch jobs cost half as much as interactive calls and usually finish
+    within hours. Poll batch_status with the returned job name, then save
+    the files with fetch_batch_results.
+    """
+    if not prompts:
+        raise ValueError("At least one prompt is required")
+
+    kind = BatchKind(kind)
+    if kind == BatchKind.IMAGE:
+        model = ImageModels(model or ImageModels.NANO_BANANA)
+        requests = [
+            image_request(prompt, aspect_ratio, temperature, top_p)
+            for prompt in prompts
+        ]
+        params = {
+            "aspect_ratio": aspect_ratio,
+            "temperature": temperature,
+            "top_p": top_p,
+        }
+    else:
+        model = AudioModels(model or AudioModels.GEMINI_2_5_FLASH_PREVIEW_TTS)
+        fmt = get_audio_format(output_format)
+        check_encoder(fmt)
+        requests = [speech_request(text, voice) for text in prompts]
+        params = {"voice": voice, "format": fmt}
+
+    display_name = display_name or f"gemini-gen-{kind}-{new_generation_id()}"
+    # Jobs can only be read with a key of the project that created them
+    key = get_key_pool().choose()
+    client = get_client(key.key)
+    src = await create_source(client, model, requests, display_name)
+    job = await call_with_retry(
+        model,
+        lambda: client.aio.batches.create(
+            model=model,
+            src=src,
+            config=types.CreateBatchJobConfig(display_name=display_name),
         ),
+        priority=PRIORITY_BATCH,
     )
+    await save_manifest(
+        BatchManifest(
+            name=job.name,
+            kind=kind,
+            model=model,
+            prompts=prompts,
+            params=params,
+            key_id=key.id,
+        )
+    )
+    return {**job_summary(job), "kind": kind, "requests": len(prompts)}
 
-    # Extract audio from response
-    audio_data = None
-    # mime_type = None
 
-    if response.candidates:
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, "inline_data") and part.inline_data:
-                audio_data = part.inline_data.data
-                # mime_type = part.inline_data.mime_type
-                break
+@mcp.tool()
+async def batch_status(
+    name: Annotated[str, "Batch job name returned by submit_batch, e.g. batches/123"],
+) -> dict:
+    """Check the state of a batch job submitted with submit_batch."""
+    try:
+        key_id = (await load_manifest(name)).key_id
+    except ValueError:
+        key_id = None  # submitted elsewhere, try the next key
+    job = await get_client(get_key_pool().get(key_id).key).aio.batches.get(name=name)
+    return job_summary(job)
 
-    if not audio_data:
-        raise ValueError("No audio was generated")
 
-    try:
-        # Ensure we have bytes
-        if isinstance(audio_data, bytes):
-            pcm_data = audio_data
-        else:
-            # If it's base64 string, decode it
-            import base64
+async def save_batch_result(
+    manifest: BatchManifest,
+    idx: int,
+    response: "types.GenerateContentResponse",
+    started: float,
+) -> list[Artifact]:
+    """Save the files of one batch response like the interactive tools do."""
+    prompt = manifest.prompts[idx]
+    info = {"model": manifest.model, **manifest.params}
+    info["batch"] = manifest.name
+    info["batch_index"] = idx
+    if manifest.kind == BatchKind.IMAGE:
+        info["prompt"] = prompt
+        return save_images(
+            response, prompt, manifest.model, info, "submit_batch", started
+        )
 
-            pcm_data = base64.b64decode(audio_data)
+    info["text"] = prompt
+    pcm_chunks, pcm_format = extract_audio(response, manifest.model)
+    fmt = AudioFormat(manifest.params["format"])
+    sub_dir = os.path.join("audios", datetime.now().strftime("%Y-%m-%d"))
+    name = new_generation_id()
+    file_path = os.path.join(get_download_path(sub_dir, create=False), f"{name}.{fmt}")
+    artifact = await write_speech(
+        pcm_chunks, pcm_format, fmt, file_path, manifest.model
+    )
+    record_speech(
+        artifact, name, info, pcm_format, prompt, manifest.model, "submit_batch", started
+    )
+    return [artifact]
 
-        # mime_type audio/L16;codec=pcm;rate=24000
-        # ext = mime_type.split("/")[1].split(";")[0]
 
-        # Convert PCM to WAV
-        wav_io = io.BytesIO()
-        with wave.open(wav_io, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(24000)
-            wf.writeframes(pcm_data)
-        wav_data = wav_io.getvalue()
+@mcp.tool()
+async def fetch_batch_results(
+    name: Annotated[str, "Batch job name returned by submit_batch, e.g. batches/123"],
+) -> dict:
+    """Save the results of a finished batch job into the images/ or audios/ folder.
 
-        info = {
-            "text": text,
-            "model": model,
-            "voice": voice,
-        }
-        download_path = get_download_path(
-            os.path.join("audios", datetime.now().strftime("%Y-%m-%d"))
+    Each file gets an .info.json sidecar and a catalog entry, as with the
+    interactive tools. Fetching the same job again returns the saved files.
+    """
+    manifest = await load_manifest(name)
+    if manifest.results is None:
+        client = get_client(get_key_pool().get(manifest.key_id).key)
+        job = await client.aio.batches.get(name=name)
+        summary = job_summary(job)
+        if job.state not in SUCCEEDED_STATES:
+            reason = f": {summary['error']}" if "error" in summary else ""
+            raise ValueError(f"Batch job {name} is {summary['state']}{reason}")
+
+        results = await load_results(client, job, len(manifest.prompts))
+        # Latency of batch results is measured from submission
+        started = time.perf_counter() - (time.time() - manifest.created_at)
+        semaphore = asyncio.Semaphore(
+            max(int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4")), 1)
         )
-        timestamp = int(time.time() * 1000)
-        info_path = os.path.join(download_path, f"{timestamp}.info.json")
-        with open(info_path, "w") as f:
-            json.dump(info, f, indent=4)
 
-        with open(os.path.join(download_path, f"{timestamp}.wav"), "wb") as f:
-            f.write(wav_data)
-    except Exception as e:
-        print(f"Failed to save audio: {e}")
+        async def save(idx: int, response, error: Optional[str]) -> dict:
+            if error is None:
+                try:
+                    async with semaphore:
+                        artifacts = await save_batch_result(
+                            manifest, idx, response, started
+                        )
+                except Exception as e:
+                    error = str(e)
+                else:
+                    await get_writer().wait_for(*[a.path for a in artifacts])
+                    return {"index": idx, "paths": [a.path for a in artifacts]}
+            return {"index": idx, "error": error}
+
+        manifest.results = await asyncio.gather(
+            *(save(idx, resp, error) for idx, (resp, error) in enumerate(results))
+        )
+        await save_manifest(manifest)
+
+    return {
+        "name": name,
+        "kind": manifest.kind,
+        "saved": sum("paths" in r for r in manifest.results),
+        "failed": sum("error" in r for r in manifest.results),
+        "results": manifest.results,
+    }
+
+
+@mcp.resource(f"{RESOURCE_URI_PREFIX}{{path*}}", mime_type="application/octet-stream")
+async def generated_file(path: str) -> bytes:
+    """Read a generated image or audio file from the download directory."""
+    await get_writer().wait_for(os.path.join(get_download_root(), path))
+    root = os.path.realpath(get_download_root())
+    file_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, file_path]) != root or not os.path.isfile(file_path):
+        raise ValueError(f"File not found: {path}")
+    return await asyncio.to_thread(Path(file_path).read_bytes)
+
 
-    return Audio(data=wav_data, format="wav")
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse an ISO date or datetime (e.g. 2025-01-31 or 2025-01-31T12:00)."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).timestamp()
 
 
-def main():
+@mcp.tool()
+async def list_generations(
+    kind: Annotated[
+        Optional[Literal["image", "audio"]], "Only list images or audio"
+    ] = None,
+    model: Annotated[Optional[str], "Only list generations from this model"] = None,
+    limit: Annotated[int, "Maximum number of results (default: 20)"] = 20,
+    offset: Annotated[int, "Number of results to skip"] = 0,
+) -> list[dict]:
+    """List previously generated images and audio, newest first."""
+    return await asyncio.to_thread(
+        get_catalog().query, kind=kind, model=model, limit=limit, offset=offset
+    )
+
+
+@mcp.tool()
+async def search_generations(
+    query: Annotated[str, "Text to search for in prompts"],
+    kind: Annotated[
+        Optional[Literal["image", "audio"]], "Only search images or audio"
+    ] = None,
+    model: Annotated[Optional[str], "Only search generations from this model"] = None,
+    since: Annotated[
+        Optional[str], "Only include generations on or after this ISO date/time"
+    ] = None,
+    until: Annotated[
+        Optional[str], "Only include generations before this ISO date/time"
+    ] = None,
+    limit: Annotated[int, "Maximum number of results (default: 20)"] = 20,
+) -> list[dict]:
+    """Search previously generated images and audio by prompt, newest first."""
+    return await asyncio.to_thread(
+        get_catalog().query,
+        text=query,
+        kind=kind,
+        model=model,
+        since=parse_timestamp(since),
+        until=parse_timestamp(until),
+        limit=limit,
+    )
+
+
+def get_server_stats() -> dict:
+    """Collect latency, byte, client, cache, writer, rate limit and janitor stats."""
+    return {
+        "models": get_metrics().stats(),
+        "clients": get_client_stats(),
+        "cache": get_cache_stats(),
+        "writer": get_writer_stats(),
+        "rate_limits": get_scheduler_stats(),
+        "coalescing": get_coalescing_stats(),
+        "uploads": get_upload_stats(),
+        "api_keys": get_key_stats(),
+        "hedging": get_hedging_stats(),
+        "janitor": get_janitor_stats(),
+    }
+
+
+@mcp.tool()
+async def server_stats(
+    format: Annotated[
+        Literal["json", "prometheus"],
+        "json for a summary with p50/p95/p99 latencies per model and phase, "
+        "or prometheus for the text exposition format",
+    ] = "json",
+) -> dict | str:
+    """Report per-model latency percentiles, byte counts and server internals."""
+    if format == "prometheus":
+        return get_metrics().to_prometheus()
+    return get_server_stats()
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint, served when running over HTTP."""
+    return PlainTextResponse(
+        get_metrics().to_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+class Transport(StrEnum):
+    """MCP transports the server can run on."""
+
+    STDIO = "stdio"
+    HTTP = "http"
+    STREAMABLE_HTTP = "streamable-http"
+    SSE = "sse"
+
+
+def http_app():
+    """Create the ASGI app for one HTTP worker, configured by GEMINI_TRANSPORT etc.
+
+    Used as the uvicorn app factory in multi-worker mode. Each worker is a
+    separate process, so sessions are stateless and any worker can serve any
+    request.
+    """
+    transport = Transport(os.environ.get("GEMINI_TRANSPORT", Transport.HTTP))
+    if transport == Transport.STDIO:
+        raise ValueError("http_app() requires an HTTP transport")
+    workers = int(os.environ.get("GEMINI_WORKERS", 1))
+    # Every worker runs one; they take turns through a lock file
+    start_janitor()
+    return mcp.http_app(
+        path=os.environ.get("GEMINI_HTTP_PATH") or None,
+        transport=transport,
+        stateless_http=True if workers > 1 else None,
+    )
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse the command line, defaulting to the GEMINI_TRANSPORT etc. variables."""
+    parser = argparse.ArgumentParser(
+        prog="gemini-gen-mcp",
+        description="MCP Server for Gemini Image and Audio generation",
+    )
+    parser.add_argument(
+        "--transport",
+        type=Transport,
+        choices=list(Transport),
+        default=os.environ.get("GEMINI_TRANSPORT", Transport.STDIO),
+        help="MCP transport (default: stdio)",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.environ.get("GEMINI_HOST", "127.0.0.1"),
+        help="Address to listen on over HTTP (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.environ.get("GEMINI_PORT", 8000)),
+        help="Port to listen on over HTTP (default: 8000)",
+    )
+    parser.add_argument(
+        "--path",
+        default=os.environ.get("GEMINI_HTTP_PATH"),
+        help="URL path of the MCP endpoint (default: /mcp, or /sse for sse)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("GEMINI_WORKERS", 1)),
+        help="Worker processes serving HTTP requests (default: 1)",
+    )
+    args = parser.parse_args(argv)
+    args.transport = Transport(args.transport)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.transport in (Transport.STDIO, Transport.SSE):
+        # An SSE session's messages must reach the process holding its stream
+        parser.error(f"--workers requires the http transport, not {args.transport}")
+    return args
+
+
+def main(argv: Optional[list[str]] = None):
     """Run the MCP server."""
-    mcp.run()
+    args = parse_args(argv)
+    if os.environ.get("GEMINI_PRELOAD", "").lower() in ("1", "true", "yes", "on"):
+        # Import the SDK while the client connects rather than on the first call,
+        # at the cost of a slower handshake
+        preload(genai, types)
+    if args.workers == 1:
+        start_janitor()
+    try:
+        if args.transport == Transport.STDIO:
+            mcp.run()
+        elif args.workers == 1:
+            mcp.run(
+                transport=args.transport,
+                host=args.host,
+                port=args.port,
+                path=args.path,
+            )
+        else:
+            import uvicorn
+
+            # Workers are spawned and configure themselves from the environment
+            os.environ.update(
+                GEMINI_TRANSPORT=args.transport,
+                GEMINI_WORKERS=str(args.workers),
+                GEMINI_HTTP_PATH=args.path or "",
+            )
+            module = __spec__.name if __spec__ else __name__
+            uvicorn.run(
+                f"{module}:http_app",
+                factory=True,
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                timeout_graceful_shutdown=30,
+            )
+    finally:
+        stop_janitor()
+        # Don't exit before queued artifacts are written
+        shutdown_writer()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,361 @@
+"""Background persistence of generated files and their .info.json sidecars."""
+
+import asyncio
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any, Awaitable, Callable, Optional, Sequence, TypeVar
+
+from .audio import PcmFormat, parse_pcm_mime_type, wav_header
+from .catalog import forget_paths
+from .metrics import get_metrics
+from .paths import get_download_root
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def write_all(fd: int, buffers: Sequence[bytes]) -> None:
+    """Write every buffer to ``fd`` in order, with a single writev where supported."""
+    views = [memoryview(b).cast("B") for b in buffers if len(b)]
+    while views:
+        if hasattr(os, "writev"):
+            written = os.writev(fd, views[:1024])
+        else:
+            written = os.write(fd, views[0])
+        # Drop what was written, a short write can end mid-buffer
+        while views and written >= len(views[0]):
+            written -= len(views.pop(0))
+        if written:
+            views[0] = views[0][written:]
+
+
+class FsyncPolicy(StrEnum):
+    """When written files are forced to stable storage."""
+
+    NEVER = "never"  # leave flushing to the OS
+    FILE = "file"  # fsync each file before it's renamed into place
+    FULL = "full"  # also fsync the directory so the rename is durable
+
+
+@dataclass
+class WriteScope:
+    """Writes queued during a call, so they can be undone if it's cancelled."""
+
+    futures: list[Future] = field(default_factory=list)
+    paths: list[str] = field(default_factory=list)
+
+
+_write_scope: ContextVar[Optional[WriteScope]] = ContextVar("write_scope", default=None)
+
+
+class ArtifactWriter:
+    """Writes files on a thread pool so tools can return without waiting on disk.
+
+    Files are written to a temporary name and atomically renamed into place,
+    so readers never see partial files. Writes still pending can be awaited
+    by path with ``wait_for`` or all at once with ``flush``.
+    """
+
+    def __init__(self, max_workers: int = 2, fsync: FsyncPolicy = FsyncPolicy.NEVER):
+        self.fsync = FsyncPolicy(fsync)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="gemini-writer"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._futures: set[Future] = set()
+        self.max_queue_depth = 0
+        self.writes = 0
+        self.failures = 0
+        self.bytes_written = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    def _write_file(self, path: str, buffers: Sequence[bytes]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb", buffering=0) as f:
+            write_all(f.fileno(), buffers)
+            if self.fsync != FsyncPolicy.NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self.fsync == FsyncPolicy.FULL:
+            dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _run(self, path: Optional[str], fn: Callable, args: tuple, queued: float):
+        try:
+            started = time.perf_counter()
+            fn(*args)
+            finished = time.perf_counter()
+            latency = finished - queued
+            if path:
+                get_metrics().observe("write", (finished - started) * 1000)
+            with self._lock:
+                self.writes += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.error("Failed to save %s: %s", path or "file", e)
+            raise
+
+    def _submit(self, path: Optional[str], fn: Callable, *args) -> Future:
+        future = self._executor.submit(
+            self._run, path, fn, args, time.perf_counter()
+        )
+        with self._lock:
+            self._futures.add(future)
+            if path:
+                self._pending[path] = future
+            self.max_queue_depth = max(self.max_queue_depth, len(self._futures))
+
+        def done(f: Future) -> None:
+            with self._lock:
+                self._futures.discard(f)
+                if path and self._pending.get(path) is f:
+                    del self._pending[path]
+
+        future.add_done_callback(done)
+        scope = _write_scope.get()
+        if scope is not None:
+            scope.futures.append(future)
+            if path:
+                scope.paths.append(path)
+        return future
+
+    def _discard(self, futures: list[Future], paths: list[str], root: str) -> None:
+        wait(futures)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        forget_paths(paths, root)
+
+    def discard(self, scope: WriteScope) -> Future:
+        """Queue removing the files written in ``scope`` and their catalog records."""
+        return self._submit(
+            None,
+            self._discard,
+            list(scope.futures),
+            list(scope.paths),
+            get_download_root(),
+        )
+
+    def write_bytes(self, path: str, data: bytes) -> Future:
+        """Queue writing ``data`` to ``path``."""
+        return self.write_buffers(path, [data])
+
+    def write_buffers(self, path: str, buffers: Sequence[bytes]) -> Future:
+        """Queue writing the concatenation of ``buffers`` to ``path`` without joining them."""
+        with self._lock:
+            self.bytes_written += sum(len(b) for b in buffers)
+        return self._submit(path, self._write_file, path, buffers)
+
+    def write_json(self, path: str, obj: Any) -> Future:
+        """Queue writing ``obj`` as JSON to ``path``."""
+        data = json.dumps(obj, indent=4, default=str).encode("utf-8")
+        return self.write_bytes(path, data)
+
+    def run(self, fn: Callable, *args) -> Future:
+        """Queue an arbitrary blocking call, e.g. storing a result in the cache."""
+        return self._submit(None, fn, *args)
+
+    async def wait_for(self, *paths: str) -> None:
+        """Wait until pending writes of the given paths have completed."""
+        with self._lock:
+            futures = [self._pending[p] for p in paths if p in self._pending]
+        for future in futures:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass  # already reported by _run
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every queued write has completed."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def shutdown(self) -> None:
+        """Flush pending writes and stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._futures),
+                "max_queue_depth": self.max_queue_depth,
+                "writes": self.writes,
+                "failures": self.failures,
+                "bytes_written": self.bytes_written,
+                "avg_latency_ms": round(
+                    1000 * self.total_latency / self.writes, 3
+                )
+                if self.writes
+                else 0.0,
+                "max_latency_ms": round(1000 * self.max_latency, 3),
+                "fsync": str(self.fsync),
+            }
+
+
+class WavSpool:
+    """Writes streamed PCM to a WAV file as it arrives, instead of collecting it.
+
+    The PCM is appended to a temporary file after a placeholder header, off
+    the event loop. ``finish`` writes the real header and renames the file
+    into place, ``reset`` starts over (e.g. when a request is retried).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.{id(self)}.tmp"
+        self.size = 0
+        self.mime_type: Optional[str] = None
+        self._fd: Optional[int] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def pcm_format(self) -> PcmFormat:
+        return parse_pcm_mime_type(self.mime_type)
+
+    def _write(self, data: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                return  # discarded while this write was queued
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._fd = os.open(
+                    self.tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+                )
+                write_all(self._fd, [wav_header(0)])
+            write_all(self._fd, [data])
+
+    def _close(self, keep: bool) -> None:
+        with self._lock:
+            fd, self._fd = self._fd, None
+            if fd is None:
+                return
+            try:
+                if keep:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    write_all(fd, [wav_header(self.size, self.pcm_format)])
+            finally:
+                os.close(fd)
+            if keep:
+                os.replace(self.tmp_path, self.path)
+            else:
+                os.remove(self.tmp_path)
+
+    async def write(self, data: bytes, mime_type: Optional[str] = None) -> None:
+        """Append a chunk of PCM."""
+        self.mime_type = self.mime_type or mime_type
+        await asyncio.to_thread(self._write, data)
+        self.size += len(data)
+
+    async def reset(self) -> None:
+        """Drop everything written so far."""
+        if self._fd is not None:
+            await asyncio.to_thread(self._close, False)
+        self.size = 0
+        self.mime_type = None
+
+    async def finish(self) -> None:
+        """Write the WAV header and move the file into place."""
+        self._closed = True
+        await asyncio.to_thread(self._close, True)
+
+    async def discard(self) -> None:
+        """Remove the temporary file."""
+        self._closed = True
+        await asyncio.to_thread(self._close, False)
+
+
+def discard_on_cancel(
+    fn: Callable[..., Awaitable[T]],
+) -> Callable[..., Awaitable[T]]:
+    """Decorator removing the files an async function queued if it's cancelled.
+
+    Writes of a call that completes are handed to the enclosing call's scope,
+    if any, so they're removed if that call is cancelled later on.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs) -> T:
+        parent = _write_scope.get()
+        scope = WriteScope()
+        token = _write_scope.set(scope)
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            if scope.futures:
+                get_writer().discard(scope)
+            raise
+        finally:
+            _write_scope.reset(token)
+        if parent is not None:
+            parent.futures += scope.futures
+            parent.paths += scope.paths
+        return result
+
+    return wrapper
+
+
+_writer: Optional[ArtifactWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> ArtifactWriter:
+    """Return the shared background writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter(
+                max_workers=int(os.environ.get("GEMINI_WRITER_THREADS", "2")),
+                fsync=FsyncPolicy(os.environ.get("GEMINI_FSYNC", FsyncPolicy.NEVER)),
+            )
+        return _writer
+
+
+def flush_writes(timeout: Optional[float] = None) -> None:
+    """Block until all queued writes have completed."""
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+def get_writer_stats() -> dict:
+    """Return queue depth and write latency metrics."""
+    return get_writer().stats()
+
+
+@atexit.register
+def shutdown_writer() -> None:
+    """Flush pending writes and stop the shared writer."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.shutdown()
@@ -0,0 +1,276 @@
+"""Input images for multimodal requests, uploaded once and reused by content hash."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+
+from .catalog import GENERATION_ID, get_catalog
+from .coalesce import SingleFlight
+from .lazy import lazy_import
+from .paths import get_download_root
+from .results import RESOURCE_URI_PREFIX
+
+
+genai = lazy_import("google.genai")
+types = lazy_import("google.genai.types")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_MIN_BYTES = 256 * 1024  # 256 KB
+# Files API uploads are kept for 48 hours, stop reusing them a while before that
+DEFAULT_UPLOAD_TTL = 47 * 3600
+UPLOAD_EXPIRY_MARGIN = 3600
+
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Detect an image's MIME type from its leading bytes."""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return None
+
+
+@dataclass
+class InputImage:
+    """An image given as input to a request, with where it came from."""
+
+    data: bytes
+    mime_type: str
+    source: str  # path, catalog ID or sha256 of inline data
+
+    @cached_property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def get_input_dirs() -> list[str]:
+    """Directories input images may be read from: the download directory and
+    any listed in GEMINI_INPUT_DIRS (separated by os.pathsep)."""
+    extra = os.environ.get("GEMINI_INPUT_DIRS", "").split(os.pathsep)
+    dirs = [get_download_root()] + [d for d in extra if d.strip()]
+    return [os.path.realpath(os.path.expanduser(d.strip())) for d in dirs]
+
+
+def is_input_path(path: str) -> bool:
+    """Whether ``path`` is inside one of the input directories (after symlinks)."""
+    real_path = os.path.realpath(path)
+    return any(
+        os.path.commonpath([root, real_path]) == root for root in get_input_dirs()
+    )
+
+
+def _find_path(value: str) -> Optional[str]:
+    """Resolve a path, gemini-gen://files/ URI or path relative to the download dir.
+
+    Only files inside the input directories are read. An absolute path
+    outside them is rejected, so remote clients can't read arbitrary files.
+    """
+    if value.startswith(RESOURCE_URI_PREFIX):
+        value = value[len(RESOURCE_URI_PREFIX) :]
+    candidates = [os.path.expanduser(value)]
+    if os.path.isabs(candidates[0]):
+        if not is_input_path(candidates[0]):
+            raise ValueError(
+                f"Image {value[:100]} is outside the download directory, "
+                "add its directory to GEMINI_INPUT_DIRS to allow it"
+            )
+    else:
+        candidates.append(os.path.join(get_download_root(), value))
+    return next(
+        (p for p in candidates if is_input_path(p) and os.path.isfile(p)), None
+    )
+
+
+def _decode_inline(value: str) -> Optional[tuple[bytes, Optional[str]]]:
+    """Decode a data: URL or bare base64 string, returning None if it's neither."""
+    mime_type = None
+    if value.startswith("data:"):
+        header, _, value = value.partition(",")
+        mime_type = header[5:].split(";")[0] or None
+    try:
+        return base64.b64decode(value, validate=True), mime_type
+    except (binascii.Error, ValueError):
+        return None
+
+
+async def load_input_image(value: str) -> InputImage:
+    """Load an input image from a path, catalog ID, data: URL or base64 string."""
+    value = value.strip()
+    path = None
+    if GENERATION_ID.match(value):
+        record = await asyncio.to_thread(get_catalog().get, value)
+        if record is None or not record.get("path"):
+            raise ValueError(f"No generation found with ID {value}")
+        path = record["path"]
+        if not await asyncio.to_thread(is_input_path, path):
+            raise ValueError(f"Generation {value} is outside the download directory")
+    elif len(value) < 4096:
+        path = await asyncio.to_thread(_find_path, value)
+
+    if path:
+        data = await asyncio.to_thread(_read, path)
+        mime_type = sniff_mime_type(data) or mimetypes.guess_type(path)[0]
+        source = value
+    else:
+        decoded = None if value.startswith(("/", "~")) else _decode_inline(value)
+        if not decoded or not decoded[0]:
+            raise ValueError(f"Image not found: {value[:100]}")
+        data, mime_type = decoded
+        mime_type = sniff_mime_type(data) or mime_type
+        source = f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+    if not mime_type or not mime_type.startswith("image/"):
+        raise ValueError(f"Unsupported image type: {source[:100]}")
+    return InputImage(data=data, mime_type=mime_type, source=source)
+
+
+@dataclass
+class _Upload:
+    uri: str
+    mime_type: str
+    expires_at: float
+
+
+class UploadCache:
+    """Files API URIs of uploaded images, keyed by API key and content hash.
+
+    Images at least GEMINI_UPLOAD_MIN_BYTES large are uploaded through the
+    Files API once and then referenced by URI, instead of being re-sent
+    inline with every request. Concurrent requests for the same image share
+    one upload.
+    """
+
+    def __init__(self):
+        self._uploads: dict[tuple[str, str], _Upload] = {}
+        # Separate from generation coalescing, so neither skews the other's stats
+        self._flights = SingleFlight()
+        self.uploads = 0
+        self.reused = 0
+        self.inline = 0
+        self.failures = 0
+
+    def _lookup(self, key: tuple[str, str]) -> Optional[_Upload]:
+        upload = self._uploads.get(key)
+        if upload and upload.expires_at - UPLOAD_EXPIRY_MARGIN > time.time():
+            return upload
+        self._uploads.pop(key, None)
+        return None
+
+    async def _upload(self, client: genai.Client, image: InputImage) -> _Upload:
+        file = await client.aio.files.upload(
+            file=io.BytesIO(image.data),
+            config=types.UploadFileConfig(
+                mime_type=image.mime_type, display_name=image.sha256[:16]
+            ),
+        )
+        # Images are usually ACTIVE straight away, wait in case it's still processing
+        deadline = time.monotonic() + 60
+        while file.state == types.FileState.PROCESSING:
+            if time.monotonic() > deadline:
+                raise ValueError(f"Upload of {image.source} is still processing")
+            await asyncio.sleep(0.5)
+            file = await client.aio.files.get(name=file.name)
+        if file.state == types.FileState.FAILED or not file.uri:
+            raise ValueError(f"Upload of {image.source} failed")
+
+        expires_at = (
+            file.expiration_time.timestamp()
+            if file.expiration_time
+            else time.time() + DEFAULT_UPLOAD_TTL
+        )
+        self.uploads += 1
+        return _Upload(file.uri, file.mime_type or image.mime_type, expires_at)
+
+    async def to_part(
+        self, client: genai.Client, api_key: str, image: InputImage
+    ) -> types.Part:
+        """Return a request part referencing the image, uploading it if worthwhile."""
+        min_bytes = int(
+            os.environ.get("GEMINI_UPLOAD_MIN_BYTES", DEFAULT_UPLOAD_MIN_BYTES)
+        )
+        disabled = os.environ.get("GEMINI_FILES_API", "1").lower() in (
+            "0", "false", "no", "off",
+        )  # fmt: skip
+        if disabled or len(image.data) < min_bytes:
+            self.inline += 1
+            return types.Part.from_bytes(data=image.data, mime_type=image.mime_type)
+
+        key = (api_key, image.sha256)
+        upload = self._lookup(key)
+        if upload:
+            self.reused += 1
+        else:
+            try:
+                upload = await self._flights.do(
+                    f"{api_key}:{image.sha256}", lambda: self._upload(client, image)
+                )
+            except Exception as e:
+                # Fall back to sending the image inline
+                self.failures += 1
+                self.inline += 1
+                logger.warning(
+                    "Failed to upload %s, sending it inline: %s", image.source, e
+                )
+                return types.Part.from_bytes(
+                    data=image.data, mime_type=image.mime_type
+                )
+            self._uploads[key] = upload
+        return types.Part.from_uri(file_uri=upload.uri, mime_type=upload.mime_type)
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "reused": self.reused,
+            "inline": self.inline,
+            "failures": self.failures,
+            "coalesced": self._flights.coalesced,
+            "cached": len(self._uploads),
+        }
+
+
+_upload_cache = UploadCache()
+
+
+def get_upload_cache() -> UploadCache:
+    """Return the process-wide upload cache."""
+    return _upload_cache
+
+
+def get_upload_stats() -> dict:
+    """Return how many input images were uploaded, reused or sent inline."""
+    return _upload_cache.stats()
+
+
+def reset_uploads() -> None:
+    """Forget all uploads (used by tests)."""
+    global _upload_cache
+    _upload_cache = UploadCache()
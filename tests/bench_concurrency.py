@@ -0,0 +1,67 @@
+"""Concurrency benchmark for the server tools against an in-process stub.
+
+Runs text_to_image and text_to_speech at increasing concurrency levels with a
+fixed simulated API latency and reports throughput. With non-blocking Gemini
+calls throughput should scale roughly linearly with concurrency.
+
+Usage (from the repository root):
+
+    python -m tests.bench_concurrency [--latency 0.5] [--requests 32]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+from src.gemini_gen_mcp.storage import flush_writes
+from tests.stub_gemini import StubClient
+
+
+async def run_level(tool, arg: str, concurrency: int, total: int) -> float:
+    """Run ``total`` calls with at most ``concurrency`` in flight, return seconds."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            await tool.fn(f"{arg} {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def bench(latency: float, total: int, levels: list[int]):
+    stub = StubClient(latency=latency)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "bench-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env), patch(
+            "src.gemini_gen_mcp.server.genai.Client", stub
+        ):
+            for name, tool, arg in (
+                ("text_to_image", text_to_image, "a red cube"),
+                ("text_to_speech", text_to_speech, "hello world"),
+            ):
+                print(f"\n{name} (latency={latency}s, requests={total})")
+                print(f"{'concurrency':>12} {'seconds':>10} {'req/s':>10}")
+                for level in levels:
+                    elapsed = await run_level(tool, arg, level, total)
+                    flush_writes()
+                    print(f"{level:>12} {elapsed:>10.2f} {total / elapsed:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    args = parser.parse_args()
+    levels = [int(x) for x in args.levels.split(",")]
+    asyncio.run(bench(args.latency, args.requests, levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Offline benchmark of the server tools against a local fake Gemini backend.
+
+Runs text_to_image and text_to_speech sequentially and at increasing
+concurrency against either a fake HTTP server (``--backend http``, the
+default), which exercises the real ``genai.Client`` and its HTTP stack, or
+an in-process stub client (``--backend stub``). Latency, payload sizes and
+error rates are configurable. For each workload it reports throughput,
+latency percentiles, failures, peak RSS and event-loop lag.
+
+The fake HTTP server runs in a separate process so its memory and CPU time
+don't skew the numbers.
+
+Usage (from the repository root):
+
+    python -m tests.bench_server [--latency 0.5] [--image-mb 1-8]
+        [--audio-seconds 60] [--error-rate 0.05] [--levels 1,8] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, Optional
+from unittest.mock import patch
+
+from src.gemini_gen_mcp.clients import close_clients
+from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+from src.gemini_gen_mcp.storage import flush_writes
+from tests.stub_gemini import PCM_BYTES_PER_SECOND, FakeGeminiServer, Size, StubClient
+
+
+TOOLS = {"image": text_to_image, "speech": text_to_speech}
+PROMPTS = {"image": "a red cube", "speech": "Hello world."}
+
+
+@dataclass
+class WorkloadResult:
+    tool: str
+    concurrency: int
+    requests: int
+    failures: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_rss_mb: float
+    loop_lag_p99_ms: float
+    loop_lag_max_ms: float
+    errors: list[str] = field(default_factory=list)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile (0-100) of the samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a periodic timer."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(loop.time() - expected, 0.0) * 1000)
+
+    def __enter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._task.cancel()
+
+
+async def run_workload(
+    tool: str, concurrency: int, total: int, return_mode: Optional[str] = None
+) -> WorkloadResult:
+    """Run ``total`` calls of a tool with at most ``concurrency`` in flight."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: list[str] = []
+    fn = TOOLS[tool].fn
+
+    async def one(i: int) -> None:
+        async with sem:
+            started = time.perf_counter()
+            try:
+                # Unique prompts, so calls are neither cached nor coalesced
+                await fn(f"{PROMPTS[tool]} {i}", return_mode=return_mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                errors.append(str(e))
+
+    with LoopLagMonitor() as monitor:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    await asyncio.to_thread(flush_writes)
+
+    return WorkloadResult(
+        tool=tool,
+        concurrency=concurrency,
+        requests=total,
+        failures=len(errors),
+        seconds=round(elapsed, 3),
+        throughput=round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        p50_ms=round(percentile(latencies, 50), 1),
+        p95_ms=round(percentile(latencies, 95), 1),
+        p99_ms=round(percentile(latencies, 99), 1),
+        max_ms=round(max(latencies, default=0.0), 1),
+        peak_rss_mb=round(peak_rss_mb(), 1),
+        loop_lag_p99_ms=round(percentile(monitor.lags, 99), 1),
+        loop_lag_max_ms=round(max(monitor.lags, default=0.0), 1),
+        errors=sorted(set(errors))[:5],
+    )
+
+
+def _serve(conn, kwargs: dict) -> None:
+    with FakeGeminiServer(**kwargs) as server:
+        conn.send(server.url)
+        conn.recv()  # block until the parent asks us to stop
+
+
+@contextmanager
+def fake_backend(backend: str, **kwargs) -> Iterator[dict]:
+    """Start a backend and yield the patches/env needed to use it."""
+    if backend == "stub":
+        stub = StubClient(**kwargs)
+        with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+            yield {}
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    process = ctx.Process(target=_serve, args=(child, kwargs), daemon=True)
+    process.start()
+    try:
+        yield {"GEMINI_BASE_URL": parent.recv()}
+    finally:
+        parent.send("stop")
+        process.join(5)
+
+
+def parse_size(value: str, scale: float) -> Size:
+    """Parse "N" or "MIN-MAX" (in units of ``scale`` bytes)."""
+    if "-" in value:
+        low, high = value.split("-", 1)
+        return int(float(low) * scale), int(float(high) * scale)
+    return int(float(value) * scale)
+
+
+async def bench(args) -> list[WorkloadResult]:
+    backend_args = {
+        "latency": args.latency,
+        "image_bytes": parse_size(args.image_mb, 1024 * 1024),
+        "audio_bytes": parse_size(args.audio_seconds, PCM_BYTES_PER_SECOND),
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+    }
+    levels = [int(x) for x in args.levels.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "bench-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_BACKOFF_BASE": str(args.backoff_base),
+            "GEMINI_MAX_RETRIES": str(args.max_retries),
+        }
+        with fake_backend(args.backend, **backend_args) as backend_env:
+            with patch.dict(os.environ, {**env, **backend_env}):
+                for tool in args.tools.split(","):
+                    for level in levels:
+                        result = await run_workload(
+                            tool, level, args.requests, args.return_mode
+                        )
+                        results.append(result)
+                        if not args.json:
+                            print_result(result)
+                await close_clients()
+    return results
+
+
+def print_result(r: WorkloadResult) -> None:
+    mode = "sequential" if r.concurrency == 1 else f"concurrency={r.concurrency}"
+    print(
+        f"{r.tool:>6} {mode:>16}  {r.throughput:>7.2f} req/s  "
+        f"p50 {r.p50_ms:>8.1f}  p95 {r.p95_ms:>8.1f}  p99 {r.p99_ms:>8.1f} ms  "
+        f"failed {r.failures:>3}/{r.requests}  rss {r.peak_rss_mb:>7.1f} MB  "
+        f"loop lag p99 {r.loop_lag_p99_ms:>6.1f} max {r.loop_lag_max_ms:>6.1f} ms"
+    )
+    for error in r.errors:
+        print(f"{'':>24}{error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["http", "stub"], default="http")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--image-mb", default="1-8", help='e.g. "2" or "1-8"')
+    parser.add_argument("--audio-seconds", default="60", help='e.g. "60" or "30-300"')
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--levels", default="1,8", help="1 runs sequentially")
+    parser.add_argument("--tools", default="image,speech")
+    parser.add_argument("--return-mode", default=None)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Startup benchmark: import time and time to the first MCP tool listing.
+
+Imports the server in fresh interpreters with ``python -X importtime`` and
+reports the total import time, the slowest top-level imports and any
+modules that should only be imported on first use (the Gemini SDK, Pillow).
+It then starts the server over stdio and times the MCP handshake plus
+``tools/list``, which is what delays an agent's first tool call.
+
+Exits with status 1 if a deferred module is imported at startup or the
+median import time exceeds ``--max-import-ms``, so it can guard against
+import-time regressions in CI.
+
+Usage (from the repository root):
+
+    python -m tests.bench_startup [--runs 5] [--max-import-ms 3000] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+SERVER_MODULE = "src.gemini_gen_mcp.server"
+# Only needed to generate, not to answer the handshake or list tools
+DEFERRED_MODULES = ["google.genai", "google.genai.types", "PIL"]
+
+
+@dataclass
+class ImportTiming:
+    """One ``-X importtime`` run of a module."""
+
+    total_us: int
+    # (module, cumulative microseconds) of the module's direct imports
+    children: list[tuple[str, int]]
+    imported: set[str]
+
+
+@dataclass
+class StartupResult:
+    runs: int
+    import_ms_median: float
+    import_ms_min: float
+    handshake_ms_median: float
+    handshake_ms_min: float
+    slowest_imports: list[tuple[str, float]] = field(default_factory=list)
+    deferred_imported: list[str] = field(default_factory=list)
+
+
+def parse_importtime(output: str, module: str) -> ImportTiming:
+    """Parse ``-X importtime`` output for the import of ``module``.
+
+    Lines look like ``import time: self [us] | cumulative | <indent>name``,
+    with nested imports indented by two spaces per level and listed before
+    the module that imported them.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(cumulative)))
+
+    total = 0
+    children: list[tuple[str, int]] = []
+    pending: list[tuple[str, int]] = []
+    for depth, name, cumulative in rows:
+        if depth == 1:
+            pending.append((name, cumulative))
+        elif depth == 0:
+            if name == module:
+                total = cumulative
+                children = pending
+            pending = []
+    return ImportTiming(
+        total_us=total, children=children, imported={name for _, name, _ in rows}
+    )
+
+
+def time_import(module: str = SERVER_MODULE) -> ImportTiming:
+    """Import a module in a fresh interpreter and time it."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr, module)
+
+
+async def time_handshake(module: str = SERVER_MODULE) -> float:
+    """Seconds from spawning the stdio server to receiving its tool list."""
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
+    transport = StdioTransport(
+        command=sys.executable,
+        args=["-m", module],
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+        keep_alive=False,
+        log_file=Path(os.devnull),  # the server's banner and logs
+    )
+    started = time.perf_counter()
+    async with Client(transport) as client:
+        await client.list_tools()
+        elapsed = time.perf_counter() - started
+    return elapsed
+
+
+async def bench(runs: int) -> StartupResult:
+    timings = [time_import() for _ in range(runs)]
+    handshakes = [await time_handshake() for _ in range(runs)]
+
+    import_ms = [t.total_us / 1000 for t in timings]
+    slowest: dict[str, list[int]] = {}
+    for timing in timings:
+        for name, cumulative in timing.children:
+            slowest.setdefault(name, []).append(cumulative)
+    top = sorted(
+        ((name, round(statistics.median(us) / 1000, 1)) for name, us in slowest.items()),
+        key=lambda item: -item[1],
+    )[:10]
+    deferred = sorted({m for t in timings for m in DEFERRED_MODULES if m in t.imported})
+    return StartupResult(
+        runs=runs,
+        import_ms_median=round(statistics.median(import_ms), 1),
+        import_ms_min=round(min(import_ms), 1),
+        handshake_ms_median=round(statistics.median(handshakes) * 1000, 1),
+        handshake_ms_min=round(min(handshakes) * 1000, 1),
+        slowest_imports=top,
+        deferred_imported=deferred,
+    )
+
+
+def print_result(r: StartupResult) -> None:
+    print(
+        f"import {SERVER_MODULE}: median {r.import_ms_median:.1f} ms, "
+        f"min {r.import_ms_min:.1f} ms ({r.runs} runs)"
+    )
+    print(
+        f"handshake + tools/list: median {r.handshake_ms_median:.1f} ms, "
+        f"min {r.handshake_ms_min:.1f} ms"
+    )
+    print("slowest imports:")
+    for name, ms in r.slowest_imports:
+        print(f"  {ms:>8.1f} ms  {name}")
+    for name in r.deferred_imported:
+        print(f"deferred module imported at startup: {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-import-ms", type=float, default=None, help="Fail above this median"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(bench(args.runs))
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+    else:
+        print_result(result)
+
+    too_slow = args.max_import_ms and result.import_ms_median > args.max_import_ms
+    sys.exit(1 if result.deferred_imported or too_slow else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Shared pytest fixtures."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+    """Reset process-wide server state so tests don't leak into each other."""
+    from src.gemini_gen_mcp.cache import reset_cache
+    from src.gemini_gen_mcp.catalog import reset_catalog
+    from src.gemini_gen_mcp.clients import reset_clients
+    from src.gemini_gen_mcp.coalesce import reset_coalescing
+    from src.gemini_gen_mcp.hedging import reset_hedging
+    from src.gemini_gen_mcp.janitor import reset_janitor
+    from src.gemini_gen_mcp.keys import reset_keys
+    from src.gemini_gen_mcp.metrics import reset_metrics
+    from src.gemini_gen_mcp.ratelimit import reset_schedulers
+    from src.gemini_gen_mcp.storage import flush_writes
+    from src.gemini_gen_mcp.uploads import reset_uploads
+
+    reset_clients()
+    reset_cache()
+    reset_schedulers()
+    reset_coalescing()
+    reset_metrics()
+    reset_uploads()
+    reset_keys()
+    reset_hedging()
+    reset_janitor()
+    yield
+    flush_writes()
+    reset_clients()
+    reset_cache()
+    reset_catalog()
+    reset_schedulers()
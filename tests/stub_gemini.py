@@ -0,0 +1,519 @@
+"""Local stand-ins for the Gemini API used by tests and benchmarks.
+
+``StubClient`` replaces ``genai.Client`` in-process. Only the async
+``client.aio.models.generate_content`` path used by the server tools is
+implemented. Each call sleeps for ``latency`` seconds without blocking the
+event loop, so overlapping calls finish together when awaited concurrently.
+``client.aio.batches`` simulates batch jobs moving from pending to running
+to succeeded as they're polled, and ``client.aio.files`` keeps uploaded and
+result files in memory.
+
+``FakeGeminiServer`` is a local HTTP server speaking the REST
+``models/{model}:generateContent`` protocol, for exercising the real
+``genai.Client`` and its HTTP stack via ``GEMINI_BASE_URL``.
+
+Both also answer streaming requests (``generate_content_stream`` and
+``:streamGenerateContent``), splitting each payload into ``STREAM_CHUNKS``
+responses.
+
+Payload sizes can be fixed byte counts or ``(min, max)`` ranges, from which
+each response draws a size (rounded to 64 KiB so payloads can be reused).
+"""
+
+import asyncio
+import base64
+import functools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.genai import errors, types
+
+
+Size = int | tuple[int, int]
+
+PCM_MIME_TYPE = "audio/L16;codec=pcm;rate=24000"
+PCM_BYTES_PER_SECOND = 24000 * 2  # 24 kHz, 16-bit mono
+STREAM_CHUNKS = 4
+
+
+def pick_size(size: Size, rng: random.Random) -> int:
+    """Return a fixed size, or a random size within a (min, max) range."""
+    if isinstance(size, int):
+        return size
+    low, high = size
+    step = 64 * 1024
+    return max(low, min(high, round(rng.randint(low, high) / step) * step))
+
+
+def _error_body(status: int, retry_delay: str | None = None) -> dict:
+    details = []
+    if retry_delay:
+        details.append(
+            {
+                "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                "retryDelay": retry_delay,
+            }
+        )
+    return {
+        "error": {
+            "code": status,
+            "message": "Simulated error",
+            "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE",
+            "details": details,
+        }
+    }
+
+
+def _api_error(status: int) -> errors.APIError:
+    body = _error_body(status)
+    if status >= 500:
+        return errors.ServerError(status, body)
+    return errors.ClientError(status, body)
+
+
+@functools.lru_cache(maxsize=32)
+def _image_data(size: int) -> bytes:
+    return b"\x89PNG" + b"\x00" * size
+
+
+@functools.lru_cache(maxsize=32)
+def _audio_data(size: int) -> bytes:
+    return b"\x00\x00" * (size // 2)
+
+
+def split_chunks(data: bytes, count: int = STREAM_CHUNKS) -> list[bytes]:
+    """Split data into ``count`` chunks of whole 16-bit samples."""
+    step = max(len(data) // count // 2 * 2, 2)
+    chunks = [data[i : i + step] for i in range(0, len(data), step)]
+    return chunks[: count - 1] + [b"".join(chunks[count - 1 :])]
+
+
+def _payload(kind: str, size: int) -> tuple[bytes, str]:
+    if kind == "audio":
+        return _audio_data(size), PCM_MIME_TYPE
+    return _image_data(size), "image/png"
+
+
+def _response_json(data: bytes, mime_type: str) -> bytes:
+    payload = {
+        "candidates": [
+            {
+                "content": {
+                    "role": "model",
+                    "parts": [
+                        {
+                            "inlineData": {
+                                "mimeType": mime_type,
+                                "data": base64.b64encode(data).decode(),
+                            }
+                        }
+                    ],
+                }
+            }
+        ]
+    }
+    return json.dumps(payload).encode()
+
+
+@functools.lru_cache(maxsize=32)
+def _response_body(kind: str, size: int) -> bytes:
+    return _response_json(*_payload(kind, size))
+
+
+@functools.lru_cache(maxsize=32)
+def _stream_body(kind: str, size: int) -> bytes:
+    """Server-sent events, one per chunk of audio (images are sent whole)."""
+    data, mime_type = _payload(kind, size)
+    chunks = split_chunks(data) if kind == "audio" else [data]
+    return b"".join(
+        b"data: " + _response_json(chunk, mime_type) + b"\r\n\r\n" for chunk in chunks
+    )
+
+
+def make_response(data: bytes, mime_type: str) -> types.GenerateContentResponse:
+    """Build a single-part inline_data response like the Gemini API returns."""
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(
+                    role="model",
+                    parts=[
+                        types.Part(
+                            inline_data=types.Blob(data=data, mime_type=mime_type)
+                        )
+                    ],
+                )
+            )
+        ]
+    )
+
+
+class StubModels:
+    def __init__(
+        self,
+        latency: float,
+        image_bytes: Size,
+        audio_bytes: Size,
+        fail_if_contains: str | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ):
+        self.latency = latency
+        self.image_bytes = image_bytes
+        self.audio_bytes = audio_bytes
+        self.fail_if_contains = fail_if_contains
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(0)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return self.respond(contents, config)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        response = await self.generate_content(model, contents, config)
+        inline_data = response.candidates[0].content.parts[0].inline_data
+        if inline_data.mime_type == PCM_MIME_TYPE:
+            chunks = split_chunks(inline_data.data)
+        else:
+            chunks = [inline_data.data]
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(0)
+                yield make_response(chunk, inline_data.mime_type)
+
+        return stream()
+
+    def respond(self, contents, config=None) -> types.GenerateContentResponse:
+        """Return a canned response for a request, or raise its simulated error."""
+        if self.fail_if_contains and self.fail_if_contains in str(contents):
+            raise RuntimeError("Simulated generation failure")
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise _api_error(self.error_status)
+
+        modalities = [m.lower() for m in (config.response_modalities or [])]
+        if "audio" in modalities:
+            size = pick_size(self.audio_bytes, self._random)
+            return make_response(_audio_data(size), PCM_MIME_TYPE)
+        size = pick_size(self.image_bytes, self._random)
+        return make_response(_image_data(size), "image/png")
+
+
+class StubFiles:
+    """In-memory Files API."""
+
+    def __init__(self):
+        self.files: dict[str, tuple[types.File, bytes]] = {}
+
+    def add(self, data: bytes, mime_type: str) -> types.File:
+        name = f"files/stub-{len(self.files) + 1}"
+        file = types.File(
+            name=name,
+            uri=f"https://stub.invalid/{name}",
+            mime_type=mime_type,
+            state=types.FileState.ACTIVE,
+        )
+        self.files[name] = (file, data)
+        return file
+
+    async def upload(self, file, config=None) -> types.File:
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        return self.add(data, getattr(config, "mime_type", None) or "text/plain")
+
+    async def get(self, name: str) -> types.File:
+        return self.files[name][0]
+
+    async def download(self, file, config=None) -> bytes:
+        return self.files[getattr(file, "name", file)][1]
+
+
+class StubBatches:
+    """Simulated Batch API jobs.
+
+    A job moves one state forward (pending, running, then succeeded) every
+    ``polls_per_state`` calls to ``get``. Requests containing the models'
+    ``fail_if_contains`` text get a per-request error. Inline requests get
+    inline responses; requests from a JSONL file get a JSONL results file.
+    """
+
+    STATES = [
+        types.JobState.JOB_STATE_PENDING,
+        types.JobState.JOB_STATE_RUNNING,
+        types.JobState.JOB_STATE_SUCCEEDED,
+    ]
+
+    def __init__(self, models: StubModels, files: StubFiles, polls_per_state: int = 1):
+        self.models = models
+        self.files = files
+        self.polls_per_state = polls_per_state
+        self.jobs: dict[str, dict] = {}
+
+    async def create(self, model, src, config=None) -> types.BatchJob:
+        name = f"batches/stub-{len(self.jobs) + 1}"
+        job = types.BatchJob(
+            name=name,
+            display_name=getattr(config, "display_name", None),
+            model=model,
+            state=self.STATES[0],
+        )
+        self.jobs[name] = {"job": job, "src": src, "polls": 0}
+        return job.model_copy()
+
+    def _get_entry(self, name: str) -> dict:
+        if name not in self.jobs:
+            raise errors.ClientError(404, {"error": {"code": 404, "message": name}})
+        return self.jobs[name]
+
+    async def get(self, name: str, config=None) -> types.BatchJob:
+        entry = self._get_entry(name)
+        job: types.BatchJob = entry["job"]
+        if job.state in self.STATES[:-1]:
+            entry["polls"] += 1
+            step = min(entry["polls"] // self.polls_per_state, len(self.STATES) - 1)
+            job.state = self.STATES[step]
+            if job.state == types.JobState.JOB_STATE_SUCCEEDED:
+                self._complete(job, entry["src"])
+        return job.model_copy()
+
+    async def cancel(self, name: str, config=None) -> None:
+        job = self._get_entry(name)["job"]
+        if job.state in self.STATES[:-1]:
+            job.state = types.JobState.JOB_STATE_CANCELLED
+
+    def _run(self, contents, config) -> tuple[types.GenerateContentResponse | None, str | None]:
+        try:
+            return self.models.respond(contents, config), None
+        except Exception as e:
+            return None, str(e)
+
+    def _complete(self, job: types.BatchJob, src) -> None:
+        if isinstance(src, str):
+            lines = self.files.files[src][1].decode().splitlines()
+            out = []
+            for line in filter(None, lines):
+                entry = json.loads(line)
+                request = entry["request"]
+                contents = request["contents"][0]["parts"][0]["text"]
+                config = types.GenerateContentConfig.model_validate(
+                    request.get("generationConfig", {})
+                )
+                response, error = self._run(contents, config)
+                result = {"key": entry["key"]}
+                if error:
+                    result["error"] = {"code": 500, "message": error}
+                else:
+                    result["response"] = response.model_dump(
+                        mode="json", by_alias=True, exclude_none=True
+                    )
+                out.append(json.dumps(result))
+            file = self.files.add("\n".join(out).encode(), "jsonl")
+            job.dest = types.BatchJobDestination(file_name=file.name)
+            count = len(out)
+        else:
+            responses = []
+            for request in src:
+                response, error = self._run(request.contents, request.config)
+                responses.append(
+                    types.InlinedResponse(
+                        response=response,
+                        error=types.JobError(code=500, message=error) if error else None,
+                    )
+                )
+            job.dest = types.BatchJobDestination(inlined_responses=responses)
+            count = len(responses)
+        job.completion_stats = types.CompletionStats(successful_count=count)
+
+
+class StubAio:
+    def __init__(self, models: StubModels):
+        self.models = models
+        self.files = StubFiles()
+        self.batches = StubBatches(models, self.files)
+
+
+class StubClient:
+    """Drop-in replacement for ``genai.Client`` returning canned payloads."""
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        image_bytes: Size = 1024,
+        audio_bytes: Size = 48000,
+        fail_if_contains: str | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ):
+        self.aio = StubAio(
+            StubModels(
+                latency,
+                image_bytes,
+                audio_bytes,
+                fail_if_contains,
+                error_rate,
+                error_status,
+            )
+        )
+
+    @property
+    def models(self) -> StubModels:
+        return self.aio.models
+
+    def __call__(self, *args, **kwargs) -> "StubClient":
+        # Allows patching genai.Client with an instance: genai.Client(...) -> self
+        return self
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server: "FakeGeminiServer" = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        api_key = self.headers.get("x-goog-api-key")
+        server.record(self.path, body, api_key)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        error = server.next_error(api_key, self.path)
+        if error:
+            status, retry_delay = error
+            self._send_json(status, _error_body(status, retry_delay))
+            return
+
+        config = body.get("generationConfig", {})
+        modalities = [m.lower() for m in config.get("responseModalities", [])]
+        if "audio" in modalities:
+            kind, size = "audio", server.pick_size(server.audio_bytes)
+        else:
+            kind, size = "image", server.pick_size(server.image_bytes)
+        if ":streamGenerateContent" in self.path:
+            self._send_body(
+                200, _stream_body(kind, size), content_type="text/event-stream"
+            )
+        else:
+            self._send_body(200, _response_body(kind, size))
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        self._send_body(status, json.dumps(payload).encode(), headers)
+
+    def _send_body(
+        self,
+        status: int,
+        data: bytes,
+        headers: dict | None = None,
+        content_type: str = "application/json",
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeGeminiServer:
+    """Threaded local HTTP server answering (stream)generateContent requests.
+
+    Usage::
+
+        with FakeGeminiServer(latency=0.1) as server:
+            os.environ["GEMINI_BASE_URL"] = server.url
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        image_bytes: Size = 1024,
+        audio_bytes: Size = 48000,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        rejected_keys: dict[str, int] | None = None,
+        failing_models: dict[str, int] | None = None,
+    ):
+        self.latency = latency
+        self.image_bytes = image_bytes
+        self.audio_bytes = audio_bytes
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # API keys answered with an error status, e.g. {"revoked": 403}
+        self.rejected_keys = rejected_keys or {}
+        # Models always answered with an error status, e.g. {"gemini-3-pro-image-preview": 503}
+        self.failing_models = failing_models or {}
+        self.requests: list[tuple[str, dict]] = []
+        self.api_keys: list[str | None] = []
+        self._errors: list[tuple[int, str | None]] = []
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGeminiHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path: str, body: dict, api_key: str | None = None) -> None:
+        with self._lock:
+            self.requests.append((path, body))
+            self.api_keys.append(api_key)
+
+    def fail_next(
+        self, status: int = 429, times: int = 1, retry_delay: str | None = None
+    ) -> None:
+        """Answer the next ``times`` requests with an error, e.g. 429 with "1s"."""
+        with self._lock:
+            self._errors.extend([(status, retry_delay)] * times)
+
+    def pick_size(self, size: Size) -> int:
+        with self._lock:
+            return pick_size(size, self._random)
+
+    def next_error(
+        self, api_key: str | None = None, path: str = ""
+    ) -> tuple[int, str | None] | None:
+        with self._lock:
+            if api_key in self.rejected_keys:
+                return self.rejected_keys[api_key], None
+            for model, status in self.failing_models.items():
+                if f"/models/{model}:" in path:
+                    return status, None
+            if self._errors:
+                return self._errors.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, None
+        return None
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
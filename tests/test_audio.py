@@ -0,0 +1,168 @@
+"""Tests for audio helpers."""
+
+import pytest
+
+
+def test_split_text_packs_whole_sentences():
+    """Test split_text groups sentences into chunks without breaking them."""
+    from src.gemini_gen_mcp.audio import split_text
+
+    text = "One two. Three four! Five six? Seven eight."
+    assert split_text(text, max_chars=20) == [
+        "One two. Three four!",
+        "Five six?",
+        "Seven eight.",
+    ]
+    assert split_text(text, max_chars=1000) == [text]
+    assert split_text("  \n\n ") == []
+
+
+def test_split_text_splits_overlong_sentences_at_whitespace():
+    """Test a sentence longer than max_chars is split at word boundaries."""
+    from src.gemini_gen_mcp.audio import split_text
+
+    chunks = split_text("alpha beta gamma delta epsilon", max_chars=12)
+    assert chunks == ["alpha beta", "gamma delta", "epsilon"]
+    assert all(len(chunk) <= 12 for chunk in chunks)
+    assert split_text("x" * 25, max_chars=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_wav_header_matches_wave_module():
+    """Test the hand-built WAV header matches what the wave module writes."""
+    import io
+    import wave
+
+    from src.gemini_gen_mcp.audio import WAV_HEADER_SIZE, wav_header
+
+    pcm = bytes(range(256)) * 10
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(24000)
+        wf.writeframes(pcm)
+
+    header = wav_header(len(pcm))
+    assert len(header) == WAV_HEADER_SIZE
+    assert header + pcm == buf.getvalue()
+
+
+def test_parse_pcm_mime_type():
+    """Test the sample rate, channels and width are read from the mime type."""
+    from src.gemini_gen_mcp.audio import PcmFormat, parse_pcm_mime_type
+
+    assert parse_pcm_mime_type("audio/L16;codec=pcm;rate=24000") == PcmFormat()
+    assert parse_pcm_mime_type("audio/L16; rate=16000; channels=2") == PcmFormat(
+        sample_rate=16000, channels=2, sample_width=2
+    )
+    assert parse_pcm_mime_type("audio/L24;rate=48000") == PcmFormat(48000, 1, 3)
+    assert parse_pcm_mime_type(None) == PcmFormat()
+
+
+def _mock_tts_client(pcm: bytes, mime_type: str):
+    from unittest.mock import AsyncMock, MagicMock
+
+    part = MagicMock()
+    part.inline_data.data = pcm
+    part.inline_data.mime_type = mime_type
+    response = MagicMock()
+    response.candidates = [MagicMock()]
+    response.candidates[0].content.parts = [part]
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    return MagicMock(return_value=client)
+
+
+FAKE_FFMPEG = """#!{python}
+import sys
+args = sys.argv[1:]
+tag = ("ENC:" + args[args.index("-c:a") + 1] + ":").encode()
+if args[-1] == "pipe:1":
+    sys.stdout.buffer.write(tag + sys.stdin.buffer.read())
+else:
+    with open(args[args.index("-i") + 1], "rb") as f, open(args[-1], "wb") as out:
+        out.write(tag + f.read())
+"""
+
+
+@pytest.mark.asyncio
+async def test_text_to_speech_honours_rate_and_output_format():
+    """Test WAVs use the response's sample rate and other formats are encoded."""
+    import io
+    import os
+    import sys
+    import tempfile
+    import wave
+    from unittest.mock import patch
+
+    from src.gemini_gen_mcp.server import text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+
+    pcm = b"\x01\x00" * 16000
+    client = _mock_tts_client(pcm, "audio/L16;codec=pcm;rate=16000")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ffmpeg = os.path.join(tmpdir, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg, 0o755)
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_FFMPEG": ffmpeg,
+        }
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", client):
+                wav = await text_to_speech.fn("Hello")
+                mp3 = await text_to_speech.fn("Hello", output_format="mp3")
+                saved = await text_to_speech.fn(
+                    "Hello there. Goodbye.",
+                    long_form=True,
+                    output_format="flac",
+                    return_mode="path",
+                )
+            flush_writes()
+
+            with wave.open(io.BytesIO(wav.data)) as wf:
+                assert wf.getframerate() == 16000
+                assert wf.readframes(wf.getnframes()) == pcm
+
+            assert mp3._mime_type == "audio/mpeg"
+            assert mp3.data == b"ENC:libmp3lame:" + pcm
+
+            path = saved.split(" to ")[-1]
+            assert path.endswith(".flac")
+            with open(path, "rb") as f:
+                assert f.read(13) == b"ENC:flac:RIFF"
+            assert not os.path.exists(path[: -len("flac")] + "wav")
+
+            # Compressed formats fail fast without an encoder
+            with patch.dict(os.environ, {"GEMINI_FFMPEG": "/nonexistent/ffmpeg"}):
+                with pytest.raises(ValueError, match="requires ffmpeg"):
+                    await text_to_speech.fn("Bye", output_format="ogg")
+            assert client.return_value.aio.models.generate_content.await_count == 3
+
+
+def test_parse_script_and_dialogue_segments():
+    from src.gemini_gen_mcp.audio import Segment, dialogue_segments, parse_script
+
+    script = "Joe: Hi there.\nJane: Hello!\nHow are you?\nJoe: Fine.\n\nJoe: Thanks."
+    lines = parse_script(script, {"Joe": "Kore", "Jane": "Puck"})
+    assert lines == [
+        ("Joe", "Hi there."),
+        ("Jane", "Hello! How are you?"),
+        ("Joe", "Fine."),
+        ("Joe", "Thanks."),
+    ]
+    with pytest.raises(ValueError):
+        parse_script("no speaker here")
+
+    voices = {"Joe": "Kore", "Jane": "Puck"}
+    segments = dialogue_segments(lines, voices, False, 1000)
+    assert [s.voice for s in segments] == ["Kore", "Puck", "Kore"]
+    assert segments[2].text == "Fine. Thanks."
+
+    [multi] = dialogue_segments(lines, voices, True, 1000)
+    assert multi == Segment(
+        "Joe: Hi there.\nJane: Hello! How are you?\nJoe: Fine.\nJoe: Thanks.",
+        speakers=(("Jane", "Puck"), ("Joe", "Kore")),
+    )
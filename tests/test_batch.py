@@ -0,0 +1,77 @@
+"""Tests for Batch API jobs against the local stand-in."""
+
+import json
+import os
+import tempfile
+import wave
+from unittest.mock import patch
+
+import pytest
+
+from src.gemini_gen_mcp.server import batch_status, fetch_batch_results, submit_batch
+from src.gemini_gen_mcp.storage import flush_writes
+from tests.stub_gemini import StubClient
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("inline_bytes", [None, "1"])
+async def test_batch_job_lifecycle(inline_bytes):
+    stub = StubClient(latency=0, fail_if_contains="broken")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        if inline_bytes:
+            # Forces the requests to be uploaded as a JSONL file
+            env["GEMINI_BATCH_INLINE_BYTES"] = inline_bytes
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                job = await submit_batch.fn(
+                    "image", ["a red cube", "broken prompt", "a blue ball"]
+                )
+                assert job["state"] == "pending" and job["requests"] == 3
+                source = stub.aio.batches.jobs[job["name"]]["src"]
+                assert isinstance(source, str) == bool(inline_bytes)
+
+                # Each poll moves the job on: pending -> running -> succeeded
+                with pytest.raises(ValueError, match="is running"):
+                    await fetch_batch_results.fn(job["name"])
+                status = await batch_status.fn(job["name"])
+                assert status["state"] == "succeeded" and status["done"]
+
+                result = await fetch_batch_results.fn(job["name"])
+                assert (result["saved"], result["failed"]) == (2, 1)
+                assert "Simulated generation failure" in result["results"][1]["error"]
+                # Fetching again returns the saved files without downloading them again
+                assert await fetch_batch_results.fn(job["name"]) == result
+        flush_writes()
+
+        path = result["results"][2]["paths"][0]
+        assert path.startswith(os.path.join(tmpdir, "images"))
+        with open(path, "rb") as f:
+            assert f.read(4) == b"\x89PNG"
+        with open(path.rsplit(".", 1)[0] + ".info.json") as f:
+            info = json.load(f)
+        assert info["prompt"] == "a blue ball"
+        assert (info["batch"], info["batch_index"]) == (job["name"], 2)
+
+
+@pytest.mark.asyncio
+async def test_batch_speech_writes_audio():
+    stub = StubClient(latency=0, audio_bytes=4800)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                job = await submit_batch.fn("speech", ["Hello.", "Goodbye."])
+                for _ in range(2):
+                    await batch_status.fn(job["name"])
+                result = await fetch_batch_results.fn(job["name"])
+
+                with pytest.raises(ValueError, match="Unknown batch job"):
+                    await fetch_batch_results.fn("batches/unknown")
+        flush_writes()
+
+        paths = [r["paths"][0] for r in result["results"]]
+        assert all(p.startswith(os.path.join(tmpdir, "audios")) for p in paths)
+        with wave.open(paths[0], "rb") as wf:
+            assert wf.getframerate() == 24000
+            assert wf.getnframes() == 2400
@@ -0,0 +1,60 @@
+"""Smoke test for the offline benchmark harness."""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_run_workload_reports_latency_and_failures():
+    """Test a small concurrent workload against the stub backend."""
+    from tests.bench_server import fake_backend, run_workload
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "bench-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_MAX_RETRIES": "0",
+        }
+        with fake_backend(
+            "stub", latency=0.02, image_bytes=(1024, 256 * 1024), error_rate=0.3
+        ):
+            with patch.dict(os.environ, env):
+                result = await run_workload("image", concurrency=4, total=10)
+
+    assert result.requests == 10
+    assert 0 < result.failures < 10
+    assert result.throughput > 0
+    assert 20 <= result.p50_ms <= result.p99_ms <= result.max_ms
+    assert result.peak_rss_mb > 0
+    assert result.errors
+
+
+def test_parse_importtime_totals_the_module_and_its_imports():
+    """Test -X importtime output is attributed to the imported module."""
+    from tests.bench_startup import parse_importtime
+
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     json.decoder",
+            "import time:       200 |        300 |   json",
+            "import time:        50 |        50 |   fastmcp",
+            "import time:       400 |        750 | src.gemini_gen_mcp.server",
+        ]
+    )
+    timing = parse_importtime(output, "src.gemini_gen_mcp.server")
+    assert timing.total_us == 750
+    assert timing.children == [("json", 300), ("fastmcp", 50)]
+    assert "json.decoder" in timing.imported
+
+
+def test_server_import_defers_the_gemini_sdk():
+    """Test importing the server doesn't import google.genai or Pillow."""
+    from tests.bench_startup import DEFERRED_MODULES, time_import
+
+    timing = time_import()
+    assert timing.total_us > 0
+    assert not [m for m in DEFERRED_MODULES if m in timing.imported]
@@ -0,0 +1,152 @@
+"""Tests for the content-addressed result cache."""
+
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import pytest
+
+
+def test_cache_key_is_stable_and_param_sensitive():
+    """Test cache_key ignores argument order but not argument values."""
+    from src.gemini_gen_mcp.cache import cache_key
+
+    a = cache_key("text_to_speech", text="hi", model="m", voice="Kore")
+    b = cache_key("text_to_speech", voice="Kore", model="m", text="hi")
+    c = cache_key("text_to_speech", text="hi", model="m", voice="Puck")
+    assert a == b
+    assert a != c
+    assert a != cache_key("text_to_image", text="hi", model="m", voice="Kore")
+
+
+def test_result_cache_evicts_least_recently_used():
+    """Test the cache stays under max_bytes by evicting LRU entries."""
+    from src.gemini_gen_mcp.cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResultCache(tmpdir, max_bytes=25)
+        cache.put("aa1", b"x" * 10, "png")
+        cache.put("bb2", b"y" * 10, "png")
+        assert cache.get("aa1") [:2] == (b"x" * 10, "png")  # aa1 is now most recent
+        cache.put("cc3", b"z" * 10, "wav")
+
+        assert cache.get("bb2") is None
+        assert cache.get("aa1") is not None
+        assert cache.get("cc3")[:2] == (b"z" * 10, "wav")
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["bytes"] == 20
+
+        # Index is rebuilt from disk
+        reloaded = ResultCache(tmpdir, max_bytes=25)
+        assert reloaded.stats()["entries"] == 2
+
+
+def test_result_cache_sees_entries_from_other_processes():
+    """Test a cache finds entries another worker stored in the shared directory."""
+    from src.gemini_gen_mcp.cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        first = ResultCache(tmpdir)
+        second = ResultCache(tmpdir)
+        first.put("aa1", b"x" * 10, "png")
+
+        assert second.get("aa1")[:2] == (b"x" * 10, "png")
+        assert second.stats()["bytes"] == 10
+        assert second.get("bb2") is None
+
+
+def test_result_cache_limit_covers_every_worker():
+    """Test workers sharing a directory keep it under one max_bytes between them."""
+    from src.gemini_gen_mcp.cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        first = ResultCache(tmpdir, max_bytes=25)
+        second = ResultCache(tmpdir, max_bytes=25)
+        first.put("aa1", b"x" * 10, "png")
+        second.put("bb2", b"y" * 10, "png")
+        first.put("cc3", b"z" * 10, "png")
+
+        sizes = [
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(tmpdir)
+            for name in names
+        ]
+        assert sum(sizes) == 20
+        assert first.get("aa1") is None and second.get("aa1") is None
+        assert first.stats()["bytes"] == 20
+
+
+def test_result_cache_expires_entries_by_age():
+    """Test entries unused for longer than max_age are misses."""
+    from src.gemini_gen_mcp.cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResultCache(tmpdir, max_age=60)
+        cache.put("aa1", b"x", "png")
+        with patch("src.gemini_gen_mcp.cache.time.time", return_value=time.time() + 120):
+            assert cache.get("aa1") is None
+        assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_tools_return_cached_results_without_api_calls():
+    """Test repeated identical calls are served from the cache."""
+    from src.gemini_gen_mcp.cache import get_cache_stats
+    from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_CACHE": "1",
+        }
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                first = await text_to_speech.fn("hello")
+                flush_writes()  # results are cached in the background
+                second = await text_to_speech.fn("hello")
+                await text_to_speech.fn("hello", voice="Puck")
+                image = await text_to_image.fn("a red cube")
+                flush_writes()
+                cached_image = await text_to_image.fn("a red cube")
+            flush_writes()
+
+            stats = get_cache_stats()
+
+    assert stub.models.calls == 3
+    assert second.data == first.data
+    assert cached_image.data == image.data
+    assert cached_image._format == "png"
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+
+
+@pytest.mark.asyncio
+async def test_lookup_reads_the_cache_off_the_event_loop():
+    """Test opening the cache and reading a hit don't run on the event loop thread."""
+    import threading
+
+    from src.gemini_gen_mcp.cache import ResultCache, get_cache, lookup
+
+    threads = []
+    real_get = ResultCache.get
+
+    def get(self, key):
+        threads.append(threading.current_thread())
+        return real_get(self, key)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_DOWNLOAD_PATH": tmpdir, "GEMINI_CACHE": "1"}
+        with patch.dict(os.environ, env):
+            get_cache().put("aa1", b"x", "png")
+            with patch.object(ResultCache, "get", get):
+                cache, (data, fmt, _) = await lookup("aa1")
+                assert cache is get_cache() and (data, fmt) == (b"x", "png")
+        assert await lookup("aa1") == (None, None)  # disabled
+
+    assert threads and threads[0] is not threading.main_thread()
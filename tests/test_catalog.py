@@ -0,0 +1,85 @@
+"""Tests for the generation catalog."""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+
+def _record(id: str, prompt: str, kind: str = "image", created_at: float = 0.0):
+    from src.gemini_gen_mcp.catalog import GenerationRecord
+
+    return GenerationRecord(
+        id=id,
+        tool="text_to_image" if kind == "image" else "text_to_speech",
+        kind=kind,
+        model="gemini-2.5-flash-image" if kind == "image" else "tts",
+        prompt=prompt,
+        path=f"/tmp/{id}.png",
+        format="png",
+        size=100,
+        latency_ms=12.5,
+        params={"temperature": 1.0},
+        created_at=created_at,
+    )
+
+
+def test_new_generation_ids_are_unique():
+    """Test IDs generated in the same millisecond don't collide."""
+    from src.gemini_gen_mcp.catalog import new_generation_id
+
+    ids = {new_generation_id() for _ in range(1000)}
+    assert len(ids) == 1000
+
+
+def test_catalog_query_filters():
+    """Test catalog queries by prompt text, kind and time range."""
+    from src.gemini_gen_mcp.catalog import Catalog
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        catalog = Catalog(os.path.join(tmpdir, "catalog.db"))
+        catalog.add(_record("a", "a red cube", created_at=100))
+        catalog.add(_record("b", "a blue 100% cube", created_at=200))
+        catalog.add(_record("c", "hello world", kind="audio", created_at=300))
+
+        assert [r["id"] for r in catalog.query()] == ["c", "b", "a"]
+        assert [r["id"] for r in catalog.query(text="cube")] == ["b", "a"]
+        assert [r["id"] for r in catalog.query(text="100%")] == ["b"]
+        assert [r["id"] for r in catalog.query(kind="audio")] == ["c"]
+        assert [r["id"] for r in catalog.query(since=150, until=300)] == ["b"]
+        assert [r["id"] for r in catalog.query(limit=1, offset=1)] == ["b"]
+        assert catalog.query(text="red")[0]["params"] == {"temperature": 1.0}
+        catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_generations_are_cataloged_and_searchable():
+    """Test tool calls are recorded and found by list/search_generations."""
+    from src.gemini_gen_mcp.server import (
+        list_generations,
+        search_generations,
+        text_to_images,
+        text_to_speech,
+    )
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", StubClient(0)):
+                await text_to_images.fn(prompt="a red cube", count=3)
+                await text_to_speech.fn("hello world")
+            flush_writes()
+
+            everything = await list_generations.fn()
+            images = await list_generations.fn(kind="image")
+            found = await search_generations.fn("hello")
+
+    assert len(everything) == 4
+    assert len({r["path"] for r in images}) == 3
+    assert all(r["tool"] == "text_to_images" for r in images)
+    assert [r["kind"] for r in found] == ["audio"]
+    assert found[0]["model"] == "gemini-2.5-flash-preview-tts"
+    assert found[0]["size"] > 0
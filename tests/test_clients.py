@@ -0,0 +1,123 @@
+"""Tests for the pooled Gemini client."""
+
+import os
+import tempfile
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from tests.stub_gemini import FakeGeminiServer
+
+
+def test_get_client_reuses_client_for_same_config():
+    """Test get_client builds one client per API key and timeout."""
+    from src.gemini_gen_mcp.clients import get_client, get_client_stats
+
+    with patch("src.gemini_gen_mcp.clients.genai.Client") as mock_client:
+        mock_client.side_effect = lambda **kwargs: MagicMock()
+
+        first = get_client("key-a")
+        assert get_client("key-a") is first
+        assert get_client("key-b") is not first
+        assert get_client("key-a", timeout_ms=5000) is not first
+
+    assert mock_client.call_count == 3
+    stats = get_client_stats()
+    assert stats["clients_created"] == 3
+    assert stats["clients_reused"] == 1
+
+
+@pytest.mark.asyncio
+async def test_replaced_clients_are_closed_on_their_own_loop():
+    """Test a client rebuilt for a new event loop closes the old one's connections."""
+    import asyncio
+    import threading
+    import time
+
+    from src.gemini_gen_mcp import clients
+    from src.gemini_gen_mcp.clients import get_client
+
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        with patch("src.gemini_gen_mcp.clients.genai.Client", MagicMock()):
+
+            async def create():
+                get_client("key-a")
+                return next(iter(clients._pool.values())).http_client
+
+            old_http_client = asyncio.run_coroutine_threadsafe(create(), old_loop).result()
+            get_client("key-a")  # on this test's loop
+
+        deadline = time.monotonic() + 5
+        while not old_http_client.is_closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert old_http_client.is_closed
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join()
+        old_loop.close()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_kept_alive_across_tool_calls():
+    """Test sequential tool calls reuse one HTTP connection to the API."""
+    from src.gemini_gen_mcp.clients import get_client_stats
+    from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import FakeGeminiServer
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer() as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+        }
+        with patch.dict(os.environ, env):
+            await text_to_image.fn("a red cube")
+            await text_to_speech.fn("hello")
+            await text_to_image.fn("a blue cube")
+        flush_writes()
+
+    assert len(server.requests) == 3
+    stats = get_client_stats()
+    assert stats["clients_created"] == 1
+    assert stats["requests"] == 3
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 2
+
+
+def test_get_timeout_precedence():
+    """Test explicit timeouts win over per-model and global defaults."""
+    from src.gemini_gen_mcp.clients import get_timeout
+
+    env = {"GEMINI_TIMEOUT": "30", "GEMINI_TIMEOUTS": '{"slow-model": 300}'}
+    with patch.dict(os.environ, env):
+        assert get_timeout("fast-model") == 30
+        assert get_timeout("slow-model") == 300
+        assert get_timeout("slow-model", 5) == 5
+        with pytest.raises(ValueError):
+            get_timeout("fast-model", 0)
+    with patch.dict(os.environ, {}, clear=True):
+        assert get_timeout("fast-model") == 120
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_aborted_after_timeout():
+    """Test a per-call timeout aborts the HTTP request to a slow API."""
+    import time
+    from src.gemini_gen_mcp.server import text_to_image
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer(latency=2) as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+        }
+        with patch.dict(os.environ, env):
+            started = time.monotonic()
+            with pytest.raises(TimeoutError, match="within 0.2 seconds"):
+                await text_to_image.fn("a red cube", timeout=0.2)
+            assert time.monotonic() - started < 1.5
+        assert os.listdir(tmpdir) == []
@@ -0,0 +1,100 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result_and_survives_cancelled_waiters():
+    """Test duplicates share one call that keeps running while anyone waits."""
+    from src.gemini_gen_mcp.coalesce import SingleFlight
+
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return object()
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    third = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    results = await asyncio.gather(second, third)
+    assert results[0] is results[1]
+    assert calls == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+    # Once every caller has given up, the shared call is cancelled
+    only = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+    assert flight.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_starts_afresh_after_the_last_waiter_cancels():
+    """Test a caller arriving just after everyone gave up doesn't join the dying call."""
+    from src.gemini_gen_mcp.coalesce import SingleFlight
+
+    flights = SingleFlight()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    first = asyncio.create_task(flights.do("k", fn))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    # The cancelled call's done callback hasn't run yet
+    assert await flights.do("k", fn) == 2
+    assert flights.stats() == {"calls": 2, "coalesced": 0, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_tool_calls_are_coalesced():
+    """Test concurrent identical requests trigger a single API call."""
+    from src.gemini_gen_mcp.coalesce import get_coalescing_stats
+    from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0.05)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                speech = await asyncio.gather(
+                    *[text_to_speech.fn("Welcome back!") for _ in range(4)],
+                    text_to_speech.fn("  Welcome back! "),
+                    text_to_speech.fn("Welcome back!", voice="Puck"),
+                )
+                images = await asyncio.gather(
+                    text_to_image.fn("a red cube"), text_to_image.fn("a red cube")
+                )
+                with patch.dict(os.environ, {"GEMINI_COALESCE": "0"}):
+                    await asyncio.gather(
+                        text_to_image.fn("a red cube"), text_to_image.fn("a red cube")
+                    )
+        flush_writes()
+
+    assert stub.models.calls == 2 + 1 + 2
+    assert all(s.data == speech[0].data for s in speech[:5])
+    assert images[0].data == images[1].data
+    assert get_coalescing_stats()["coalesced"] == 4 + 1
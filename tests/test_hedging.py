@@ -0,0 +1,198 @@
+"""Tests for model fallback chains and hedged requests."""
+
+import asyncio
+import glob
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+from google.genai import errors
+
+from tests.stub_gemini import FakeGeminiServer, _error_body
+
+
+def test_get_fallbacks_is_opt_in():
+    """Test fallbacks are off by default, built in with 1 and custom with JSON."""
+    from src.gemini_gen_mcp.hedging import get_fallbacks
+
+    defaults = {"pro": ["flash"]}
+    with patch.dict(os.environ, {}, clear=True):
+        assert get_fallbacks("pro", defaults) == []
+    with patch.dict(os.environ, {"GEMINI_FALLBACKS": "1"}):
+        assert get_fallbacks("pro", defaults) == ["flash"]
+        assert get_fallbacks("flash", defaults) == []
+    custom = json.dumps({"flash": ["pro", "lite"]})
+    with patch.dict(os.environ, {"GEMINI_FALLBACKS": custom}):
+        assert get_fallbacks("flash", defaults) == ["pro", "lite"]
+
+
+@pytest.mark.asyncio
+async def test_with_fallback_only_falls_back_on_transient_errors(capsys, caplog):
+    """Test 5xx errors and timeouts move on to the next model, bad requests don't."""
+    from src.gemini_gen_mcp.hedging import get_hedging_stats, with_fallback
+
+    failures = {
+        "pro": errors.ServerError(503, _error_body(503)),
+        "flash": TimeoutError("flash did not respond"),
+    }
+
+    async def call(model: str) -> str:
+        if model in failures:
+            raise failures[model]
+        return f"{model} image"
+
+    assert await with_fallback(["pro", "flash", "lite"], call) == ("lite image", "lite")
+    assert get_hedging_stats()["pro"]["fallbacks"] == 2
+    # Fallbacks are logged, stdout is the stdio transport's protocol stream
+    assert "falling back to lite" in caplog.text
+    assert capsys.readouterr().out == ""
+
+    failures["pro"] = errors.ClientError(400, _error_body(400))
+    with pytest.raises(errors.ClientError):
+        await with_fallback(["pro", "lite"], call)
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_a_slow_one():
+    """Test a duplicate is sent after the delay and the first success wins."""
+    from src.gemini_gen_mcp.hedging import get_hedging_stats, hedged
+
+    latencies = [1.0, 0.01]
+    started, cancelled = [], []
+
+    async def call() -> int:
+        idx = len(started)
+        started.append(idx)
+        try:
+            await asyncio.sleep(latencies[idx])
+        except asyncio.CancelledError:
+            cancelled.append(idx)
+            raise
+        return idx
+
+    assert await hedged("pro", call, delay=0.05) == 1
+    assert started == [0, 1]
+    assert cancelled == [0]  # the slow request is aborted
+    assert get_hedging_stats()["pro"] == {"fallbacks": 0, "hedged": 1, "hedge_wins": 1}
+
+    # Fast enough requests aren't duplicated
+    started.clear()
+    latencies[0] = 0.01
+    assert await hedged("pro", call, delay=0.5) == 0
+    assert started == [0]
+
+    # Nor are requests the rate limiter has no room for
+    started.clear()
+    latencies[0] = 0.2
+    assert await hedged("pro", call, delay=0.05, admit=lambda: False) == 0
+    assert started == [0]
+
+
+def test_hedge_delay_uses_the_request_latency_percentile():
+    """Test the hedge delay is the p95 of measured requests, once there are enough."""
+    from src.gemini_gen_mcp.hedging import REQUEST_PHASE, hedge_delay
+    from src.gemini_gen_mcp.metrics import get_metrics
+
+    env = {"GEMINI_HEDGE": "1", "GEMINI_HEDGE_MIN_SAMPLES": "10"}
+    with patch.dict(os.environ, env):
+        metrics = get_metrics()
+        for _ in range(9):
+            metrics.observe(REQUEST_PHASE, 800, "pro")
+        assert hedge_delay("pro") is None
+        metrics.observe(REQUEST_PHASE, 800, "pro")
+        assert 0.5 <= hedge_delay("pro") <= 1.0
+        with patch.dict(os.environ, {"GEMINI_HEDGE_DELAY": "2.5"}):
+            assert hedge_delay("pro") == 2.5
+    assert hedge_delay("pro") is None
+
+
+@pytest.mark.asyncio
+async def test_text_to_image_falls_back_and_records_the_model_used():
+    """Test a failing Pro model falls back to Flash, recorded in the sidecar."""
+    from src.gemini_gen_mcp.server import ImageModels, text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer(
+        failing_models={ImageModels.NANO_BANANA_PRO: 503}
+    ) as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_MAX_RETRIES": "0",
+            "GEMINI_FALLBACKS": "1",
+        }
+        with patch.dict(os.environ, env):
+            await text_to_image.fn(
+                "a red cube", model=ImageModels.NANO_BANANA_PRO, return_mode="path"
+            )
+        flush_writes()
+        [sidecar] = glob.glob(os.path.join(tmpdir, "images", "*", "*.info.json"))
+        with open(sidecar) as f:
+            info = json.load(f)
+
+    assert info["model"] == ImageModels.NANO_BANANA
+    assert info["requested_model"] == ImageModels.NANO_BANANA_PRO
+    assert [path.split("/models/")[1] for path, _ in server.requests] == [
+        f"{ImageModels.NANO_BANANA_PRO}:generateContent",
+        f"{ImageModels.NANO_BANANA}:generateContent",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fallback_results_are_not_cached_for_the_requested_model():
+    """Test an image from a fallback model isn't served to later Pro requests."""
+    from src.gemini_gen_mcp.cache import get_cache_stats
+    from src.gemini_gen_mcp.server import ImageModels, text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer(
+        failing_models={ImageModels.NANO_BANANA_PRO: 503}
+    ) as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_MAX_RETRIES": "0",
+            "GEMINI_FALLBACKS": "1",
+            "GEMINI_CACHE": "1",
+        }
+        with patch.dict(os.environ, env):
+            for _ in range(2):
+                await text_to_image.fn(
+                    "a red cube", model=ImageModels.NANO_BANANA_PRO, return_mode="path"
+                )
+                flush_writes()
+            stats = get_cache_stats()
+
+    assert stats["entries"] == 0 and stats["hits"] == 0
+    # Both calls tried Pro first
+    assert len(server.requests) == 4
+
+
+@pytest.mark.asyncio
+async def test_hedge_timer_excludes_throttling_backoff():
+    """Test backing off after a 429 doesn't count towards the hedge delay."""
+    from src.gemini_gen_mcp.hedging import get_hedging_stats
+    from src.gemini_gen_mcp.ratelimit import get_scheduler_stats
+    from src.gemini_gen_mcp.server import ImageModels, text_to_image
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer() as server:
+        server.fail_next(429, retry_delay="1s")
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_MAX_RETRIES": "1",
+            "GEMINI_HEDGE": "1",
+            "GEMINI_HEDGE_DELAY": "0.3",
+        }
+        with patch.dict(os.environ, env):
+            await text_to_image.fn("a red cube", return_mode="path")
+            admitted = get_scheduler_stats()[ImageModels.NANO_BANANA]["admitted"]
+
+    assert len(server.requests) == 2  # the 429, then its retry
+    assert admitted == 2
+    assert ImageModels.NANO_BANANA not in get_hedging_stats()
@@ -0,0 +1,139 @@
+"""Tests for image post-processing."""
+
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+
+
+def _png(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 255)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _size(data: bytes) -> tuple[str, tuple[int, int]]:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        return img.format, img.size
+
+
+def test_render_variants_resizes_and_reencodes():
+    """Test each variant is downscaled to fit and encoded in its format."""
+    from src.gemini_gen_mcp.imaging import ImageFormat, Variant, render_variants
+
+    data = _png(1000, 500)
+    resized, thumb, full = render_variants(
+        data,
+        [
+            Variant(400, ImageFormat.WEBP, 70),
+            Variant(64, ImageFormat.JPEG),
+            Variant(None, ImageFormat.PNG),
+        ],
+    )
+    assert _size(resized) == ("WEBP", (400, 200))
+    assert _size(thumb) == ("JPEG", (64, 32))
+    assert _size(full) == ("PNG", (1000, 500))
+
+
+@pytest.mark.asyncio
+async def test_avif_needs_a_pillow_with_avif_support():
+    """Test AVIF output fails clearly when Pillow can't encode it."""
+    from src.gemini_gen_mcp.imaging import ImageFormat, Variant, process_image
+
+    with patch.dict(os.environ, {"GEMINI_IMAGE_WORKERS": "0"}):
+        with patch("PIL.features.check", return_value=False):
+            with pytest.raises(ValueError, match="AVIF output requires Pillow 11.2"):
+                await process_image(_png(10, 10), [Variant(None, ImageFormat.AVIF)])
+            # Other formats don't need it
+            [png] = await process_image(_png(10, 10), [Variant(None, ImageFormat.PNG)])
+    assert _size(png) == ("PNG", (10, 10))
+
+
+@pytest.mark.asyncio
+async def test_text_to_image_returns_small_variant_and_keeps_original():
+    """Test the client gets the processed variant while the original stays on disk."""
+    from fastmcp.utilities.types import Image
+    from mcp.types import ResourceLink
+
+    from src.gemini_gen_mcp.server import text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0)
+    original = _png(1024, 768)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_IMAGE_WORKERS": "1",
+        }
+        with patch.dict(os.environ, env):
+            with patch("tests.stub_gemini._image_data", lambda size: original):
+                with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                    image, thumb = await text_to_image.fn(
+                        "a red square", max_dim=256, output_format="webp", thumbnail=64
+                    )
+                    link = await text_to_image.fn(
+                        "a red square", return_mode="resource_link", max_dim=100
+                    )
+        flush_writes()
+
+        assert isinstance(image, Image) and image._mime_type == "image/webp"
+        assert _size(image.data) == ("WEBP", (256, 192))
+        assert _size(thumb.data) == ("WEBP", (64, 48))
+        assert isinstance(link, ResourceLink)
+        assert link.name.endswith(".100.png")
+
+        # Full-resolution originals are saved as generated
+        originals = [
+            os.path.join(d, f)
+            for d, _, files in os.walk(os.path.join(tmpdir, "images"))
+            for f in files
+            if f.endswith(".png") and f.count(".") == 1
+        ]
+        assert len(originals) == 2
+        for path in originals:
+            with open(path, "rb") as f:
+                assert f.read() == original
+
+
+@pytest.mark.asyncio
+async def test_renditions_of_cached_images_get_a_generation_id():
+    """Test cache hits aren't post-processed into files named by their cache key."""
+    from src.gemini_gen_mcp.catalog import GENERATION_ID
+    from src.gemini_gen_mcp.janitor import scan
+    from src.gemini_gen_mcp.server import text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_IMAGE_WORKERS": "0",
+            "GEMINI_CACHE": "1",
+        }
+        with patch.dict(os.environ, env):
+            with patch("tests.stub_gemini._image_data", lambda size: _png(400, 300)):
+                with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                    for _ in range(2):
+                        await text_to_image.fn(
+                            "a red square", return_mode="path", max_dim=100
+                        )
+                        flush_writes()
+            generations = scan(tmpdir)
+
+    assert stub.models.calls == 1
+    [cached] = [g for g in generations if len(g.files) == 2]
+    names = sorted(os.path.basename(path) for path in cached.files)
+    assert names == [f"{cached.id}.100.png", f"{cached.id}.info.json"]
+    assert GENERATION_ID.match(cached.id)
@@ -0,0 +1,251 @@
+"""Tests for the download directory janitor."""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from tests.test_audio import FAKE_FFMPEG
+
+DAY = 86400
+
+
+def make_generation(root, sub_dir, age, files, now, hex_id="0123abcd"):
+    """Write a generation's files (name suffix -> bytes) created ``age`` seconds ago."""
+    from src.gemini_gen_mcp.catalog import GenerationRecord, record_generation
+
+    gen_id = f"{int((now - age) * 1000)}-{hex_id}"
+    day_dir = os.path.join(root, sub_dir, time.strftime("%Y-%m-%d", time.gmtime(now - age)))
+    os.makedirs(day_dir, exist_ok=True)
+    paths = []
+    for suffix, data in files.items():
+        path = os.path.join(day_dir, gen_id + suffix)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    record_generation(
+        GenerationRecord(
+            id=gen_id,
+            tool="text_to_image",
+            kind="image" if sub_dir == "images" else "audio",
+            model="test-model",
+            prompt="a red cube",
+            path=paths[0],
+            format=paths[0].rsplit(".", 1)[1],
+            size=len(next(iter(files.values()))),
+            latency_ms=1.0,
+        ),
+        root,
+    )
+    return gen_id, paths
+
+
+def test_scan_groups_the_files_of_each_generation():
+    """Test artifacts, renditions and sidecars are grouped, oldest first."""
+    from src.gemini_gen_mcp.janitor import scan
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        new_id, _ = make_generation(
+            tmpdir, "images", DAY, {".png": b"new", ".info.json": b"{}"}, now
+        )
+        old_id, old_paths = make_generation(
+            tmpdir,
+            "images",
+            2 * DAY,
+            {".png": b"1", "_1.png": b"22", ".thumb.jpeg": b"333", ".info.json": b"{}"},
+            now,
+        )
+        day_dir = os.path.dirname(old_paths[0])
+        for name in (f"{old_id}.png.123.456.tmp", "notes.txt"):
+            with open(os.path.join(day_dir, name), "w") as f:
+                f.write("ignored")
+
+        generations = scan(tmpdir)
+
+    assert [g.id for g in generations] == [old_id, new_id]
+    assert sorted(generations[0].files) == sorted(old_paths)
+    assert generations[0].size == 8
+    assert abs(generations[0].created_at - (now - 2 * DAY)) < 1
+
+
+def test_sweep_removes_expired_generations_and_their_records():
+    """Test generations past the max age are removed with their catalog records."""
+    from src.gemini_gen_mcp.catalog import get_catalog
+    from src.gemini_gen_mcp.janitor import get_janitor_stats, sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old_id, old_paths = make_generation(
+            tmpdir, "audios", 10 * DAY, {".wav": b"old", ".info.json": b"{}"}, now
+        )
+        new_id, new_paths = make_generation(
+            tmpdir, "audios", DAY, {".wav": b"new", ".info.json": b"{}"}, now
+        )
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_MAX_AGE": str(7 * DAY)}):
+            result = sweep(tmpdir, now=now)
+            stats = get_janitor_stats()
+
+        assert not any(os.path.exists(p) for p in old_paths)
+        assert not os.path.exists(os.path.dirname(old_paths[0]))  # empty day dir
+        assert all(os.path.exists(p) for p in new_paths)
+        assert get_catalog(tmpdir).get(old_id) is None
+        assert get_catalog(tmpdir).get(new_id) is not None
+
+    assert (result.removed, result.removed_files, result.freed_bytes) == (1, 2, 5)
+    assert stats["enabled"] and stats["runs"] == 1 and stats["total_bytes"] == 5
+
+
+def test_sweep_removes_generations_saved_by_earlier_versions():
+    """Test files named by a bare timestamp are grouped, counted and removed."""
+    from src.gemini_gen_mcp.janitor import scan, sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        legacy_id = str(int((now - 30 * DAY) * 1000))
+        day_dir = os.path.join(
+            tmpdir, "images", time.strftime("%Y-%m-%d", time.gmtime(now - 30 * DAY))
+        )
+        os.makedirs(day_dir)
+        legacy_paths = []
+        for name in (f"{legacy_id}.png", f"{legacy_id}_1.png", f"{legacy_id}.info.json"):
+            legacy_paths.append(os.path.join(day_dir, name))
+            with open(legacy_paths[-1], "wb") as f:
+                f.write(b"xx")
+        new_id, new_paths = make_generation(tmpdir, "images", DAY / 2, {".png": b"new"}, now)
+
+        [legacy, new] = scan(tmpdir)
+        assert (legacy.id, legacy.size) == (legacy_id, 6)
+        assert sorted(legacy.files) == sorted(legacy_paths)
+        assert new.id == new_id
+
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_MAX_AGE": str(DAY)}):
+            result = sweep(tmpdir, now=now)
+        assert not any(os.path.exists(p) for p in legacy_paths)
+        assert os.path.exists(new_paths[0])
+
+    assert (result.removed, result.removed_files, result.freed_bytes) == (1, 3, 6)
+
+
+def test_sweep_caps_the_directory_size_oldest_first():
+    """Test the oldest generations go until the cap is met, sparing recent ones."""
+    from src.gemini_gen_mcp.janitor import scan, sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ids = [
+            make_generation(tmpdir, "images", age, {".png": b"x" * 100}, now)[0]
+            for age in (3 * DAY, 2 * DAY, DAY, 60)
+        ]
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_MAX_BYTES": "150"}):
+            result = sweep(tmpdir, now=now)
+            assert [g.id for g in scan(tmpdir)] == ids[3:]
+            assert result.removed == 3 and result.total_bytes == 100
+
+            # A generation that was just made is never removed, even over the cap
+            with patch.dict(os.environ, {"GEMINI_DOWNLOAD_MAX_BYTES": "10"}):
+                sweep(tmpdir, now=now)
+            assert [g.id for g in scan(tmpdir)] == ids[3:]
+
+
+def test_sweep_compresses_old_wavs():
+    """Test old WAVs are re-encoded in place, updating the catalog and sidecar."""
+    from src.gemini_gen_mcp.catalog import get_catalog
+    from src.gemini_gen_mcp.janitor import sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ffmpeg = os.path.join(tmpdir, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg, 0o755)
+        sidecar = json.dumps({"format": "wav"}).encode()
+        old_id, old_paths = make_generation(
+            tmpdir, "audios", 2 * DAY, {".wav": b"pcm", ".info.json": sidecar}, now
+        )
+        new_id, new_paths = make_generation(
+            tmpdir, "audios", 60, {".wav": b"pcm"}, now, hex_id="4567cdef"
+        )
+        env = {"GEMINI_COMPRESS_AUDIO_AFTER": str(DAY), "GEMINI_FFMPEG": ffmpeg}
+        with patch.dict(os.environ, env):
+            result = sweep(tmpdir, now=now)
+
+        flac_path = old_paths[0][: -len(".wav")] + ".flac"
+        with open(flac_path, "rb") as f:
+            assert f.read() == b"ENC:flac:pcm"
+        with open(old_paths[1]) as f:
+            # Formatted like the sidecars the server writes
+            assert f.read() == json.dumps({"format": "flac"}, indent=4)
+        assert not os.path.exists(old_paths[0])
+        assert os.path.exists(new_paths[0])
+        record = get_catalog(tmpdir).get(old_id)
+        assert (record["path"], record["format"]) == (flac_path, "flac")
+
+    assert result.compressed == 1 and result.errors == 0
+
+
+def test_sweep_doesnt_compress_generations_it_removes():
+    """Test expired WAVs are removed without being re-encoded first."""
+    from src.gemini_gen_mcp.janitor import sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ffmpeg = os.path.join(tmpdir, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg, 0o755)
+        _, old_paths = make_generation(tmpdir, "audios", 10 * DAY, {".wav": b"old"}, now)
+        _, kept_paths = make_generation(
+            tmpdir, "audios", 2 * DAY, {".wav": b"kept"}, now, hex_id="4567cdef"
+        )
+        env = {
+            "GEMINI_COMPRESS_AUDIO_AFTER": str(DAY),
+            "GEMINI_DOWNLOAD_MAX_AGE": str(7 * DAY),
+            "GEMINI_FFMPEG": ffmpeg,
+        }
+        with patch.dict(os.environ, env):
+            result = sweep(tmpdir, now=now)
+
+        assert not os.path.exists(old_paths[0][: -len(".wav")] + ".flac")
+        assert os.path.exists(kept_paths[0][: -len(".wav")] + ".flac")
+
+    assert (result.removed, result.compressed) == (1, 1)
+    assert result.total_bytes == len(b"ENC:flac:kept")
+
+
+def test_sweep_is_skipped_while_another_process_sweeps():
+    """Test workers sharing a download directory don't sweep it at the same time."""
+    from src.gemini_gen_mcp.janitor import _SweepLock, sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _, paths = make_generation(tmpdir, "images", 10 * DAY, {".png": b"x"}, now)
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_MAX_AGE": str(DAY)}):
+            with _SweepLock(tmpdir) as locked:
+                assert locked
+                result = sweep(tmpdir, now=now)
+            assert result.skipped == 1 and os.path.exists(paths[0])
+            sweep(tmpdir, now=now)
+        assert not os.path.exists(paths[0])
+
+
+def test_missing_ffmpeg_is_logged_once(capsys, caplog):
+    """Test sweeps skip compaction without ffmpeg, warning once on stderr."""
+    from src.gemini_gen_mcp.janitor import sweep
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _, paths = make_generation(tmpdir, "audios", 2 * DAY, {".wav": b"pcm"}, now)
+        env = {
+            "GEMINI_COMPRESS_AUDIO_AFTER": str(DAY),
+            "GEMINI_FFMPEG": os.path.join(tmpdir, "missing-ffmpeg"),
+        }
+        with patch.dict(os.environ, env):
+            for _ in range(3):
+                sweep(tmpdir, now=now)
+        assert os.path.exists(paths[0])
+
+    assert caplog.text.count("requires ffmpeg") == 1
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,110 @@
+"""Tests for the API key pool."""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+from google.genai import errors
+
+from tests.stub_gemini import FakeGeminiServer, _error_body
+
+
+def test_load_keys_from_env_and_file():
+    """Test keys are merged from all variables and a key file, without duplicates."""
+    from src.gemini_gen_mcp.keys import load_keys
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "keys.txt")
+        with open(path, "w") as f:
+            f.write("# project A\nkey-c\n\nkey-d  # project B\nkey-a\n")
+        env = {
+            "GEMINI_API_KEY": "key-a",
+            "GEMINI_API_KEYS": "key-b, key-c",
+            "GEMINI_API_KEY_FILE": path,
+        }
+        with patch.dict(os.environ, env, clear=True):
+            assert load_keys() == ["key-a", "key-b", "key-c", "key-d"]
+
+
+def test_key_selection_strategies():
+    """Test least-loaded picks the idlest key and round-robin takes turns."""
+    from src.gemini_gen_mcp.keys import KeyPool, KeyStrategy
+
+    pool = KeyPool(["a", "b", "c"])
+    pool.keys[0].in_flight = 2
+    pool.keys[1].in_flight = 1
+    assert pool.choose().key == "c"
+    pool.keys[2].in_flight = 3
+    assert pool.choose().key == "b"
+
+    pool = KeyPool(["a", "b", "c"], KeyStrategy.ROUND_ROBIN)
+    pool.keys[1].quarantined_until = float("inf")
+    assert [pool.choose().key for _ in range(4)] == ["a", "c", "a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_over_and_quarantines_keys(capsys, caplog):
+    """Test throttled and rejected keys are quarantined and the call moves on."""
+    from src.gemini_gen_mcp.keys import KeyPool
+
+    pool = KeyPool(["throttled", "revoked", "good"], "round_robin")
+    status = {"throttled": 429, "revoked": 403}
+    calls = []
+
+    async def call(key: str) -> str:
+        calls.append(key)
+        if key in status:
+            raise errors.ClientError(status[key], _error_body(status[key], "5s"))
+        return key
+
+    with patch.dict(os.environ, {"GEMINI_KEY_FORBIDDEN_QUARANTINE": "600"}):
+        assert await pool.run(call) == "good"
+        assert calls == ["throttled", "revoked", "good"]
+        # Quarantined keys are skipped until they're released
+        assert await pool.run(call) == "good"
+        assert calls[-1] == "good"
+
+    stats = pool.stats()["keys"]
+    throttled, revoked, good = (stats[k.id] for k in pool.keys)
+    assert throttled["throttled"] == 1 and 0 < throttled["quarantined_for"] <= 5
+    assert revoked["forbidden"] == 1 and revoked["quarantined_for"] > 500
+    assert good["requests"] == 2 and good["in_flight"] == 0
+    # Quarantines are logged, stdout is the stdio transport's protocol stream
+    assert "quarantined" in caplog.text
+    assert capsys.readouterr().out == ""
+
+    # Other errors don't fail over
+    async def broken(key: str) -> str:
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await pool.run(broken)
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_fail_over_from_a_revoked_key():
+    """Test a tool keeps working when one of its keys is revoked."""
+    from src.gemini_gen_mcp.server import get_server_stats, text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer(
+        rejected_keys={"revoked-key": 403}
+    ) as server:
+        env = {
+            "GEMINI_API_KEYS": "revoked-key,good-key",
+            "GEMINI_KEY_STRATEGY": "round_robin",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_MAX_RETRIES": "0",
+        }
+        with patch.dict(os.environ, env, clear=True):
+            for i in range(3):
+                await text_to_image.fn(f"a red cube {i}", return_mode="path")
+            stats = get_server_stats()["api_keys"]
+        flush_writes()
+
+    # The revoked key is tried once, then quarantined
+    assert server.api_keys == ["revoked-key", "good-key", "good-key", "good-key"]
+    assert stats["strategy"] == "round_robin"
+    assert sorted(k["requests"] for k in stats["keys"].values()) == [1, 3]
@@ -0,0 +1,30 @@
+"""Tests for lazily imported modules."""
+
+import sys
+from unittest.mock import patch
+
+
+def test_lazy_module_imports_on_first_use():
+    """Test a lazy module is only imported when an attribute is used."""
+    from src.gemini_gen_mcp.lazy import LazyModule, lazy_import
+
+    sys.modules.pop("colorsys", None)
+    colorsys = lazy_import("colorsys")
+    assert isinstance(colorsys, LazyModule)
+    assert "colorsys" not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+    # Already imported modules are returned as is
+    assert lazy_import("colorsys") is sys.modules["colorsys"]
+
+
+def test_patching_a_lazy_module_patches_the_real_module():
+    """Test mock.patch through a lazy module reaches other importers."""
+    from src.gemini_gen_mcp.lazy import LazyModule
+
+    sys.modules.pop("colorsys", None)
+    lazy = LazyModule("colorsys")
+    with patch.object(lazy, "ONE_THIRD", 0.5):
+        assert sys.modules["colorsys"].ONE_THIRD == 0.5
+    assert sys.modules["colorsys"].ONE_THIRD == 1.0 / 3.0
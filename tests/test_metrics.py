@@ -0,0 +1,71 @@
+"""Tests for latency histograms and the server_stats tool."""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from src.gemini_gen_mcp.metrics import Histogram, Metrics
+
+
+def test_histogram_percentiles():
+    """Test percentiles are interpolated within the matching bucket."""
+    histogram = Histogram(buckets=(10, 100, 1000))
+    for _ in range(90):
+        histogram.observe(5)
+    for _ in range(10):
+        histogram.observe(500)
+
+    assert histogram.percentile(50) == pytest.approx(10 * 50 / 90)
+    assert 100 < histogram.percentile(95) <= 500
+    assert histogram.percentile(100) == 500
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["avg_ms"] == pytest.approx(54.5)
+    assert summary["max_ms"] == 500
+
+
+def test_prometheus_dump():
+    """Test metrics render as cumulative Prometheus histograms and counters."""
+    metrics = Metrics()
+    metrics.observe("api", 20, model="m")
+    metrics.observe("api", 2000, model="m")
+    metrics.add_bytes("response", 1234, model="m")
+
+    text = metrics.to_prometheus()
+    assert "# TYPE gemini_gen_phase_seconds histogram" in text
+    assert 'gemini_gen_phase_seconds_bucket{model="m",phase="api",le="0.025"} 1' in text
+    assert 'gemini_gen_phase_seconds_bucket{model="m",phase="api",le="+Inf"} 2' in text
+    assert 'gemini_gen_phase_seconds_count{model="m",phase="api"} 2' in text
+    assert 'gemini_gen_bytes_total{model="m",direction="response"} 1234' in text
+
+
+@pytest.mark.asyncio
+async def test_server_stats_reports_phases_per_model():
+    """Test tool calls record per-phase latency and byte counts."""
+    from src.gemini_gen_mcp.server import server_stats, text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0.01, audio_bytes=4800)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                await text_to_speech.fn("Hello")
+                await text_to_speech.fn("World")
+            flush_writes()
+            stats = await server_stats.fn()
+            prometheus = await server_stats.fn(format="prometheus")
+
+    model = stats["models"]["gemini-2.5-flash-preview-tts"]
+    for phase in ("client", "api", "encode", "result", "total"):
+        assert model["latency"][phase]["count"] == 2
+    assert model["latency"]["api"]["p50_ms"] >= 10
+    assert model["bytes"]["response"] == 2 * 4800
+    assert model["bytes"]["request"] > 0
+    assert stats["models"]["all"]["latency"]["write"]["count"] == 4
+    assert stats["coalescing"]["calls"] == 2
+    assert {"clients", "cache", "writer", "rate_limits"} <= stats.keys()
+    assert 'phase="total"' in prometheus
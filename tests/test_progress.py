@@ -0,0 +1,115 @@
+"""Tests for progress notifications and streamed responses."""
+
+import os
+import tempfile
+import wave
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.gemini_gen_mcp.progress import Phase, Progress
+from src.gemini_gen_mcp.storage import flush_writes
+from tests.stub_gemini import FakeGeminiServer, StubClient
+
+
+def reported(ctx) -> list[tuple[float, str]]:
+    return [
+        (call.kwargs["progress"], call.kwargs["message"])
+        for call in ctx.report_progress.await_args_list
+    ]
+
+
+@pytest.mark.asyncio
+async def test_progress_only_moves_forward(capsys, caplog):
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock()
+    progress = Progress(ctx, "m")
+    await progress.report(Phase.QUEUED)
+    await progress.report(Phase.SENT)
+    await progress.report(Phase.QUEUED)  # e.g. a retry
+    await progress.report(Phase.SENT)
+    await progress.report(Phase.SAVING, "Writing")
+    assert reported(ctx) == [(1, "Queued for m"), (2, "Sent request to m"), (5, "Writing")]
+    assert ctx.report_progress.await_args.kwargs["total"] == 5
+
+    ctx.report_progress.side_effect = RuntimeError("closed")
+    await Progress(ctx).report(Phase.QUEUED)  # doesn't raise
+    await Progress(None).report(Phase.QUEUED)
+    # The failure is logged, not written to the stdio protocol stream
+    assert "Failed to report progress" in caplog.text
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.asyncio
+async def test_text_to_image_reports_phases():
+    from src.gemini_gen_mcp.server import text_to_image
+
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", StubClient(latency=0)):
+                await text_to_image.fn("a red cube", return_mode="path", ctx=ctx)
+        flush_writes()
+
+    assert [step for step, _ in reported(ctx)] == [1, 2, 3, 5]
+    assert "gemini-2.5-flash-image" in reported(ctx)[0][1]
+
+
+@pytest.mark.asyncio
+async def test_batch_progress_failures_dont_fail_the_batch(caplog):
+    """Test per-image progress of text_to_images is best effort too."""
+    from src.gemini_gen_mcp.server import text_to_images
+
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock(side_effect=RuntimeError("closed"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", StubClient(latency=0)):
+                result = await text_to_images.fn(
+                    prompts=["a red cube", "a blue cube"], return_mode="path", ctx=ctx
+                )
+        flush_writes()
+
+    assert len(result) == 2 and not any("failed" in str(item) for item in result)
+    assert ctx.report_progress.await_args.kwargs["total"] == 2
+    assert "Failed to report progress" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_streamed_speech_is_written_chunk_by_chunk():
+    """Test GEMINI_STREAM consumes a streamed TTS response through the real SDK."""
+    from src.gemini_gen_mcp.server import text_to_speech
+    from tests.stub_gemini import _audio_data
+
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock()
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer() as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_STREAM": "gemini-2.5-flash-preview-tts",
+        }
+        # Streamed audio goes straight to disk, it's never collected in memory
+        in_memory = AsyncMock(side_effect=AssertionError("PCM was buffered"))
+        with patch.dict(os.environ, env), patch(
+            "src.gemini_gen_mcp.server.write_speech", in_memory
+        ):
+            await text_to_speech.fn("Hello", return_mode="path", ctx=ctx)
+        flush_writes()
+        [(path, _)] = server.requests
+        assert ":streamGenerateContent" in path
+
+        [wav_path] = [
+            os.path.join(root, name)
+            for root, _, files in os.walk(tmpdir)
+            for name in files
+            if name.endswith(".wav")
+        ]
+        with wave.open(wav_path, "rb") as wf:
+            frames = wf.readframes(wf.getnframes())
+    assert frames == _audio_data(48000)
+    assert [step for step, _ in reported(ctx)] == [1, 2, 3, 4, 5]
@@ -0,0 +1,121 @@
+"""Tests for the rate limiter and request scheduler."""
+
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_scheduler_smooths_requests_to_rpm():
+    """Test requests beyond the bucket wait for tokens to refill."""
+    from src.gemini_gen_mcp.ratelimit import ModelScheduler
+
+    scheduler = ModelScheduler(rpm=600)  # 10 requests per second
+    scheduler.requests.tokens = 0
+
+    start = time.monotonic()
+    waits = [await scheduler.acquire() for _ in range(3)]
+    elapsed = time.monotonic() - start
+
+    assert 0.25 <= elapsed < 1.0
+    assert all(w > 0 for w in waits)
+    assert scheduler.stats()["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_higher_priority_first():
+    """Test queued requests are admitted in priority order."""
+    from src.gemini_gen_mcp.ratelimit import ModelScheduler
+
+    scheduler = ModelScheduler(rpm=1200)  # one every 50ms
+    scheduler.requests.tokens = 0
+    order = []
+
+    async def request(name: str, priority: int):
+        await scheduler.acquire(priority=priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(request("batch-1", 10))]
+    await asyncio.sleep(0.01)
+    tasks += [
+        asyncio.create_task(request("batch-2", 10)),
+        asyncio.create_task(request("interactive", 0)),
+    ]
+    await asyncio.gather(*tasks)
+
+    assert order == ["interactive", "batch-1", "batch-2"]
+
+
+def test_try_acquire_only_takes_a_free_slot():
+    """Test try_acquire never waits, and fails while paused or out of tokens."""
+    from src.gemini_gen_mcp.ratelimit import ModelScheduler
+
+    scheduler = ModelScheduler(rpm=60)
+    scheduler.requests.tokens = 1
+    assert scheduler.try_acquire()
+    assert not scheduler.try_acquire()  # bucket empty
+
+    scheduler = ModelScheduler()
+    scheduler.pause(1)
+    assert not scheduler.try_acquire()
+
+
+def test_retry_after_reads_headers_and_retry_info():
+    """Test retry hints are read from Retry-After and google.rpc.RetryInfo."""
+    from src.gemini_gen_mcp.ratelimit import retry_after
+
+    error = MagicMock()
+    error.response.headers = {"retry-after": "7"}
+    assert retry_after(error) == 7.0
+
+    error.response.headers = {}
+    error.details = {
+        "error": {
+            "details": [
+                {"@type": "type.googleapis.com/google.rpc.ErrorInfo"},
+                {
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": "31s",
+                },
+            ]
+        }
+    }
+    assert retry_after(error) == 31.0
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_retried_against_fake_server():
+    """Test 429s from the API are retried after the hinted delay and counted."""
+    from src.gemini_gen_mcp.ratelimit import get_scheduler_stats
+    from src.gemini_gen_mcp.server import text_to_image
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import FakeGeminiServer
+
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer() as server:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": server.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_BACKOFF_BASE": "0.01",
+        }
+        with patch.dict(os.environ, env):
+            server.fail_next(429, times=2, retry_delay="0.1s")
+            start = time.monotonic()
+            result = await text_to_image.fn("a red cube")
+            elapsed = time.monotonic() - start
+
+            server.fail_next(400)
+            with pytest.raises(Exception, match="400"):
+                await text_to_image.fn("a blue cube")
+        flush_writes()
+
+    assert result.data.startswith(b"\x89PNG")
+    assert len(server.requests) == 4
+    assert elapsed >= 0.2
+    stats = get_scheduler_stats()["gemini-2.5-flash-image"]
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
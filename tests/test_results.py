@@ -0,0 +1,111 @@
+"""Tests for tool result return modes."""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+from mcp.types import ResourceLink
+
+
+def _save(tmpdir: str, name: str, data: bytes) -> str:
+    path = os.path.join(tmpdir, "images", name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_to_content_return_modes():
+    """Test inline, path and resource_link return modes."""
+    from fastmcp.utilities.types import Image
+    from src.gemini_gen_mcp.results import Artifact, to_content
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": tmpdir}):
+            path = _save(tmpdir, "1.png", b"png-bytes")
+            artifact = Artifact(format="png", path=path)
+
+            [inline] = await to_content("image", artifact, "inline")
+            assert isinstance(inline, Image)
+            assert inline.data == b"png-bytes"
+
+            [text] = await to_content("image", artifact, "path")
+            assert path in text
+
+            [link] = await to_content("image", artifact, "resource_link")
+            assert isinstance(link, ResourceLink)
+            assert str(link.uri) == "gemini-gen://files/images/1.png"
+            assert link.mimeType == "image/png"
+            assert link.size == len(b"png-bytes")
+
+            # Unsaved artifacts are always returned inline
+            [unsaved] = await to_content("image", Artifact("png", data=b"x"), "path")
+            assert isinstance(unsaved, Image)
+
+
+@pytest.mark.asyncio
+async def test_to_content_auto_mode_links_large_outputs():
+    """Test auto mode inlines small files and links large ones."""
+    from fastmcp.utilities.types import Audio
+    from src.gemini_gen_mcp.results import Artifact, to_content
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_RETURN_MODE": "auto",
+            "GEMINI_INLINE_MAX_BYTES": "10",
+        }
+        with patch.dict(os.environ, env):
+            small = Artifact("wav", _save(tmpdir, "small.wav", b"x" * 10))
+            large = Artifact("wav", _save(tmpdir, "large.wav", b"x" * 11))
+
+            assert isinstance((await to_content("audio", small))[0], Audio)
+            [link] = await to_content("audio", large)
+            assert isinstance(link, ResourceLink)
+            # The file was never loaded into memory
+            assert large.data is None
+
+
+@pytest.mark.asyncio
+async def test_previews_are_rendered_off_the_event_loop():
+    """Test the preview of a large image isn't rendered on the event loop thread."""
+    import threading
+
+    from src.gemini_gen_mcp import results
+    from src.gemini_gen_mcp.results import Artifact, to_result
+
+    threads = []
+
+    def make_preview(data, max_dim):
+        threads.append(threading.current_thread())
+        return b"jpeg-bytes"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": tmpdir}):
+            artifact = Artifact("png", _save(tmpdir, "1.png", b"png-bytes"))
+            with patch.object(results, "make_preview", make_preview):
+                preview, link = await to_result("image", artifact, "preview")
+
+    assert preview.data == b"jpeg-bytes" and isinstance(link, ResourceLink)
+    assert threads and threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_generated_file_resource_serves_download_dir_only():
+    """Test resource links resolve through the server and can't escape the root."""
+    from fastmcp import Client
+    from src.gemini_gen_mcp.server import mcp
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": tmpdir}):
+            _save(tmpdir, "1.png", b"png-bytes")
+            async with Client(mcp) as client:
+                [content] = await client.read_resource(
+                    "gemini-gen://files/images/1.png"
+                )
+                assert content.blob == "cG5nLWJ5dGVz"  # base64 of b"png-bytes"
+
+                with pytest.raises(Exception):
+                    await client.read_resource("gemini-gen://files/../etc/passwd")
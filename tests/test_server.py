@@ -2,7 +2,7 @@
 
 import pytest
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 
 def test_get_api_key_missing():
@@ -71,7 +71,9 @@ async def test_text_to_image_success_mock():
             mock_response.candidates = [mock_candidate]
 
             mock_instance = MagicMock()
-            mock_instance.models.generate_content.return_value = mock_response
+            mock_instance.aio.models.generate_content = AsyncMock(
+                return_value=mock_response
+            )
             mock_client.return_value = mock_instance
 
             result = await func("a beautiful sunset")
@@ -104,7 +106,9 @@ async def test_text_to_audio_success_mock():
             mock_response.candidates = [mock_candidate]
 
             mock_instance = MagicMock()
-            mock_instance.models.generate_content.return_value = mock_response
+            mock_instance.aio.models.generate_content = AsyncMock(
+                return_value=mock_response
+            )
             mock_client.return_value = mock_instance
 
             result = await func("Hello, world!")
@@ -124,3 +128,234 @@ def test_get_download_path():
             expected = os.path.join(tmpdir, "test_subdir")
             assert result == expected
             assert os.path.isdir(result)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_do_not_block_event_loop():
+    """Test concurrent tool calls overlap instead of running back to back."""
+    import asyncio
+    import tempfile
+    import time
+    from src.gemini_gen_mcp.server import text_to_image, text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0.2)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                start = time.perf_counter()
+                await asyncio.gather(
+                    *[text_to_image.fn(f"prompt {i}") for i in range(5)],
+                    *[text_to_speech.fn(f"text {i}") for i in range(5)],
+                )
+                elapsed = time.perf_counter() - start
+        flush_writes()
+
+    assert stub.models.calls == 10
+    assert stub.models.max_in_flight == 10
+    # Sequential execution would take 10 * 0.2s
+    assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_text_to_images_bounded_fan_out():
+    """Test text_to_images runs prompts concurrently up to max_concurrency."""
+    import tempfile
+    from src.gemini_gen_mcp.server import text_to_images
+    from src.gemini_gen_mcp.storage import flush_writes
+    from fastmcp.utilities.types import Image
+
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0.05)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                result = await text_to_images.fn(
+                    prompt="a red cube", count=6, max_concurrency=3
+                )
+        flush_writes()
+        saved = [
+            name
+            for _, _, files in os.walk(os.path.join(tmpdir, "images"))
+            for name in files
+            if name.endswith(".png")
+        ]
+
+    assert len(result) == 6
+    assert all(isinstance(item, Image) for item in result)
+    assert stub.models.calls == 6
+    assert stub.models.max_in_flight == 3
+    assert len(saved) == 6
+
+
+@pytest.mark.asyncio
+async def test_text_to_images_returns_partial_results():
+    """Test text_to_images returns successful images when some prompts fail."""
+    import tempfile
+    from src.gemini_gen_mcp.server import text_to_images
+    from src.gemini_gen_mcp.storage import flush_writes
+    from fastmcp.utilities.types import Image
+
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=0, fail_if_contains="broken")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                result = await text_to_images.fn(
+                    prompts=["a cat", "broken prompt", "a dog"]
+                )
+                with pytest.raises(ValueError, match="No images were generated"):
+                    await text_to_images.fn(prompts=["broken"])
+        flush_writes()
+
+    assert [type(item) for item in result] == [Image, Image, str]
+    assert "1 of 3 generations failed" in result[2]
+    assert "broken prompt" in result[2]
+
+
+@pytest.mark.asyncio
+async def test_text_to_speech_long_form_stitches_chunks_in_order():
+    """Test long_form synthesizes chunks concurrently and writes PCM in order."""
+    import asyncio
+    import tempfile
+    import wave
+    from src.gemini_gen_mcp.server import text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from fastmcp.utilities.types import Audio
+    from tests.stub_gemini import make_response
+
+    sentences = [f"Sentence number {i}." for i in range(5)]
+
+    async def generate_content(model, contents, config=None):
+        idx = next(i for i, s in enumerate(sentences) if s in contents)
+        # Later chunks finish first
+        await asyncio.sleep(0.01 * (len(sentences) - idx))
+        return make_response(bytes([idx, 0]) * 100, "audio/L16;codec=pcm;rate=24000")
+
+    mock_instance = MagicMock()
+    mock_instance.aio.models.generate_content = generate_content
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_TTS_CHUNK_CHARS": "20",
+        }
+        with patch.dict(os.environ, env):
+            with patch(
+                "src.gemini_gen_mcp.server.genai.Client", return_value=mock_instance
+            ):
+                result = await text_to_speech.fn(
+                    " ".join(sentences), long_form=True, ctx=ctx
+                )
+        flush_writes()
+
+        wav_files = [
+            os.path.join(root, name)
+            for root, _, files in os.walk(tmpdir)
+            for name in files
+            if name.endswith(".wav")
+        ]
+        assert len(wav_files) == 1
+        with wave.open(wav_files[0], "rb") as wf:
+            frames = wf.readframes(wf.getnframes())
+
+    assert isinstance(result, Audio)
+    assert frames == b"".join(bytes([i, 0]) * 100 for i in range(5))
+    assert ctx.report_progress.await_count == 5
+    assert ctx.report_progress.await_args.kwargs["progress"] == 5
+
+
+@pytest.mark.asyncio
+async def test_text_to_dialogue_modes():
+    """Test text_to_dialogue uses the multi-speaker config or per-turn voices."""
+    import tempfile
+    from src.gemini_gen_mcp.server import text_to_dialogue
+    from src.gemini_gen_mcp.storage import flush_writes
+    from fastmcp.utilities.types import Audio
+    from tests.stub_gemini import make_response
+
+    calls = []
+
+    async def generate_content(model, contents, config=None):
+        calls.append((contents, config.speech_config))
+        return make_response(b"\x00\x00" * 100, "audio/L16;codec=pcm;rate=24000")
+
+    mock_instance = MagicMock()
+    mock_instance.aio.models.generate_content = generate_content
+    script = "Joe: How are you?\nJane: Great, thanks!\nJoe: Good."
+    speakers = {"Joe": "Kore", "Jane": "Puck"}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch(
+                "src.gemini_gen_mcp.server.genai.Client", return_value=mock_instance
+            ):
+                result = await text_to_dialogue.fn(script, speakers)
+                assert isinstance(result, Audio)
+                [(contents, speech)] = calls
+                assert "Joe: How are you?\nJane: Great, thanks!" in contents
+                voices = {
+                    c.speaker: c.voice_config.prebuilt_voice_config.voice_name
+                    for c in speech.multi_speaker_voice_config.speaker_voice_configs
+                }
+                assert voices == speakers
+
+                calls.clear()
+                await text_to_dialogue.fn(script, speakers, mode="segments")
+                assert [
+                    (c, s.voice_config.prebuilt_voice_config.voice_name)
+                    for c, s in sorted(calls, key=lambda call: call[0])
+                ] == [
+                    ("Read this text: Good.", "Kore"),
+                    ("Read this text: Great, thanks!", "Puck"),
+                    ("Read this text: How are you?", "Kore"),
+                ]
+
+                with pytest.raises(ValueError, match="exactly 2 speakers"):
+                    await text_to_dialogue.fn(
+                        "Joe: Hi", speakers, mode="multi_speaker"
+                    )
+        flush_writes()
+
+
+@pytest.mark.asyncio
+async def test_mcp_cancellation_aborts_generation():
+    """Test an MCP cancellation notification aborts the in-flight Gemini call."""
+    import asyncio
+    import tempfile
+    from fastmcp import Client
+    from src.gemini_gen_mcp.server import mcp
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    stub = StubClient(latency=30)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", stub):
+                async with Client(mcp) as client:
+                    call = asyncio.create_task(
+                        client.call_tool("text_to_image", {"prompt": "a red cube"})
+                    )
+                    while not stub.models.in_flight:
+                        await asyncio.sleep(0.01)
+                    # ID of the call_tool request just sent
+                    await client.cancel(client.session._request_id - 1)
+                    for _ in range(100):
+                        if not stub.models.in_flight:
+                            break
+                        await asyncio.sleep(0.01)
+                    assert stub.models.in_flight == 0
+                    call.cancel()
+        flush_writes()
+        assert os.listdir(tmpdir) == []
@@ -0,0 +1,178 @@
+"""Tests for the background artifact writer."""
+
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+
+import pytest
+
+
+def test_writer_writes_files_and_sidecars_in_background():
+    """Test queued writes land on disk, creating directories as needed."""
+    from src.gemini_gen_mcp.storage import ArtifactWriter
+
+    writer = ArtifactWriter(fsync="full")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "images", "2026-01-01", "1.png")
+        writer.write_bytes(path, b"png-bytes")
+        writer.write_json(path.replace(".png", ".info.json"), {"prompt": "cube"})
+        writer.flush()
+
+        with open(path, "rb") as f:
+            assert f.read() == b"png-bytes"
+        with open(path.replace(".png", ".info.json")) as f:
+            assert json.load(f) == {"prompt": "cube"}
+        assert sorted(os.listdir(os.path.dirname(path))) == ["1.info.json", "1.png"]
+
+    stats = writer.stats()
+    assert stats["writes"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["fsync"] == "full"
+    writer.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_writer_wait_for_and_failures(capsys, caplog):
+    """Test wait_for blocks until a pending path is written and failures are counted."""
+    from src.gemini_gen_mcp.storage import ArtifactWriter
+
+    writer = ArtifactWriter()
+    release = threading.Event()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer.run(release.wait)  # occupy a worker
+        writer.run(release.wait)
+        path = os.path.join(tmpdir, "1.wav")
+        writer.write_bytes(path, b"RIFF")
+        assert writer.queue_depth == 3
+        assert not os.path.exists(path)
+
+        release.set()
+        await writer.wait_for(path)
+        assert os.path.exists(path)
+
+        writer.write_bytes(os.path.join(path, "not-a-dir.png"), b"x")
+        writer.flush()
+
+    stats = writer.stats()
+    assert stats["failures"] == 1
+    assert stats["max_queue_depth"] == 3
+    # Failures are logged, stdout is the stdio transport's protocol stream
+    assert "Failed to save" in caplog.text
+    assert capsys.readouterr().out == ""
+    writer.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_linked_results_are_written_before_returning():
+    """Test non-inline return modes only link to files that already exist."""
+    from mcp.types import ResourceLink
+    from src.gemini_gen_mcp.server import text_to_speech
+    from src.gemini_gen_mcp.storage import flush_writes
+    from tests.stub_gemini import StubClient
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {"GEMINI_API_KEY": "test-key", "GEMINI_DOWNLOAD_PATH": tmpdir}
+        with patch.dict(os.environ, env):
+            with patch("src.gemini_gen_mcp.server.genai.Client", StubClient(0)):
+                link = await text_to_speech.fn("hello", return_mode="resource_link")
+                assert isinstance(link, ResourceLink)
+                rel_path = str(link.uri).removeprefix("gemini-gen://files/")
+                assert os.path.isfile(os.path.join(tmpdir, rel_path))
+        flush_writes()
+
+
+def test_write_buffers_writes_parts_without_joining():
+    """Test buffers are written in order, including after short writes."""
+    from src.gemini_gen_mcp.results import Artifact
+    from src.gemini_gen_mcp.storage import ArtifactWriter, write_all
+
+    parts = [b"RIFF", b"", bytearray(b"x" * 100_000), memoryview(b"tail")]
+    artifact = Artifact("wav", parts=parts)
+    assert artifact.size == 100_008
+    assert artifact.data is None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ArtifactWriter()
+        path = os.path.join(tmpdir, "out.wav")
+        writer.write_buffers(path, parts).result()
+        with open(path, "rb") as f:
+            assert f.read() == artifact.read()
+
+        # Simulate a writev that only writes part of a buffer at a time
+        real_writev = os.writev
+        short_path = os.path.join(tmpdir, "short.wav")
+        with patch("os.writev", lambda fd, bufs: real_writev(fd, [bufs[0][:7]])):
+            with open(short_path, "wb", buffering=0) as f:
+                write_all(f.fileno(), parts)
+        with open(short_path, "rb") as f:
+            assert f.read() == artifact.data
+        writer.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_discard_on_cancel_removes_files_and_records():
+    """Test files and catalog records of a cancelled call are removed."""
+    import asyncio
+    from src.gemini_gen_mcp.catalog import GenerationRecord, get_catalog, record_generation
+    from src.gemini_gen_mcp.storage import discard_on_cancel, flush_writes, get_writer
+
+    started = asyncio.Event()
+
+    @discard_on_cancel
+    async def save(path: str, hang: bool) -> str:
+        writer = get_writer()
+        writer.write_bytes(path, b"data")
+        writer.run(
+            record_generation,
+            GenerationRecord(path, "test", "image", "m", "p", path, "png", 4, 1.0),
+        )
+        if hang:
+            started.set()
+            await asyncio.sleep(60)
+        return path
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": tmpdir}):
+            kept = await save(os.path.join(tmpdir, "kept.png"), False)
+            task = asyncio.create_task(save(os.path.join(tmpdir, "gone.png"), True))
+            await started.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            flush_writes()
+
+            files = [f for f in os.listdir(tmpdir) if not f.startswith("catalog.db")]
+            assert files == ["kept.png"]
+            assert [r["path"] for r in get_catalog().query()] == [kept]
+
+
+@pytest.mark.asyncio
+async def test_wav_spool_writes_chunks_as_they_arrive():
+    """Test a spool appends PCM to a temp file, starts over on reset and finishes a WAV."""
+    import wave
+
+    from src.gemini_gen_mcp.storage import WavSpool
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "audios", "1.wav")
+        spool = WavSpool(path)
+        await spool.write(b"\x01\x00" * 10, "audio/L16;codec=pcm;rate=16000")
+        assert os.path.exists(spool.tmp_path) and not os.path.exists(path)
+
+        await spool.reset()  # e.g. the request is retried
+        assert not os.path.exists(spool.tmp_path)
+        await spool.write(b"\x02\x00" * 4, "audio/L16;codec=pcm;rate=16000")
+        await spool.write(b"\x03\x00" * 4)
+        await spool.finish()
+
+        with wave.open(path, "rb") as wf:
+            assert wf.getframerate() == 16000
+            assert wf.readframes(wf.getnframes()) == b"\x02\x00" * 4 + b"\x03\x00" * 4
+        assert os.listdir(os.path.dirname(path)) == ["1.wav"]
+
+        discarded = WavSpool(os.path.join(tmpdir, "2.wav"))
+        await discarded.write(b"\x00\x00")
+        await discarded.discard()
+        assert not os.path.exists(discarded.tmp_path)
@@ -0,0 +1,101 @@
+"""Tests for the HTTP transports and multi-worker mode."""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import pytest
+
+from tests.stub_gemini import FakeGeminiServer
+
+
+def test_parse_args_defaults_and_env():
+    """Test the transport options default to stdio and read GEMINI_* variables."""
+    from src.gemini_gen_mcp.server import Transport, parse_args
+
+    with patch.dict(os.environ, {}, clear=True):
+        args = parse_args([])
+        assert args.transport == Transport.STDIO
+        assert (args.host, args.port, args.workers) == ("127.0.0.1", 8000, 1)
+
+    env = {"GEMINI_TRANSPORT": "http", "GEMINI_PORT": "9000", "GEMINI_WORKERS": "4"}
+    with patch.dict(os.environ, env, clear=True):
+        args = parse_args([])
+        assert (args.transport, args.port, args.workers) == (Transport.HTTP, 9000, 4)
+        assert parse_args(["--port", "9001"]).port == 9001
+
+
+@pytest.mark.parametrize(
+    "argv", [["--workers", "2"], ["--transport", "sse", "--workers", "2"]]
+)
+def test_parse_args_rejects_workers_without_http(argv):
+    """Test multiple workers are only allowed over the (stateless) http transport."""
+    from src.gemini_gen_mcp.server import parse_args
+
+    with patch.dict(os.environ, {}, clear=True):
+        with pytest.raises(SystemExit):
+            parse_args(argv)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stderr.read().decode()
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"Server didn't listen on port {port}")
+
+
+@pytest.mark.asyncio
+async def test_http_workers_share_the_download_directory():
+    """Test concurrent sessions across HTTP workers all land in one catalog."""
+    from fastmcp import Client
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmpdir, FakeGeminiServer() as backend:
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_BASE_URL": backend.url,
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_CACHE": "1",
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-m", "src.gemini_gen_mcp.server", "--transport", "http",
+             "--port", str(port), "--workers", "2"],  # fmt: skip
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            await _wait_for_port(port, process)
+            url = f"http://127.0.0.1:{port}/mcp"
+
+            async def generate(i: int) -> None:
+                async with Client(url) as client:
+                    await client.call_tool(
+                        "text_to_image", {"prompt": f"cube {i}", "return_mode": "path"}
+                    )
+
+            await asyncio.gather(*(generate(i) for i in range(8)))
+            async with Client(url) as client:
+                result = await client.call_tool("list_generations", {"limit": 100})
+            assert len(result.structured_content["result"]) == 8
+        finally:
+            process.terminate()
+            process.wait(30)
@@ -0,0 +1,182 @@
+"""Tests for input images and Files API upload reuse."""
+
+import base64
+import json
+import os
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from google.genai import types
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+@pytest.mark.asyncio
+async def test_load_input_image_sources():
+    """Test images load from paths, catalog IDs, data: URLs and base64."""
+    from src.gemini_gen_mcp.catalog import GenerationRecord, get_catalog
+    from src.gemini_gen_mcp.uploads import load_input_image
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "images", "in.png")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(PNG)
+        get_catalog(tmpdir).add(
+            GenerationRecord(
+                id="1737000000000-9f2c4e1a",
+                tool="text_to_image",
+                kind="image",
+                model="m",
+                prompt="p",
+                path=path,
+                format="png",
+                size=len(PNG),
+                latency_ms=1,
+            )
+        )
+
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": tmpdir}):
+            by_path = await load_input_image(path)
+            by_relative_path = await load_input_image("images/in.png")
+            by_uri = await load_input_image("gemini-gen://files/images/in.png")
+            by_id = await load_input_image("1737000000000-9f2c4e1a")
+            encoded = base64.b64encode(PNG).decode()
+            by_base64 = await load_input_image(encoded)
+            by_data_url = await load_input_image(f"data:image/png;base64,{encoded}")
+
+            with pytest.raises(ValueError, match="No generation found"):
+                await load_input_image("1737000000000-00000000")
+            with pytest.raises(ValueError, match="Image not found"):
+                await load_input_image(os.path.join(tmpdir, "no-such-image.png"))
+            with pytest.raises(ValueError, match="Unsupported image type"):
+                await load_input_image(base64.b64encode(b"plain text").decode())
+
+    for image in (by_path, by_relative_path, by_uri, by_id, by_base64, by_data_url):
+        assert image.data == PNG
+        assert image.mime_type == "image/png"
+    assert by_id.source == "1737000000000-9f2c4e1a"
+    assert by_base64.source == by_data_url.source == f"sha256:{by_path.sha256}"
+
+
+@pytest.mark.asyncio
+async def test_input_images_are_confined_to_the_input_dirs():
+    """Test paths outside the download dir and GEMINI_INPUT_DIRS can't be read."""
+    from src.gemini_gen_mcp.uploads import load_input_image
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root, other = os.path.join(tmpdir, "root"), os.path.join(tmpdir, "other")
+        os.makedirs(os.path.join(root, "images"))
+        os.makedirs(other)
+        outside = os.path.join(other, "secret.png")
+        with open(outside, "wb") as f:
+            f.write(PNG)
+        os.symlink(outside, os.path.join(root, "images", "link.png"))
+
+        with patch.dict(os.environ, {"GEMINI_DOWNLOAD_PATH": root}):
+            for value in (
+                outside,
+                "../other/secret.png",
+                "gemini-gen://files/../other/secret.png",
+                "images/link.png",
+            ):
+                with pytest.raises(ValueError, match="outside the download|not found"):
+                    await load_input_image(value)
+            with pytest.raises(ValueError, match="GEMINI_INPUT_DIRS"):
+                await load_input_image(outside)
+
+            with patch.dict(os.environ, {"GEMINI_INPUT_DIRS": other}):
+                allowed = await load_input_image(outside)
+    assert allowed.data == PNG
+
+
+@pytest.mark.asyncio
+async def test_edit_image_uploads_large_inputs_once():
+    """Test large inputs are uploaded once and referenced by URI in later edits."""
+    from src.gemini_gen_mcp.server import edit_image
+    from src.gemini_gen_mcp.storage import flush_writes
+    from src.gemini_gen_mcp.uploads import get_upload_stats
+    from tests.stub_gemini import make_response
+
+    large = b"\x89PNG\r\n\x1a\n" + os.urandom(5000)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(
+        return_value=make_response(PNG, "image/png")
+    )
+    client.aio.files.upload = AsyncMock(
+        return_value=types.File(
+            name="files/abc",
+            uri="https://example.com/files/abc",
+            mime_type="image/png",
+            state=types.FileState.ACTIVE,
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        large_path = os.path.join(tmpdir, "large.png")
+        with open(large_path, "wb") as f:
+            f.write(large)
+        env = {
+            "GEMINI_API_KEY": "test-key",
+            "GEMINI_DOWNLOAD_PATH": tmpdir,
+            "GEMINI_UPLOAD_MIN_BYTES": "1000",
+        }
+        with patch.dict(os.environ, env):
+            with patch(
+                "src.gemini_gen_mcp.server.genai.Client", MagicMock(return_value=client)
+            ):
+                small = base64.b64encode(PNG).decode()
+                await edit_image.fn("Add a hat", [large_path, small])
+                result = await edit_image.fn(
+                    "Make it blue", [large_path], return_mode="path"
+                )
+        flush_writes()
+
+        info_path = result.split(" to ")[-1].rsplit(".", 1)[0] + ".info.json"
+        with open(info_path) as f:
+            assert json.load(f)["inputs"] == [large_path]
+
+    assert client.aio.files.upload.await_count == 1
+    assert get_upload_stats()["uploads"] == 1
+    assert get_upload_stats()["reused"] == 1
+
+    first, second = client.aio.models.generate_content.await_args_list
+    uploaded, inline, prompt = first.kwargs["contents"]
+    assert uploaded.file_data.file_uri == "https://example.com/files/abc"
+    assert inline.inline_data.data == PNG
+    assert prompt == "Add a hat"
+    assert second.kwargs["contents"][0].file_data.file_uri == uploaded.file_data.file_uri
+    assert first.kwargs["config"].image_config is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_uploads_of_an_image_are_shared():
+    """Test concurrent requests share one upload without touching generation stats."""
+    import asyncio
+
+    from src.gemini_gen_mcp.coalesce import get_coalescing_stats
+    from src.gemini_gen_mcp.uploads import InputImage, UploadCache
+
+    async def upload(file, config):
+        await asyncio.sleep(0.01)
+        return types.File(
+            name="files/abc",
+            uri="https://example.com/files/abc",
+            mime_type="image/png",
+            state=types.FileState.ACTIVE,
+        )
+
+    client = MagicMock()
+    client.aio.files.upload = AsyncMock(side_effect=upload)
+    image = InputImage(data=PNG, mime_type="image/png", source="in.png")
+    cache = UploadCache()
+    with patch.dict(os.environ, {"GEMINI_UPLOAD_MIN_BYTES": "10"}):
+        parts = await asyncio.gather(
+            *(cache.to_part(client, "test-key", image) for _ in range(3))
+        )
+
+    assert client.aio.files.upload.await_count == 1
+    assert {part.file_data.file_uri for part in parts} == {"https://example.com/files/abc"}
+    assert cache.stats()["coalesced"] == 2
+    assert get_coalescing_stats()["calls"] == 0